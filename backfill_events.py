@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Tool to parse the event columns of log entries saved before event parsing"""
+
+import sys
+from config_loader import ConfigLoader
+from event_parser import event_row
+from storage import Storage
+
+def backfill(storage, reparse=False, batch_size=1000):
+    """Parse entries in id order, returning how many were updated"""
+    updated = 0
+    last_id = 0
+    while True:
+        rows = storage.log_texts_after(last_id, batch_size, missing_events=not reparse)
+        if not rows:
+            break
+        storage.update_log_events([event_row(text) + (log_id,) for log_id, text in rows])
+        last_id = rows[-1][0]
+        updated += len(rows)
+        print(f"Parsed {updated} entries")
+    return updated
+
+def main():
+    """Main function"""
+    if len(sys.argv) > 1 and sys.argv[1] != '--all':
+        print("Usage:")
+        print("  python backfill_events.py         Parse entries that have no event columns yet")
+        print("  python backfill_events.py --all   Parse every entry again (after grammar changes)")
+        return
+    
+    config = ConfigLoader("config.json").config
+    storage = Storage(config)
+    updated = backfill(storage, reparse='--all' in sys.argv)
+    print(f"Done, {updated} entries updated")
+    storage.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Measure the image allocations of one monitoring cycle (OCR itself excluded) when every stage
+crops and converts the PIL screenshot itself, against one Frame shared by all stages
+"""
+
+import io
+import os
+import sys
+import time
+import tracemalloc
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+from config_loader import ConfigLoader
+from state_detector import StateDetector
+from log_processor import LogProcessor
+from ocr_cache import OCRCache
+from image_stats import blank_regions, grayscale_array, is_blank
+from frame import Frame, FRAME_REGIONS
+
+MEMBER_PIXELS = [(630, 207), (702, 340), (702, 889)]
+
+
+def legacy_cycle(image, detector, processor):
+    """The image work of a cycle as it was, each stage cropping the screenshot itself"""
+    detector.detect_state(image)
+    # LogProcessor - a crop per line, the whole screenshot in grayscale for blank lines,
+    # then a grayscale resize and a byte copy of every line
+    boxes = processor.get_line_boxes(image.height)
+    lines = [image.crop(box) for box in boxes]
+    blank = blank_regions(image, boxes, processor.blank_line_std)
+    fingerprints = [processor.line_fingerprint(line) for line in lines]
+    keys = [OCRCache.make_key(line, 'bench') for line in lines]
+    # MemberProcessor - indicator pixels, count and name list crops
+    pixels = [image.getpixel(xy) for xy in MEMBER_PIXELS]
+    count = image.crop(FRAME_REGIONS['member_count'])
+    names = image.crop(FRAME_REGIONS['member_list'])
+    is_blank(names, 10)
+    # DiscordWebhook header
+    header = [image.crop(FRAME_REGIONS['day_header']), image.crop(FRAME_REGIONS['time_header'])]
+    # The line and member list images stay alive until the cycle ends, as they do in the bot
+    return blank, fingerprints, keys, lines, pixels, count, names, header
+
+
+def frame_cycle(image, detector, processor):
+    """The same work reading views of one Frame"""
+    frame = Frame(image)
+    detector.detect_state(frame.pixels)
+    boxes = processor.get_line_boxes(frame.height)
+    views = [frame.view(box) for box in boxes]
+    grays = [grayscale_array(view) for view in views]
+    blank = {i for i, gray in enumerate(grays) if is_blank(gray, processor.blank_line_std)}
+    fingerprints = [processor.line_fingerprint(gray) for gray in grays]
+    keys = [OCRCache.make_key(view, 'bench') for view in views]
+    # Only lines with text are made into images, for OCR and the stored entry images
+    lines = [frame.crop(box) for i, box in enumerate(boxes) if i not in blank]
+    pixels = [frame.getpixel(xy) for xy in MEMBER_PIXELS]
+    count = frame.crop('member_count')
+    is_blank(frame.view('member_list'), 10)
+    names = frame.crop('member_list')
+    header = [frame.crop('day_header'), frame.crop('time_header')]
+    # The line and member list images stay alive until the cycle ends, as they do in the bot
+    return blank, fingerprints, keys, lines, pixels, count, names, header
+
+
+@contextlib.contextmanager
+def counting_images():
+    """Count the PIL images created (crops, conversions, resizes) inside the block"""
+    counter = {'images': 0, 'bytes': 0}
+    original = Image.Image._new
+
+    def counted(self, im):
+        new = original(self, im)
+        counter['images'] += 1
+        counter['bytes'] += new.width * new.height * len(new.getbands())
+        return new
+
+    Image.Image._new = counted
+    try:
+        yield counter
+    finally:
+        Image.Image._new = original
+
+
+def measure(label, cycle, image, detector, processor, repeat):
+    """PIL images and traced memory (NumPy arrays and Python objects) of one cycle"""
+    cycle(image, detector, processor)  # Warm up caches
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    peak = 0
+    with counting_images() as counter:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            tracemalloc.reset_peak()
+            cycle(image, detector, processor)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.stop()
+    print(f"{label:<16} {counter['images'] / repeat:5.1f} PIL images/cycle "
+          f"({counter['bytes'] / repeat / 1024 / 1024:5.2f}MB) | traced peak {peak / 1024 / 1024:5.2f}MB | "
+          f"{elapsed * 1000:6.2f}ms")
+    return counter['images'] / repeat
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    if path:
+        image = Image.open(path).convert('RGB')
+    else:
+        # Noisy background with text-like rows in the top two thirds of the log panel
+        rng = np.random.default_rng(0)
+        pixels = rng.integers(0, 40, size=(1080, 1920, 3), dtype=np.uint8)
+        pixels[217:620, 780:1160:4] = 230
+        image = Image.fromarray(pixels)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        config = ConfigLoader('config.example.json')
+        processor = LogProcessor({'log_db': ':memory:', 'log_images_db': ':memory:',
+                                  'member_db': ':memory:', 'discord_sent_db': ':memory:',
+                                  'warm_state_interval': 0, 'ocr_cache_size': 0})
+    detector = StateDetector(config)
+    print(f"{image.width}x{image.height} screenshot, {len(processor.get_line_boxes(image.height))} log lines, "
+          f"{repeat} cycles\n")
+
+    old_images = measure("Per-stage crops", legacy_cycle, image, detector, processor, repeat)
+    new_images = measure("Shared Frame", frame_cycle, image, detector, processor, repeat)
+    print(f"\n{old_images - new_images:.0f} fewer PIL images per cycle")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Benchmark the pooled OCR engine against one tesseract process per line"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytesseract
+from PIL import Image
+from log_processor import LogProcessor
+from ocr_engine import OCREngine
+
+
+def load_lines(processor, folder):
+    """Crop every screenshot in the folder into resized log lines"""
+    screenshots = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith('.png'):
+            continue
+        image = Image.open(os.path.join(folder, name)).convert('RGB')
+        lines = []
+        for line in processor.crop_image_to_lines(image):
+            width, height = line.size
+            lines.append(line.resize((width * 2, height * 2)))
+        screenshots.append((name, lines))
+    return screenshots
+
+
+def run(screenshots, ocr, workers):
+    """OCR all lines of each screenshot in parallel, return texts and per-screenshot times"""
+    texts = []
+    timings = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for name, lines in screenshots:
+            start = time.perf_counter()
+            texts.append(list(executor.map(ocr, lines)))
+            timings.append(time.perf_counter() - start)
+    return texts, timings
+
+
+def report(label, timings, line_count):
+    total = sum(timings)
+    print(f"{label:<12} total {total:8.2f}s | per screenshot {total / len(timings) * 1000:8.1f}ms | "
+          f"per line {total / line_count * 1000:6.1f}ms")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python benchmarks/bench_ocr_pool.py <screenshot folder> [workers]")
+        return
+
+    folder = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    processor = LogProcessor({'log_db': ':memory:', 'log_images_db': ':memory:', 'warm_state_interval': 0})
+    screenshots = load_lines(processor, folder)
+    if not screenshots:
+        print(f"No screenshots found in {folder}")
+        return
+    line_count = sum(len(lines) for _, lines in screenshots)
+    print(f"Loaded {len(screenshots)} screenshots, {line_count} lines, {workers} workers\n")
+
+    config = processor.ocr_config
+    engine = OCREngine({'ocr_backend': 'pool', 'ocr_workers': workers})
+    if engine.backend != 'pool':
+        print("tesserocr is not installed - nothing to compare against")
+        return
+
+    # Warm up the pool so model loading is not counted against it
+    engine.image_to_string(screenshots[0][1][0], config=config)
+
+    spawn_texts, spawn_times = run(screenshots, lambda img: pytesseract.image_to_string(img, config=config), workers)
+    pool_texts, pool_times = run(screenshots, lambda img: engine.image_to_string(img, config=config), workers)
+    engine.close()
+
+    report("spawn", spawn_times, line_count)
+    report("pool", pool_times, line_count)
+    print(f"\nSpeedup: {sum(spawn_times) / sum(pool_times):.2f}x")
+
+    same = sum(1 for a, b in zip(sum(spawn_texts, []), sum(pool_texts, [])) if a.strip() == b.strip())
+    print(f"Identical text: {same}/{line_count} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Benchmark the array based region searches in PixelDetector against the per-pixel loops they replaced"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+from pixel_detector import PixelDetector
+
+TARGET = (0, 200, 255)
+OTHER = (255, 255, 255)
+
+
+def legacy_find_color_in_region(image, target_color, region, tolerance):
+    """find_color_in_region as it was, a Python loop over a NumPy array"""
+    x1, y1, x2, y2 = region
+    img_array = np.array(image)
+    target_array = np.array(target_color)
+    matches = []
+    for y in range(y1, y2):
+        for x in range(x1, x2):
+            if np.all(np.abs(img_array[y, x][:3] - target_array) <= tolerance):
+                matches.append((x, y))
+    return matches
+
+
+def legacy_find_first_color(detector, image, target_colors, region, tolerance):
+    """find_first_color as it was, getpixel for every pixel and every color"""
+    x1, y1, x2, y2 = region
+    for y in range(y1, y2):
+        for x in range(x1, x2):
+            pixel = image.getpixel((x, y))[:3]
+            for target_color in target_colors:
+                if detector.color_matches(pixel, target_color, tolerance):
+                    return (x, y, target_color)
+    return None
+
+
+def timed(label, function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<44} {elapsed * 1000:9.2f}ms")
+    return elapsed, result
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    # A noisy 1080p frame with the target color near the end of the region
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 120, size=(1080, 1920, 3), dtype=np.uint8)
+    region = (100, 100, 100 + size, 100 + size)
+    pixels[100 + size - 20:100 + size - 10, 100 + size // 2:100 + size // 2 + 10] = TARGET
+    image = Image.fromarray(pixels)
+    detector = PixelDetector(tolerance=10)
+    print(f"{size}x{size} region of a 1920x1080 frame\n")
+
+    old, old_matches = timed("find_color_in_region (loop)",
+                             lambda: legacy_find_color_in_region(image, TARGET, region, 10), repeat)
+    new, new_matches = timed("find_color_in_region (mask)",
+                             lambda: detector.find_color_in_region(image, TARGET, region), repeat)
+    print(f"  {old / new:.0f}x faster, same matches: {old_matches == new_matches}\n")
+
+    old, old_first = timed("find_first_color (getpixel loop)",
+                           lambda: legacy_find_first_color(detector, image, [OTHER, TARGET], region, 10), repeat)
+    new, new_first = timed("find_first_color (argmax)",
+                           lambda: detector.find_first_color(image, [OTHER, TARGET], region), repeat)
+    print(f"  {old / new:.0f}x faster, same result: {old_first == new_first} {new_first}\n")
+
+    old, old_percent = timed("color_in_region_percentage (match list)",
+                             lambda: len(legacy_find_color_in_region(image, TARGET, region, 10)) / size ** 2 * 100,
+                             repeat)
+    new, new_percent = timed("color_in_region_percentage (count_nonzero)",
+                             lambda: detector.color_in_region_percentage(image, TARGET, region), repeat)
+    print(f"  {old / new:.0f}x faster, {new_percent:.3f}% (was {old_percent:.3f}%)\n")
+
+    # Batch - 16 regions and 3 colors, one conversion of the box around them
+    regions = [(100 + 110 * i, 100 + 60 * (i % 4), 200 + 110 * i, 150 + 60 * (i % 4)) for i in range(16)]
+    colors = [TARGET, OTHER, (0, 0, 0)]
+    single, single_counts = timed("16 regions x 3 colors, one call each",
+                                  lambda: [[int(len(detector.find_color_in_region(image, color, r))) for color in colors]
+                                           for r in regions], repeat)
+    batch, batch_counts = timed("16 regions x 3 colors, count_colors_in_regions",
+                                lambda: detector.count_colors_in_regions(image, regions, colors), repeat)
+    print(f"  {single / batch:.1f}x faster, same counts: {batch_counts.tolist() == single_counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark the compiled replacement engine against the old str.replace loop"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_corrections import ReplacementEngine
+
+
+def legacy_apply(text, replacements, special_formatting):
+    """The apply_ocr_corrections loop as it was before the engine"""
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+
+    if special_formatting:
+        spacing_words = special_formatting.get('word_spacing', [])
+        for word in spacing_words:
+            text = text.replace(word, f" {word} ")
+            text = text.replace(f"  {word}", f" {word}")
+            text = text.replace(f"{word}  ", f"{word} ")
+            text = text.replace(f"{word} !", f"{word}!")
+
+        clean_endings = special_formatting.get('clean_endings', {})
+        if clean_endings.get('remove_quotes'):
+            text = text.replace("'", "'").replace("'", "'").replace('"', "'")
+            text = text.replace("''", "'")
+
+        if clean_endings.get('fix_parentheses'):
+            text = text.replace("{", "(").replace("}", ")")
+            text = text.replace(")))", ")!")
+            text = text.replace("'l", "'!")
+
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def engine_apply(text, engine):
+    """apply_ocr_corrections as it is now"""
+    return ' '.join(engine.apply(text).split())
+
+
+def main():
+    log_db = sys.argv[1] if len(sys.argv) > 1 else './log.db'
+    replacements_file = sys.argv[2] if len(sys.argv) > 2 else 'replacements.json'
+    rounds = 20
+
+    with open(replacements_file, 'r') as f:
+        data = json.load(f)
+    replacements = data.get('replacements', {})
+    special_formatting = data.get('special_formatting', {})
+
+    with sqlite3.connect(log_db) as conn:
+        lines = [row[0] for row in conn.execute('SELECT entry_text FROM logs ORDER BY id DESC LIMIT 5000')]
+    if not lines:
+        print(f"No log entries found in {log_db}")
+        return
+
+    start = time.perf_counter()
+    engine = ReplacementEngine.from_config(replacements, special_formatting)
+    compile_time = time.perf_counter() - start
+    print(f"{len(lines)} lines, {len(engine.rules)} rules compiled in {compile_time * 1000:.1f}ms\n")
+
+    mismatches = [line for line in lines
+                  if legacy_apply(line, replacements, special_formatting) != engine_apply(line, engine)]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for line in lines:
+            legacy_apply(line, replacements, special_formatting)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for line in lines:
+            engine_apply(line, engine)
+    engine_time = time.perf_counter() - start
+
+    calls = rounds * len(lines)
+    print(f"legacy loop  {legacy_time / calls * 1e6:8.1f}us per line")
+    print(f"engine       {engine_time / calls * 1e6:8.1f}us per line")
+    print(f"\nSpeedup: {legacy_time / engine_time:.2f}x")
+    print(f"Output differences: {len(mismatches)}")
+    for line in mismatches[:5]:
+        print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""Benchmark and check the accuracy of the edit-distance log entry matching against the old positional one"""
+
+import os
+import re
+import sys
+import time
+import random
+import sqlite3
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import text_similarity
+from text_similarity import is_similar_log_entry
+
+PREFIX_PATTERN = re.compile(r'^Day (\d+), (\d{2}):(\d{2}):(\d{2}):')
+
+# Messages and the OCR confusions seen in real log panels, for the synthetic corpus
+MESSAGES = [
+    "Your Rex - Lvl 150 was killed!",
+    "Alice demolished a 'Metal Wall'!",
+    "Bob Tamed a Argentavis - Lvl 224 (Argentavis)!",
+    "Tribemember Carol - Lvl 105 was killed by an enemy!",
+    "Dave claimed 'Baby Giganotosaurus - Lvl 12'!",
+    "Your Tribe killed Wild Raptor - Lvl 30 (Raptor)!",
+    "Erin was promoted to Admin!",
+    "Frank uploaded a Therizinosaur - Lvl 190!",
+]
+CONFUSIONS = [('l', 'I'), ('I', 'l'), ('rn', 'm'), ('m', 'rn'), ('O', '0'), ('e', 'c'), ('d', 'a'), (' ', '  '), ('!', '')]
+# Letters read in place of digits
+DIGIT_CONFUSIONS = {'0': 'O', '1': 'l', '5': 'S', '8': 'B'}
+
+
+def legacy_is_similar_text(text1, text2, threshold=5):
+    """is_similar_text as it was before the edit-distance engine"""
+    if abs(len(text1) - len(text2)) > 10:
+        return False
+    if len(text1) < 50:
+        differences = sum(1 for a, b in zip(text1, text2) if a != b)
+        return differences <= threshold
+    return text1[:30] == text2[:30]
+
+
+def load_pairs(log_db, limit, max_pairs):
+    """
+    Build labelled pairs from log.db
+    Entries with the same Day/time prefix are OCR variants of one event (should match).
+    The same message repeated at a different second of the same minute is a different
+    event, like several walls demolished in a row (should not match).
+    """
+    with sqlite3.connect(log_db) as conn:
+        texts = [row[0] for row in conn.execute('SELECT entry_text FROM logs ORDER BY id DESC LIMIT ?', (limit,))]
+
+    by_prefix = {}
+    by_minute = {}
+    for text in texts:
+        match = PREFIX_PATTERN.match(text)
+        if not match:
+            continue
+        by_prefix.setdefault(match.group(0), []).append(text)
+        # Group repeats by minute and message, e.g. "Day 10, 12:30" + " Alice demolished..."
+        by_minute.setdefault(match.group(0)[:-4] + text[match.end():], []).append(text)
+
+    variants = []
+    for group in by_prefix.values():
+        variants.extend(itertools.combinations(group, 2))
+
+    different = []
+    for group in by_minute.values():
+        for text1, text2 in itertools.combinations(group, 2):
+            if PREFIX_PATTERN.match(text1).group(0) != PREFIX_PATTERN.match(text2).group(0):
+                different.append((text1, text2))
+
+    random.seed(0)
+    random.shuffle(variants)
+    random.shuffle(different)
+    return variants[:max_pairs], different[:max_pairs]
+
+
+def ocr_noise(text, rng, edits):
+    """Apply a few OCR confusions to a message"""
+    for _ in range(edits):
+        options = [(a, b) for a, b in CONFUSIONS if a in text]
+        if not options:
+            break
+        a, b = rng.choice(options)
+        positions = [m.start() for m in re.finditer(re.escape(a), text)]
+        pos = rng.choice(positions)
+        text = text[:pos] + b + text[pos + len(a):]
+    return text
+
+
+def misread_digit(prefix, rng):
+    """Misread one digit of a Day/time prefix as a similar looking letter"""
+    positions = [i for i, char in enumerate(prefix) if char in DIGIT_CONFUSIONS]
+    if not positions:
+        return prefix
+    pos = rng.choice(positions)
+    return prefix[:pos] + DIGIT_CONFUSIONS[prefix[pos]] + prefix[pos + 1:]
+
+
+def synthetic_pairs(count, seed=0):
+    """
+    Labelled OCR-noisy pairs that need no log.db
+    Variants are the same event with a few message confusions and sometimes one timestamp
+    digit read as a letter. Different events are other messages in the same minute, and
+    the same message a second or a minute later.
+    """
+    rng = random.Random(seed)
+    variants = []
+    different = []
+    for _ in range(count):
+        day = rng.randint(1, 9999)
+        hours, minutes, seconds = rng.randint(0, 23), rng.randint(0, 58), rng.randint(0, 59)
+        prefix = f"Day {day}, {hours:02d}:{minutes:02d}:{seconds:02d}: "
+        message = rng.choice(MESSAGES)
+        text = prefix + message
+
+        noisy_prefix = misread_digit(prefix, rng) if rng.random() < 0.3 else prefix
+        variants.append((text, noisy_prefix + ocr_noise(message, rng, rng.randint(1, 3))))
+
+        other = rng.choice([m for m in MESSAGES if m != message])
+        different.append((text, prefix + ocr_noise(other, rng, 1)))
+        later = f"Day {day}, {hours:02d}:{minutes + 1:02d}:{(seconds + 17) % 60:02d}: "
+        different.append((text, later + ocr_noise(message, rng, 1)))
+        # A repeat one second later, one digit apart - never the same event on its own
+        next_second = f"Day {day}, {hours:02d}:{minutes:02d}:{seconds + 1:02d}: " if seconds < 59 else later
+        different.append((text, next_second + ocr_noise(message, rng, 1)))
+    return variants, different
+
+
+def compare_accuracy(variants, different):
+    """Variants matched and different events kept apart by the legacy and the new function"""
+    results = {}
+    for label, func in (("legacy", legacy_is_similar_text), ("levenshtein", is_similar_log_entry)):
+        matched = sum(1 for text1, text2 in variants if func(text1, text2))
+        rejected = sum(1 for text1, text2 in different if not func(text1, text2))
+        results[label] = (matched, rejected)
+        print(f"{label:<12} variants matched {matched:5d}/{len(variants):<5d} | "
+              f"different kept apart {rejected:5d}/{len(different):<5d}")
+    return results
+
+
+def check_synthetic_accuracy(count=2000):
+    """The new matching must be at least as accurate as the legacy one on OCR-noisy pairs"""
+    variants, different = synthetic_pairs(count)
+    print(f"Synthetic corpus: {len(variants)} OCR variant pairs, {len(different)} different-event pairs")
+    results = compare_accuracy(variants, different)
+    legacy, new = results["legacy"], results["levenshtein"]
+    ok = new[0] >= legacy[0] and new[1] >= legacy[1]
+    print(f"Accuracy {'OK' if ok else 'REGRESSED'} against legacy\n")
+    return ok
+
+
+def time_pairs(func, pairs, rounds=5):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text1, text2 in pairs:
+            func(text1, text2)
+    return (time.perf_counter() - start) / (rounds * len(pairs))
+
+
+def main():
+    if not check_synthetic_accuracy():
+        sys.exit(1)
+
+    log_db = sys.argv[1] if len(sys.argv) > 1 else './log.db'
+    if not os.path.exists(log_db):
+        print(f"{log_db} not found, skipping the log.db comparison")
+        return
+    variants, different = load_pairs(log_db, limit=20000, max_pairs=5000)
+    if not variants and not different:
+        print(f"No comparable entries found in {log_db}")
+        return
+
+    backend = 'rapidfuzz' if text_similarity._rapidfuzz_levenshtein is not None else 'bit-parallel'
+    print(f"{len(variants)} OCR variant pairs, {len(different)} repeated-event pairs, backend: {backend}\n")
+
+    for label, func in (("legacy", legacy_is_similar_text), ("levenshtein", is_similar_log_entry)):
+        matched = sum(1 for text1, text2 in variants if func(text1, text2))
+        rejected = sum(1 for text1, text2 in different if not func(text1, text2))
+        per_pair = time_pairs(func, variants + different)
+        print(f"{label:<12} variants matched {matched:5d}/{len(variants):<5d} | "
+              f"repeats kept apart {rejected:5d}/{len(different):<5d} | {per_pair * 1e6:6.1f}us per pair")
+
+    # Show a few variants only the new engine recognises
+    gained = [(a, b) for a, b in variants if is_similar_log_entry(a, b) and not legacy_is_similar_text(a, b)]
+    if gained:
+        print(f"\nVariants only matched by levenshtein: {len(gained)}")
+        for text1, text2 in gained[:5]:
+            print(f"  {text1}\n  {text2}\n")
+
+
+if __name__ == "__main__":
+    main()
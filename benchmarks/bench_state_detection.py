@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark state detection with the compiled signature matcher against the per-pixel loop it replaced,
+and the sticky last-state fast path in the steady state
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+from config_loader import ConfigLoader
+from pixel_detector import PixelDetector
+from state_detector import StateDetector
+
+
+def legacy_detect_state(config, detector, screenshot):
+    """detect_state as it was before the signature matcher, one check_pixel_color per pixel"""
+    variance = config.config.get("variance_percent")
+    for is_error, names in ((True, config.get_all_error_states()), (False, config.get_all_states())):
+        for state_name in names:
+            state = config.get_error_state(state_name) if is_error else config.get_state(state_name)
+            pixels = state.get("detection_pixels", [])
+            if not pixels:
+                continue
+            matches = 0
+            for pixel in pixels:
+                x, y, expected = pixel.get("x"), pixel.get("y"), pixel.get("color")
+                if x is None or y is None or expected is None:
+                    continue
+                if detector.check_pixel_color(screenshot, x, y, expected, variance_percent=variance):
+                    matches += 1
+                else:
+                    actual = detector.get_pixel_color(screenshot, x, y)
+                    print(f"State '{state_name}' pixel mismatch at ({x},{y}): expected {expected}, got {actual}")
+            if matches == len(pixels):
+                return state_name
+    return None
+
+
+def paint_state(config, state_name, size):
+    """A frame with a state's detection pixels painted (slightly off color)"""
+    image = Image.new('RGB', size, (20, 20, 20))
+    access = image.load()
+    for pixel in config.get_state(state_name).get("detection_pixels", []):
+        if 0 <= pixel["x"] < size[0] and 0 <= pixel["y"] < size[1]:
+            access[pixel["x"], pixel["y"]] = tuple(max(0, min(255, c + random.randint(-3, 3)))
+                                                    for c in pixel["color"][:3])
+    return image
+
+
+def build_frames(config, size):
+    """One frame per state with its detection pixels painted, plus a blank one"""
+    random.seed(0)
+    frames = [(state_name, paint_state(config, state_name, size)) for state_name in config.get_all_states()]
+    frames.append((None, Image.new('RGB', size, (20, 20, 20))))
+    return frames
+
+
+def check_shadowing(config, pixel_detector, size):
+    """
+    The sticky fast path must give the same answer as a full scan when one state's pixels
+    are a subset of another's - like in_game_no_hud inside in_game_with_hud, where turning
+    the HUD back on has to be seen straight away
+    """
+    pixel_sets = {name: {(p["x"], p["y"]) for p in config.get_state(name).get("detection_pixels", [])}
+                  for name in config.get_all_states()}
+    pairs = [(small, large) for small in pixel_sets for large in pixel_sets
+             if small != large and pixel_sets[small] and pixel_sets[small] < pixel_sets[large]]
+    sticky = StateDetector(config, pixel_detector)
+    sticky.full_scan_interval = 10 ** 9
+    full_scan = StateDetector(config, pixel_detector)
+    full_scan.full_scan_interval = 0
+    disagreements = 0
+    for small, large in pairs:
+        frames = [np.asarray(paint_state(config, name, size)) for name in (small, large, small, large)]
+        for frame in (frame for frame in frames for _ in range(3)):
+            if sticky.detect_state(frame) != full_scan.detect_state(frame):
+                disagreements += 1
+    print(f"Subset state pairs: {len(pairs)}, sticky/full scan disagreements: {disagreements}")
+    return disagreements == 0
+
+
+def timed(label, detect, frames, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [detect(frame) for frame in frames]
+    elapsed = (time.perf_counter() - start) / (repeat * len(frames))
+    print(f"{label:<34} {elapsed * 1e6:9.1f}us per frame")
+    return elapsed, results
+
+
+def main():
+    config_path = sys.argv[1] if len(sys.argv) > 1 else 'config.example.json'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        config = ConfigLoader(config_path)
+    pixel_detector = PixelDetector(tolerance=config.config.get("tolerance", 10),
+                                   variance_percent=config.config.get("variance_percent"))
+    detector = StateDetector(config, pixel_detector)
+    detector.full_scan_interval = 0  # Every frame is a different state here
+    matcher = detector.matcher
+    print(f"{len(matcher.states)} states, {len(matcher.xs)} detection pixels\n")
+
+    frames = build_frames(config, (1920, 1080))
+    images = [image for _, image in frames]
+    arrays = [np.asarray(image) for image in images]
+
+    # The legacy loop printed every mismatch, that output is discarded but still paid for
+    def legacy_quiet(image):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return legacy_detect_state(config, pixel_detector, image)
+
+    legacy, legacy_results = timed("Per-pixel loop (PIL image)", legacy_quiet, images, repeat)
+    pil, pil_results = timed("Signature matcher (PIL image)", detector.detect_state, images, repeat)
+    array, array_results = timed("Signature matcher (frame array)", detector.detect_state, arrays, repeat)
+    print(f"\n{legacy / pil:.1f}x faster on PIL images, {legacy / array:.1f}x on frame arrays")
+
+    expected = [state_name for state_name, _ in frames]
+    print(f"Agreement with legacy: {sum(a == b for a, b in zip(legacy_results, pil_results))}/{len(frames)} (PIL), "
+          f"{sum(a == b for a, b in zip(legacy_results, array_results))}/{len(frames)} (array)")
+    print(f"Painted state found:   {sum(a == b for a, b in zip(expected, array_results))}/{len(frames)}")
+
+    # Steady state - a login sequence, then sitting on the last screen
+    by_state = dict(zip(expected, arrays))
+    names = [name for name in config.get_all_states()]
+    sequence = [by_state[name] for name in names for _ in range(3)] + [by_state[names[-1]]] * 200
+    full_scan = StateDetector(config, pixel_detector)
+    full_scan.full_scan_interval = 0
+    sticky = StateDetector(config, pixel_detector)
+    for frame in sequence[:-200] + [by_state[names[-2]]] * 3 + [by_state[names[-1]]] * 3:
+        full_scan.detect_state(frame)
+        sticky.detect_state(frame)
+    steady = sequence[-200:]
+    print(f"\nSteady state on '{names[-1]}' ({len(steady)} frames)")
+    for label, frames in (("PIL image", [Image.fromarray(frame) for frame in steady]), ("frame array", steady)):
+        scan, _ = timed(f"Full scan ({label})", full_scan.detect_state, frames, repeat)
+        hits, scans = sticky.fast_path_hits, sticky.full_scans
+        fast, results = timed(f"Sticky state first ({label})", sticky.detect_state, frames, repeat)
+        print(f"  {scan / fast:.1f}x faster, {sticky.fast_path_hits - hits} fast path hits, "
+              f"{sticky.full_scans - scans} full scans, "
+              f"{sum(result == names[-1] for result in results)}/{len(results)} correct")
+    likely = [name for name in sticky.likely_states() if name]
+    pixels = sum(len(matcher.state_pixels[position]) for position in sticky._likely_positions)
+    print(f"Pixels on the fast path: at most {pixels} of {len(matcher.xs)} ({', '.join(likely)} "
+          f"and the states that could shadow them)\n")
+
+    if not check_shadowing(config, pixel_detector, (1920, 1080)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Benchmark line strip encodings and content-addressed dedup against one PNG per entry"""
+
+import os
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from log_processor import LogProcessor
+from line_images import ENCODINGS, encode_strip, strip_hash
+
+
+def load_strips(processor, folder):
+    """Crop every screenshot in the folder into log line strips"""
+    strips = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith('.png'):
+            image = Image.open(os.path.join(folder, name)).convert('RGB')
+            strips.extend(processor.crop_image_to_lines(image))
+    return strips
+
+
+def measure(label, strips, encode):
+    start = time.perf_counter()
+    total = sum(len(encode(strip)) for strip in strips)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {total / 1024:9.1f}KB | {total / len(strips):7.0f} bytes/strip | "
+          f"{elapsed / len(strips) * 1000:6.2f}ms/strip")
+    return total
+
+
+def legacy_png(image):
+    """Default PNG settings, as the combined entry images were saved"""
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def palette_png(image):
+    """64 colour palette PNG - lossy, shown for reference only"""
+    buffer = BytesIO()
+    image.quantize(64).save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python benchmarks/bench_strip_encoding.py <screenshot folder>")
+        return
+
+    processor = LogProcessor({'log_db': ':memory:', 'log_images_db': ':memory:', 'ocr_cache_size': 0, 'warm_state_interval': 0})
+    strips = load_strips(processor, sys.argv[1])
+    if not strips:
+        print(f"No screenshots found in {sys.argv[1]}")
+        return
+
+    unique = {}
+    for strip in strips:
+        unique.setdefault(strip_hash(strip), strip)
+    unique = list(unique.values())
+    print(f"{len(strips)} line strips, {len(unique)} distinct ({len(strips) / len(unique):.1f}x dedup)\n")
+
+    print("All strips:")
+    legacy_total = measure("png (legacy default)", strips, legacy_png)
+    for fmt in ENCODINGS:
+        measure(fmt, strips, lambda strip: encode_strip(strip, fmt))
+    measure("palette png (lossy)", strips, palette_png)
+
+    print("\nDistinct strips only (what the content-addressed store encodes):")
+    for fmt in ENCODINGS:
+        total = measure(fmt, unique, lambda strip: encode_strip(strip, fmt))
+        print(f"{'':<22} {legacy_total / total:.1f}x smaller than legacy PNG for every strip")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark seen-entry startup from a saved Bloom filter and id cursor against reading the newest entries"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import Storage
+from seen_set import SeenEntrySet
+
+MESSAGES = [
+    "Your Rex - Lvl {n} (Rex) was killed by Raptor - Lvl 30 (Raptor)!",
+    "Alice Tamed a Parasaur - Lvl {n} (Parasaur)!",
+    "Bob demolished a 'Stone Wall' ({n})!",
+    "Your 'Wooden Foundation' ({n}) was auto-decay destroyed!",
+]
+
+
+def entry(n):
+    day, seconds = divmod(n * 7, 86400)
+    return (f"Day {day}, {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}: "
+            + MESSAGES[n % len(MESSAGES)].format(n=n))
+
+
+def build_database(storage, rows):
+    """Fill log.db with synthetic entries, in batches"""
+    conn = storage.connection('log')
+    existing = storage.log_count()
+    for start in range(existing, rows, 50000):
+        batch = [(entry(n),) for n in range(start, min(rows, start + 50000))]
+        with conn:
+            conn.executemany('INSERT OR IGNORE INTO logs (entry_text) VALUES (?)', batch)
+        print(f"  {min(rows, start + 50000)} rows", end='\r')
+    print()
+
+
+def timed(label, seen):
+    start = time.perf_counter()
+    count = seen.load()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed * 1000:8.1f}ms | {count} entries")
+    return elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), 'bench_warm_start.db')
+    new_rows = 1000
+
+    storage = Storage({'log_db': path, 'log_images_db': ':memory:',
+                       'member_db': ':memory:', 'discord_sent_db': ':memory:'})
+    if storage.log_count() < rows:
+        print(f"Building {path} with {rows} entries...")
+        build_database(storage, rows)
+    rows = storage.log_count()
+    print(f"{rows} entries in {path}\n")
+
+    # Cold start - no saved state, reads the newest entries up to the Bloom capacity
+    conn = storage.connection('log')
+    with conn:
+        conn.execute("DELETE FROM bot_state WHERE key LIKE 'seen_entries%'")
+    cold = timed("Cold start (newest entries)", SeenEntrySet(storage))
+
+    # Warm start - restore the saved filter, read only what was saved after it
+    seen = SeenEntrySet(storage)
+    seen.load()
+    seen.save_state()
+    with conn:
+        conn.executemany('INSERT OR IGNORE INTO logs (entry_text) VALUES (?)',
+                         [(entry(n),) for n in range(rows, rows + new_rows)])
+    warm_seen = SeenEntrySet(storage)
+    warm = timed(f"Warm start (+{new_rows} after cursor)", warm_seen)
+    print(f"{cold / warm:.1f}x faster\n")
+
+    # Old, new and unknown entries must all be answered correctly
+    random.seed(0)
+    known = [entry(n) for n in random.sample(range(rows - 100000, rows + new_rows), 1000)]
+    unknown = [entry(n) for n in range(rows + new_rows, rows + new_rows + 1000)]
+    print(f"Known entries found:   {sum(text in warm_seen for text in known)}/{len(known)}")
+    print(f"Unknown entries found: {sum(text in warm_seen for text in unknown)}/{len(unknown)}")
+    print(f"Stats: {warm_seen.stats()}")
+
+    # Leave the file as it was built
+    with conn:
+        conn.execute('DELETE FROM logs WHERE id > ?', (rows,))
+    storage.close()
+
+
+if __name__ == "__main__":
+    main()
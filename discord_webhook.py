@@ -1,13 +1,40 @@
 import os
 import json
-import sqlite3
 import requests
 import subprocess
 import time
 from datetime import datetime
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
+from storage import get_storage
+from line_images import decode_strip, stack_images
+from event_parser import parse_event
+from frame import FRAME_REGIONS
 
+# Emoji shown in front of each entry, by event type
+EVENT_EMOJI = {
+    'starved': '🍖',
+    'death_essence': '👻',
+    'killed': '💀',
+    'tribe_added': '✅',
+    'tribe_removed': '❌',
+    'promoted': '⬆️',
+    'demoted': '⬇️',
+    'tamed': '🦖',
+    'baby': '🥚',
+    'demolished': '🔨',
+    'c4': '💣',
+    'destroyed': '💥',
+    'decayed': '⏰',
+    'froze': '❄️',
+    'unclaimed': '🔓',
+    'uploaded': '⬆️',
+    'downloaded': '⬇️',
+    'enemy': '⚔️',
+    'wyvern': '🐉',
+    'griffin': '🦅',
+    'phoenix': '🔥',
+}
 
 class DiscordWebhook:
     def __init__(self, config):
@@ -19,7 +46,7 @@ class DiscordWebhook:
         self.log_db_path = config.get('log_db', './log.db')
         self.log_images_db_path = config.get('log_images_db', './log_images.db')
         self.member_db_path = config.get('member_db', './member.db')
-        self.discord_sent_db_path = './discord_sent.db'  # Track what's been sent
+        self.discord_sent_db_path = config.get('discord_sent_db', './discord_sent.db')  # Track what's been sent
         self.last_sent_log_id = self.load_last_sent_id()
         self.discord_post_interval = config.get('discord_post_interval', 60)  # Default 60 seconds
         self.last_discord_post_time = self.load_last_post_time()
@@ -33,17 +60,9 @@ class DiscordWebhook:
     def init_discord_sent_db(self):
         """Initialize database to track sent Discord messages"""
         try:
-            with sqlite3.connect(self.discord_sent_db_path) as conn:
-                conn.execute('''
-                    CREATE TABLE IF NOT EXISTS discord_sent (
-                        image_guid TEXT PRIMARY KEY,
-                        log_id INTEGER,
-                        entry_text TEXT,
-                        sent_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                conn.execute('CREATE INDEX IF NOT EXISTS idx_sent_timestamp ON discord_sent(sent_timestamp)')
-                print("Discord: Initialized sent tracking database")
+            # Shared connections (WAL, one per thread) - creates the tables on first use
+            self.storage = get_storage(self.config)
+            print("Discord: Initialized sent tracking database")
         except Exception as e:
             print(f"Discord: Error initializing sent database: {e}")
     
@@ -52,9 +71,7 @@ class DiscordWebhook:
         if not image_guid:
             return False
         try:
-            with sqlite3.connect(self.discord_sent_db_path) as conn:
-                cursor = conn.execute('SELECT 1 FROM discord_sent WHERE image_guid = ?', (image_guid,))
-                return cursor.fetchone() is not None
+            return self.storage.is_log_sent(image_guid)
         except:
             return False
     
@@ -63,13 +80,8 @@ class DiscordWebhook:
         if not log.get('image_id'):
             return
         try:
-            with sqlite3.connect(self.discord_sent_db_path) as conn:
-                conn.execute('''
-                    INSERT OR IGNORE INTO discord_sent (image_guid, log_id, entry_text)
-                    VALUES (?, ?, ?)
-                ''', (log['image_id'], log['id'], log['text']))
-                conn.commit()
-                print(f"Discord: Marked as sent - ID: {log['id']}, GUID: {log['image_id']}")
+            self.storage.mark_log_sent(log['image_id'], log['id'], log['text'])
+            print(f"Discord: Marked as sent - ID: {log['id']}, GUID: {log['image_id']}")
         except Exception as e:
             print(f"Discord: Error marking log as sent: {e}")
         
@@ -134,19 +146,12 @@ class DiscordWebhook:
     def get_online_members_count(self):
         """Get count of online members from database"""
         try:
-            with sqlite3.connect(self.member_db_path) as conn:
-                # Get the most recent snapshot
-                cursor = conn.execute('''
-                    SELECT member_count 
-                    FROM member_snapshots 
-                    ORDER BY timestamp DESC 
-                    LIMIT 1
-                ''')
-                row = cursor.fetchone()
-                if row:
-                    # This now returns the OCR count from the "X/Y" display
-                    print(f"Discord: Got member count from DB: {row[0]}")
-                    return row[0]
+            # Get the most recent snapshot
+            snapshot = self.storage.latest_snapshot()
+            if snapshot:
+                # This now returns the OCR count from the "X/Y" display
+                print(f"Discord: Got member count from DB: {snapshot[0]}")
+                return snapshot[0]
         except Exception as e:
             print(f"Discord: Error getting member count: {e}")
         return 0
@@ -154,18 +159,10 @@ class DiscordWebhook:
     def get_online_members_list(self):
         """Get list of online members from database"""
         try:
-            with sqlite3.connect(self.member_db_path) as conn:
-                # Get the most recent snapshot
-                cursor = conn.execute('''
-                    SELECT members 
-                    FROM member_snapshots 
-                    ORDER BY timestamp DESC 
-                    LIMIT 1
-                ''')
-                row = cursor.fetchone()
-                if row and row[0]:
-                    # Split comma-separated list
-                    return [m.strip() for m in row[0].split(',') if m.strip()]
+            # Get the most recent snapshot
+            snapshot = self.storage.latest_snapshot()
+            if snapshot:
+                return snapshot[1]
         except:
             pass
         return []
@@ -173,14 +170,7 @@ class DiscordWebhook:
     def get_all_members_with_status(self):
         """Get all members with their online/offline status"""
         try:
-            with sqlite3.connect(self.member_db_path) as conn:
-                cursor = conn.execute('''
-                    SELECT name, is_online 
-                    FROM members 
-                    WHERE last_seen > datetime("now", "-1 day")
-                    ORDER BY is_online DESC, name ASC
-                ''')
-                return [(row[0], row[1]) for row in cursor]
+            return self.storage.members_with_status()
         except:
             pass
         return []
@@ -188,19 +178,12 @@ class DiscordWebhook:
     def get_latest_game_info(self):
         """Get the latest game day and time from database"""
         try:
-            with sqlite3.connect(self.log_db_path) as conn:
-                cursor = conn.execute('''
-                    SELECT day, time, id, entry_text 
-                    FROM logs 
-                    ORDER BY day DESC, time DESC 
-                    LIMIT 1
-                ''')
-                row = cursor.fetchone()
-                if row:
-                    print(f"Discord: Latest game info from DB - Day {row[0]}, {row[1]} (ID: {row[2]})")
-                    return row[0], row[1]
-                else:
-                    print("Discord: No logs found in database")
+            row = self.storage.latest_game_info()
+            if row:
+                print(f"Discord: Latest game info from DB - Day {row[0]}, {row[1]} (ID: {row[2]})")
+                return row[0], row[1]
+            else:
+                print("Discord: No logs found in database")
         except Exception as e:
             print(f"Discord: Error getting latest game info: {e}")
         return None, None
@@ -209,32 +192,15 @@ class DiscordWebhook:
         """Get new log entries since last sent"""
         new_logs = []
         try:
-            with sqlite3.connect(self.log_db_path) as conn:
-                # First, let's see what the latest ID in the database is
-                cursor = conn.execute('SELECT MAX(id) FROM logs')
-                max_db_id = cursor.fetchone()[0] or 0
-                
-                print(f"Discord: Checking for new logs. Last sent ID: {self.last_sent_log_id}, Max DB ID: {max_db_id}")
-                
-                cursor = conn.execute('''
-                    SELECT id, day, time, entry_text, image_id 
-                    FROM logs 
-                    WHERE id > ? 
-                    ORDER BY id ASC
-                    LIMIT 10
-                ''', (self.last_sent_log_id,))
-                
-                for row in cursor:
-                    new_logs.append({
-                        'id': row[0],
-                        'day': row[1],
-                        'time': row[2],
-                        'text': row[3],
-                        'image_id': row[4]
-                    })
-                
-                if new_logs:
-                    print(f"Discord: Found {len(new_logs)} new logs (IDs {new_logs[0]['id']} to {new_logs[-1]['id']})")
+            # First, let's see what the latest ID in the database is
+            max_db_id = self.storage.max_log_id()
+            
+            print(f"Discord: Checking for new logs. Last sent ID: {self.last_sent_log_id}, Max DB ID: {max_db_id}")
+            
+            new_logs = self.storage.logs_since(self.last_sent_log_id, limit=10)
+            
+            if new_logs:
+                print(f"Discord: Found {len(new_logs)} new logs (IDs {new_logs[0]['id']} to {new_logs[-1]['id']})")
         except Exception as e:
             print(f"Error getting new logs: {e}")
         
@@ -246,15 +212,13 @@ class DiscordWebhook:
             return None
             
         try:
-            with sqlite3.connect(self.log_images_db_path) as conn:
-                cursor = conn.execute('''
-                    SELECT image_data 
-                    FROM log_images 
-                    WHERE id = ?
-                ''', (image_id,))
-                row = cursor.fetchone()
-                if row:
-                    return Image.open(BytesIO(row[0]))
+            # Entries are stored as line strips, older ones as one combined PNG
+            strips = self.storage.get_log_image_strips(image_id)
+            if strips:
+                return stack_images([decode_strip(data) for data in strips])
+            image_data = self.storage.get_log_image(image_id)
+            if image_data:
+                return Image.open(BytesIO(image_data))
         except:
             pass
         return None
@@ -307,9 +271,9 @@ class DiscordWebhook:
         if screenshot:
             try:
                 # Day region: x=25, y=36 (moved down 4px), width=152-25=127, height=65-36=29
-                day_region = screenshot.crop((25, 36, 152, 65))
+                day_region = screenshot.crop(FRAME_REGIONS['day_header'])
                 # Time region: x=31, y=89, width=99-31=68, height=112-89=23
-                time_region = screenshot.crop((31, 89, 99, 112))
+                time_region = screenshot.crop(FRAME_REGIONS['time_header'])
                 
                 # Paste them into our image - top left corner
                 img.paste(day_region, (padding, y))
@@ -407,20 +371,8 @@ class DiscordWebhook:
             return
         
         try:
-            # Sort logs by day and time to ensure chronological order
-            def parse_log_time(log):
-                """Extract day and time for sorting"""
-                try:
-                    day = log.get('day', 0)
-                    time_str = log.get('time', '00:00:00')
-                    time_parts = time_str.split(':')
-                    total_seconds = int(time_parts[0]) * 3600 + int(time_parts[1]) * 60 + int(time_parts[2])
-                    return (day, total_seconds)
-                except:
-                    return (0, 0)
-            
-            # Sort logs by day and time (newest first for Discord display)
-            sorted_logs = sorted(logs, key=parse_log_time, reverse=True)
+            # Sort logs by game time (newest first for Discord display), entries without one last
+            sorted_logs = sorted(logs, key=lambda log: log.get('game_seconds') or 0, reverse=True)
             
             # Get server and member info
             total_players = self.get_server_info()
@@ -439,7 +391,7 @@ class DiscordWebhook:
             max_id = self.last_sent_log_id
             for log in sorted_logs:
                 log_text = log['text']
-                emoji = self.get_log_emoji(log_text)
+                emoji = self.get_log_emoji(log_text, log.get('event_type'))
                 message_lines.append(f"{emoji} {log_text}")
                 # Track the highest ID we're sending (still use original logs for ID tracking)
                 if log['id'] > max_id:
@@ -636,71 +588,11 @@ class DiscordWebhook:
         except Exception as e:
             print(f"Error sending member update: {e}")
     
-    def get_log_emoji(self, log_text):
-        """Get appropriate emoji based on log content"""
-        log_lower = log_text.lower()
-        
-        # Death/Kill events (check these first as they're most specific)
-        if 'starved to death' in log_lower:
-            return '🍖'
-        elif 'death essence expired' in log_lower:
-            return '👻'
-        elif 'killed' in log_lower:
-            return '💀'
-        
-        # Tribe management
-        elif 'added to the tribe' in log_lower:
-            return '✅'
-        elif 'removed from the tribe' in log_lower:
-            return '❌'
-        elif 'promoted' in log_lower:
-            return '⬆️'
-        elif 'demoted' in log_lower:
-            return '⬇️'
-        
-        # Taming/Breeding
-        elif 'tamed' in log_lower:
-            return '🦖'
-        elif 'claimed baby' in log_lower or 'hatched' in log_lower:
-            return '🥚'
-        
-        # Building/Structure
-        elif 'demolished' in log_lower:
-            return '🔨'
-        elif 'c4 charge' in log_lower:
-            return '💣'
-        elif 'destroyed' in log_lower:
-            return '💥'
-        elif 'auto-decay' in log_lower or 'decayed' in log_lower:
-            return '⏰'
-        
-        # Creature management
-        elif 'froze' in log_lower:
-            return '❄️'
-        elif 'unclaimed' in log_lower:
-            return '🔓'
-        
-        # Upload/Download
-        elif 'uploaded' in log_lower:
-            return '⬆️'
-        elif 'downloaded' in log_lower:
-            return '⬇️'
-        
-        # Combat
-        elif 'enemy' in log_lower:
-            return '⚔️'
-        
-        # Special creatures
-        elif 'wyvern' in log_lower:
-            return '🐉'
-        elif 'griffin' in log_lower or 'griffed' in log_lower:
-            return '🦅'
-        elif 'phoenix' in log_lower:
-            return '🔥'
-        
-        # Default
-        else:
-            return '📝'
+    def get_log_emoji(self, log_text, event_type=None):
+        """Get appropriate emoji based on the entry's event type, parsed now if it was not stored"""
+        if event_type is None:
+            event_type = parse_event(log_text)['event_type']
+        return EVENT_EMOJI.get(event_type, '📝')
     
     def send_member_update(self):
         """Send online members list to members webhook"""
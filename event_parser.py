@@ -0,0 +1,196 @@
+import re
+
+# Event types in priority order - when an entry mentions several, the first one wins
+# (the order the Discord emoji used to be picked in). Each type has the keywords that
+# mark it and optional patterns that pull the actor and target out of the entry.
+EVENT_GRAMMAR = (
+    ('starved', r'starved to death', [
+        r"^(?:Your |Tribemember )?(?P<target>.+?) starved to death",
+    ]),
+    ('death_essence', r'death essence expired', []),
+    ('killed', r'killed', [
+        r"^(?:Your |Tribemember )?(?P<target>.+?) was killed(?: by (?:an? )?(?P<actor>.+?))?[!.]*$",
+        r"^(?P<actor>.+?) killed (?:an? )?(?P<target>.+?)[!.]*$",
+    ]),
+    ('tribe_added', r'added to the tribe', [
+        r"^(?P<target>.+?) (?:was )?added to the Tribe(?: by (?P<actor>.+?))?[!.]*$",
+    ]),
+    ('tribe_removed', r'removed from the tribe', [
+        r"^(?P<target>.+?) (?:was )?removed from the Tribe(?: by (?P<actor>.+?))?[!.]*$",
+    ]),
+    ('promoted', r'promoted', [
+        r"^(?P<target>.+?) (?:was )?promoted(?:.*? by (?P<actor>.+?))?[!.]*$",
+    ]),
+    ('demoted', r'demoted', [
+        r"^(?P<target>.+?) (?:was )?demoted(?:.*? by (?P<actor>.+?))?[!.]*$",
+    ]),
+    ('tamed', r'tamed', [
+        r"^(?P<actor>.+?) Tamed (?:an? )?(?P<target>.+?)[!.]*$",
+    ]),
+    ('baby', r'claimed baby|hatched', [
+        r"^(?P<actor>.+?) claimed baby (?P<target>.+?)[!.]*$",
+    ]),
+    ('demolished', r'demolished', [
+        r"^(?P<actor>.+?) demolished (?:an? )?(?P<target>.+?)[!.]*$",
+    ]),
+    ('c4', r'c4 charge', [
+        r"^(?:Your )?(?P<target>.+?) was destroyed by (?:an? )?(?P<actor>.+?)[!.]*$",
+    ]),
+    ('destroyed', r'destroyed', [
+        r"^(?:Your )?(?P<target>.+?) was destroyed(?: by (?:an? )?(?P<actor>.+?))?[!.]*$",
+        r"^(?P<actor>.+?) destroyed (?:your |an? )?(?P<target>.+?)[!.]*$",
+    ]),
+    ('decayed', r'auto-decay|decayed', [
+        r"^(?:Your )?(?P<target>.+?) was (?:auto-decay )?destroyed[!.]*$",
+    ]),
+    ('froze', r'froze', [
+        r"^(?P<actor>.+?) froze (?P<target>.+?)[!.]*$",
+    ]),
+    ('unclaimed', r'unclaimed', [
+        r"^(?P<actor>.+?) unclaimed (?P<target>.+?)[!.]*$",
+    ]),
+    ('uploaded', r'uploaded', [
+        r"^(?P<actor>.+?) uploaded (?:an? )?(?P<target>.+?)[!.]*$",
+    ]),
+    ('downloaded', r'downloaded', [
+        r"^(?P<actor>.+?) downloaded (?:an? )?(?P<target>.+?)[!.]*$",
+    ]),
+    ('enemy', r'enemy', []),
+    ('wyvern', r'wyvern', []),
+    ('griffin', r'griffin|griffed', []),
+    ('phoenix', r'phoenix', []),
+    ('harvested', r'harvested', [
+        r"^(?P<actor>.+?) harvested (?:an? )?(?P<target>.+?)[!.]*$",
+    ]),
+)
+
+OTHER = 'other'
+
+# Columns filled from each entry, in the order they are stored
+EVENT_COLUMNS = ('event_type', 'actor', 'target', 'creature', 'level', 'game_seconds')
+
+# One pass over the entry finds every keyword, the group name says which type it marks
+KEYWORD_PATTERN = re.compile(
+    '(?=' + '|'.join(f'(?P<{event_type}>{keywords})' for event_type, keywords, _ in EVENT_GRAMMAR) + ')',
+    re.IGNORECASE)
+PRIORITY = {event_type: index for index, (event_type, _, _) in enumerate(EVENT_GRAMMAR)}
+DETAIL_PATTERNS = {
+    event_type: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for event_type, _, patterns in EVENT_GRAMMAR
+}
+
+ENTRY_PATTERN = re.compile(r'^Day (\d+), (\d{2}):(\d{2}):(\d{2}):\s*(.*)$', re.DOTALL)
+# "Rex - Lvl 150 (Rex)" - the brackets after the level hold the species
+LEVEL_PATTERN = re.compile(r'^(?P<name>.*?)\s*-\s*Lvl (?P<level>\d+)(?:\s*\((?P<creature>[^()]+)\))?')
+
+
+def game_seconds(entry_text):
+    """Seconds since Day 0 00:00:00 of an entry's timestamp, a single number that orders entries"""
+    match = ENTRY_PATTERN.match(entry_text)
+    if not match:
+        return None
+    day, hours, minutes, seconds = (int(group) for group in match.groups()[:4])
+    return day * 86400 + hours * 3600 + minutes * 60 + seconds
+
+
+def day_range_seconds(first_day, last_day):
+    """game_seconds bounds (inclusive) covering first_day to the end of last_day"""
+    return first_day * 86400, (last_day + 1) * 86400 - 1
+
+
+def classify(text):
+    """Event type of an entry's text, 'other' if no keyword matches"""
+    # A lookahead at every position, so overlapping keywords are all found - "unclaimed
+    # baby" holds both "unclaimed" and "claimed baby"
+    found = {match.lastgroup for match in KEYWORD_PATTERN.finditer(text)}
+    if not found:
+        return OTHER
+    return min(found, key=PRIORITY.__getitem__)
+
+
+def types_for_keyword(event_type):
+    """
+    Event types an entry mentioning event_type's keywords can be classified as - the
+    type itself and every type that outranks it
+    """
+    return [name for name, _, _ in EVENT_GRAMMAR[:PRIORITY[event_type] + 1]]
+
+
+def split_name(text):
+    """Split "Name - Lvl 10 (Species)" into (name, level, creature)"""
+    if text is None:
+        return None, None, None
+    text = text.strip().strip('\'"!. ')
+    match = LEVEL_PATTERN.match(text)
+    if not match:
+        return text or None, None, None
+    name = match.group('name').strip('\'" ') or None
+    return name, int(match.group('level')), match.group('creature')
+
+
+def parse_event(entry_text):
+    """
+    Parse a log entry into its event columns
+    entry_text: Full entry including the "Day N, HH:MM:SS:" prefix
+    Returns a dict with the EVENT_COLUMNS keys, values are None where the entry has no such part
+    """
+    event = dict.fromkeys(EVENT_COLUMNS)
+    body = entry_text
+    match = ENTRY_PATTERN.match(entry_text)
+    if match:
+        event['game_seconds'] = game_seconds(entry_text)
+        body = match.group(5)
+
+    event_type = classify(body)
+    event['event_type'] = event_type
+
+    for pattern in DETAIL_PATTERNS.get(event_type, ()):
+        detail = pattern.match(body)
+        if not detail:
+            continue
+        groups = detail.groupdict()
+        target, target_level, target_creature = split_name(groups.get('target'))
+        actor, actor_level, actor_creature = split_name(groups.get('actor'))
+        event['target'] = target
+        event['actor'] = actor
+        # The target is usually the creature the event is about, a killer can be one too
+        if target_creature or not actor_creature:
+            event['creature'], event['level'] = target_creature, target_level if target_level is not None else actor_level
+        else:
+            event['creature'], event['level'] = actor_creature, actor_level
+        break
+    return event
+
+
+def event_row(entry_text):
+    """Event columns of an entry as a tuple in EVENT_COLUMNS order"""
+    event = parse_event(entry_text)
+    return tuple(event[column] for column in EVENT_COLUMNS)
+
+
+if __name__ == "__main__":
+    # Test the event grammar
+    samples = [
+        "Day 512, 14:03:22: Your Rex - Lvl 150 (Rex) was killed by Bob - Lvl 88 (The Others)!",
+        "Day 512, 14:05:01: Alice Tamed a Raptor - Lvl 30 (Raptor)!",
+        "Day 512, 14:06:40: Your Tribe killed Argentavis - Lvl 120 (Argentavis)!",
+        "Day 512, 14:07:13: Carol was added to the Tribe by Alice!",
+        "Day 512, 14:08:55: Your 'Stone Wall' was destroyed!",
+        "Day 512, 14:09:02: Bob starved to death!",
+        "Day 512, 14:10:30: Alice harvested a Metal Foundation",
+    ]
+    for sample in samples:
+        print(parse_event(sample))
+
+    # classify must pick the same type as checking each type's keywords in priority order,
+    # the way the Discord emoji used to be picked
+    checks = samples + [
+        "Day 512, 14:11:00: Bob unclaimed baby Rex - Lvl 10 (Rex)!",
+        "Day 512, 14:12:00: Alice harvested a Wyvern Egg",
+        "Day 512, 14:13:00: Your Rex - Lvl 150 was killed by an enemy!",
+    ]
+    for sample in checks:
+        expected = next((event_type for event_type, keywords, _ in EVENT_GRAMMAR
+                         if re.search(keywords, sample, re.IGNORECASE)), OTHER)
+        result = classify(sample)
+        print(f"{'OK' if result == expected else 'MISMATCH'} {result}: {sample}")
@@ -0,0 +1,112 @@
+import hashlib
+import numpy as np
+from PIL import Image
+
+# Named regions of a 1920x1080 capture, (x1, y1, x2, y2)
+FRAME_REGIONS = {
+    # Every log line box of LogProcessor.get_line_boxes
+    'log_panel': (780, 217, 1160, 830),
+    # Member count ("12/25") and the names of the online member list
+    'member_count': (553, 276, 704, 318),
+    'member_list': (176, 327, 402, 910),
+    # Day and time in the top left corner
+    'day_header': (25, 36, 152, 65),
+    'time_header': (31, 89, 99, 112),
+}
+
+
+def luma(pixels):
+    """Grayscale of an RGB(A) array, the same values as PIL's convert('L')"""
+    if pixels.ndim == 2:
+        return pixels
+    r, g, b = (pixels[..., channel].astype(np.uint32) for channel in range(3))
+    return ((r * 19595 + g * 38470 + b * 7471 + 0x8000) >> 16).astype(np.uint8)
+
+
+class Frame:
+    def __init__(self, image, regions=None):
+        """
+        One captured screenshot, converted to an array once and shared by every stage
+        of a cycle. Regions are handed out as views of that array, PIL images are only
+        made for the regions that need one (OCR, stored line images) and kept for reuse.
+        image: PIL image as captured
+        regions: Named regions to add to or override FRAME_REGIONS
+        """
+        self.mode = image.mode
+        self.pixels = np.asarray(image)  # Read-only, so views can be shared safely
+        self.height, self.width = self.pixels.shape[:2]
+        self.regions = dict(FRAME_REGIONS)
+        if regions:
+            self.regions.update(regions)
+        self._crops = {}
+        self._digests = {}
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def box(self, region):
+        """(x1, y1, x2, y2) of a region name or box, clamped to the frame"""
+        x1, y1, x2, y2 = self.regions[region] if isinstance(region, str) else region
+        x1 = min(max(0, x1), self.width)
+        y1 = min(max(0, y1), self.height)
+        return x1, y1, max(x1, min(self.width, x2)), max(y1, min(self.height, y2))
+
+    def view(self, region):
+        """Pixels of a region name or box as a view of the frame array, no copy"""
+        x1, y1, x2, y2 = self.box(region)
+        return self.pixels[y1:y2, x1:x2]
+
+    def gray(self, region):
+        """Grayscale pixels of a region name or box"""
+        return luma(self.view(region))
+
+    def crop(self, region):
+        """PIL image of a region name or box, made once per frame"""
+        box = self.box(region)
+        image = self._crops.get(box)
+        if image is None:
+            image = Image.fromarray(self.view(box))
+            self._crops[box] = image
+        return image
+
+    def digest(self, region):
+        """
+        Hash of the pixels of a region name or box, made once per frame
+        Equal between two frames only when the region is pixel-identical.
+        """
+        box = self.box(region)
+        digest = self._digests.get(box)
+        if digest is None:
+            view = self.view(box)
+            hasher = hashlib.blake2b(repr(view.shape).encode(), digest_size=16)
+            # Row by row, a view into the frame is not contiguous as a whole
+            for row in view:
+                hasher.update(np.ascontiguousarray(row))
+            digest = self._digests[box] = hasher.hexdigest()
+        return digest
+
+    def getpixel(self, xy):
+        """Color tuple at (x, y), like PIL's getpixel"""
+        x, y = xy
+        return tuple(self.pixels[y, x].tolist())
+
+
+def as_frame(image):
+    """A Frame for a PIL image, or the frame itself"""
+    return image if isinstance(image, Frame) else Frame(image)
+
+
+if __name__ == "__main__":
+    # Test frame regions
+    image = Image.new('RGB', (1920, 1080), (30, 30, 30))
+    image.paste((200, 200, 200), (780, 217, 1160, 234))
+    frame = Frame(image)
+    view = frame.view('log_panel')
+    print(f"Log panel view: {view.shape}, shares the frame array: {np.shares_memory(view, frame.pixels)}")
+    print(f"First line gray: {frame.gray((780, 217, 1160, 234)).mean():.0f}")
+    print(f"Same crop reused: {frame.crop('day_header') is frame.crop('day_header')}")
+    changed = image.copy()
+    changed.putpixel((800, 700), (255, 0, 0))
+    print(f"Log panel unchanged: {Frame(image).digest('log_panel') == frame.digest('log_panel')}, "
+          f"after a pixel changed: {Frame(changed).digest('log_panel') == frame.digest('log_panel')}")
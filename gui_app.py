@@ -18,6 +18,38 @@ from click_automation import ClickAutomation
 from log_processor import LogProcessor
 from member_processor import MemberProcessor
 from discord_webhook import DiscordWebhook
+from storage import get_storage
+from maintenance import MaintenanceJob
+from event_parser import classify, types_for_keyword
+from frame import Frame
+
+# Words an entry must contain (any of them) for each log filter, as the filters always matched
+FILTER_KEYWORDS = {
+    "Kills": ('killed',),
+    "Tames": ('tamed',),
+    "Harvests": ('harvested',),
+    "Enemy": ('enemy',),
+    "Tribe": ('tribe', 'your'),
+}
+
+# Event types behind each log filter, looked up through the event_type index. An entry
+# takes the type of its highest priority keyword ("was killed by an enemy!" is a kill,
+# "harvested a Wyvern Egg" a wyvern), so every type an entry with the word can have is
+# included and the keyword picks the entries. None for filters no event type narrows.
+FILTER_EVENT_TYPES = {
+    "Kills": types_for_keyword('killed'),
+    "Tames": types_for_keyword('tamed'),
+    "Harvests": types_for_keyword('harvested'),
+    "Enemy": types_for_keyword('enemy'),
+    "Tribe": None,
+}
+
+# Colour tag of each event type in the logs display
+EVENT_TAGS = {
+    'killed': 'kill',
+    'tamed': 'tame',
+    'harvested': 'harvest',
+}
 
 
 class ASALogBotGUI:
@@ -55,6 +87,11 @@ class ASALogBotGUI:
         )
         self.log_processor = LogProcessor(self.config.config)
         self.member_processor = MemberProcessor(self.config.config)
+        self.storage = get_storage(self.config.config)
+        
+        # Retention and vacuum run in the background for as long as the app is open
+        self.maintenance = MaintenanceJob(self.config.config, self.storage)
+        self.maintenance.start()
         
         # Initialize Discord webhook if enabled
         self.discord = None
@@ -72,6 +109,9 @@ class ASALogBotGUI:
         
         # Data storage
         self.logs_data = deque(maxlen=1000)  # Increased from 100
+        self.log_page_size = 200  # Search and filter results per page
+        self.log_page_starts = [None]  # Id each visited result page starts below, newest page first
+        self.log_page = []
         self.members_data = []
         self.activity_data = deque(maxlen=100)  # Increased from 20
         self.stats = {
@@ -354,6 +394,12 @@ class ASALogBotGUI:
         
         ttk.Button(search_frame, text="Clear Filter", command=self.clear_filter).pack(side=tk.LEFT, padx=10)
         
+        # Result paging - searches run over the full history in the database
+        self.newer_button = ttk.Button(search_frame, text="Newer", command=self.newer_logs_page, state=tk.DISABLED)
+        self.newer_button.pack(side=tk.RIGHT, padx=5)
+        self.older_button = ttk.Button(search_frame, text="Older", command=self.older_logs_page, state=tk.DISABLED)
+        self.older_button.pack(side=tk.RIGHT, padx=5)
+        
         # Logs display
         self.logs_display = scrolledtext.ScrolledText(logs_tab, wrap=tk.WORD, font=('Consolas', 9),
                                                      bg=self.entry_bg, fg=self.fg_color,
@@ -434,47 +480,70 @@ class ASALogBotGUI:
         self.add_activity("Logs cleared", "info")
         
     def apply_filter(self):
-        """Apply search and filter to logs"""
+        """Apply search and filter to logs, starting at the newest page of results"""
+        self.log_page_starts = [None]
+        self.show_logs_page()
+        
+    def show_logs_page(self):
+        """Show the current page of search and filter results, or this session's logs when neither is set"""
         self.logs_display.delete(1.0, tk.END)
         
-        search_term = self.search_var.get().lower()
-        filter_type = self.filter_var.get()
-        
-        for log in self.logs_data:
-            # Check filter type
-            if filter_type != "All":
-                if filter_type == "Kills" and "killed" not in log['text'].lower():
-                    continue
-                elif filter_type == "Tames" and "tamed" not in log['text'].lower():
-                    continue
-                elif filter_type == "Harvests" and "harvested" not in log['text'].lower():
-                    continue
-                elif filter_type == "Enemy" and "enemy" not in log['text'].lower():
-                    continue
-                elif filter_type == "Tribe" and not any(word in log['text'].lower() for word in ['tribe', 'your']):
-                    continue
-            
-            # Check search term
-            if search_term and search_term not in log['text'].lower():
-                continue
-                
+        search_term = self.search_var.get().strip()
+        event_types = FILTER_EVENT_TYPES.get(self.filter_var.get())
+        keywords = FILTER_KEYWORDS.get(self.filter_var.get())
+        
+        # Searches use the full-text index and filters the event_type index, one page at a time
+        if self.showing_results():
+            try:
+                if search_term:
+                    logs = self.storage.search_logs(search_term, event_types, limit=self.log_page_size,
+                                                    before_id=self.log_page_starts[-1], keywords=keywords)
+                else:
+                    logs = self.storage.filter_logs(event_types, limit=self.log_page_size,
+                                                    before_id=self.log_page_starts[-1], keywords=keywords)
+            except Exception as e:
+                self.add_activity(f"Log search failed: {e}", "error")
+                logs = []
+            self.log_page = logs
+            self.older_button.config(state=tk.NORMAL if len(logs) == self.log_page_size else tk.DISABLED)
+            self.newer_button.config(state=tk.NORMAL if len(self.log_page_starts) > 1 else tk.DISABLED)
+        else:
+            logs = self.logs_data
+            self.log_page = []
+            self.older_button.config(state=tk.DISABLED)
+            self.newer_button.config(state=tk.DISABLED)
+        
+        for log in logs:
             # Add to display
-            timestamp = log.get('timestamp', datetime.now()).strftime("%H:%M:%S")
-            log_text = f"[{timestamp}] {log['text']}\n"
-            
-            # Determine tag
-            tag = None
-            if 'killed' in log['text'].lower():
-                tag = 'kill'
-            elif 'tamed' in log['text'].lower():
-                tag = 'tame'
-            elif 'harvested' in log['text'].lower():
-                tag = 'harvest'
-                
-            self.logs_display.insert(tk.END, log_text, tag)
+            timestamp = log.get('timestamp', datetime.now())
+            if isinstance(timestamp, str):
+                timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+            log_text = f"[{timestamp.strftime('%H:%M:%S')}] {log['text']}\n"
+            self.logs_display.insert(tk.END, log_text, self.get_log_tag(log))
             
         self.logs_display.see(tk.END)
         
+    def showing_results(self):
+        """Whether the logs tab shows search or filter results rather than live logs"""
+        return bool(self.search_var.get().strip()) or self.filter_var.get() in FILTER_EVENT_TYPES
+        
+    def older_logs_page(self):
+        """Page back to older results"""
+        if self.log_page:
+            self.log_page_starts.append(self.log_page[0]['id'])
+            self.show_logs_page()
+        
+    def newer_logs_page(self):
+        """Page forward to newer results"""
+        if len(self.log_page_starts) > 1:
+            self.log_page_starts.pop()
+            self.show_logs_page()
+        
+    def get_log_tag(self, log):
+        """Colour tag for a log entry, from its event type"""
+        event_type = log.get('event_type') or classify(log['text'])
+        return EVENT_TAGS.get(event_type)
+        
     def clear_filter(self):
         """Clear search and filter"""
         self.search_var.set("")
@@ -580,9 +649,12 @@ class ASALogBotGUI:
         img.save(screenshot_path)
         self.last_screenshot_path = screenshot_path
         
+        # Convert the capture once, every stage below reads views of the same array
+        frame = Frame(img)
+        
         # Detect current state
         self.add_activity("Detecting state...")
-        current_state = self.state_detector.detect_state(img)
+        current_state = self.state_detector.detect_state(frame.pixels)
         
         if current_state is None:
             self.add_activity("No known state detected", "warning")
@@ -637,12 +709,9 @@ class ASALogBotGUI:
             self.add_activity("Processing logs...")
             
             # Track logs before processing
-            import sqlite3
             old_log_count = 0
             try:
-                with sqlite3.connect(self.log_processor.log_db_path) as conn:
-                    cursor = conn.execute('SELECT COUNT(*) FROM logs')
-                    old_log_count = cursor.fetchone()[0]
+                old_log_count = self.storage.log_count()
             except:
                 pass
             
@@ -651,28 +720,25 @@ class ASALogBotGUI:
             old_stdout = sys.stdout
             sys.stdout = io.StringIO()
             try:
-                result = self.log_processor.process_logs(img)
+                result = self.log_processor.process_logs(frame)
             finally:
                 sys.stdout = old_stdout
             
             # Update UI with new logs
             try:
-                with sqlite3.connect(self.log_processor.log_db_path) as conn:
-                    # Get total count
-                    cursor = conn.execute('SELECT COUNT(*) FROM logs')
-                    new_count = cursor.fetchone()[0]
-                    self.update_stats('logs_processed', new_count)
-                    self.update_stats('logs_new', new_count - old_log_count)
-                    
-                    # Get recent logs for display
-                    cursor = conn.execute('SELECT entry_text FROM logs ORDER BY id DESC LIMIT 20')
-                    recent_logs = [row[0] for row in cursor]
-                    
-                    # Add new logs
-                    for log_text in reversed(recent_logs):
-                        # Check if this log is already in our data
-                        if not any(log['text'] == log_text for log in self.logs_data):
-                            self.add_log({'text': log_text})
+                # Get total count
+                new_count = self.storage.log_count()
+                self.update_stats('logs_processed', new_count)
+                self.update_stats('logs_new', new_count - old_log_count)
+                
+                # Get recent logs for display
+                recent_logs = self.storage.latest_logs(20)
+                
+                # Add new logs
+                for log_text in reversed(recent_logs):
+                    # Check if this log is already in our data
+                    if not any(log['text'] == log_text for log in self.logs_data):
+                        self.add_log({'text': log_text})
             except:
                 pass
             
@@ -685,7 +751,7 @@ class ASALogBotGUI:
                 else:
                     # Plain tuple format: (left, top, right, bottom)
                     window_pos = (window_rect[0], window_rect[1])
-                self.member_processor.process_members(img, window_pos)
+                self.member_processor.process_members(frame, window_pos)
                 
                 # Update UI with member info
                 self.update_stats('members_online', self.member_processor.online_member_count)
@@ -693,16 +759,7 @@ class ASALogBotGUI:
                 # Get member details from database
                 members = []
                 try:
-                    import sqlite3
-                    with sqlite3.connect(self.member_processor.member_db_path) as conn:
-                        cursor = conn.execute('''
-                            SELECT name, times_seen, 
-                                   CASE WHEN last_seen > datetime('now', '-2 minutes') THEN 1 ELSE is_online END as is_online
-                            FROM members 
-                            WHERE last_seen > datetime('now', '-10 minutes') 
-                            ORDER BY is_online DESC, times_seen DESC
-                        ''')
-                        members = [{'name': row[0], 'times_seen': row[1], 'is_online': row[2]} for row in cursor]
+                    members = self.storage.recent_members(minutes=10)
                 except:
                     pass
                 
@@ -710,8 +767,8 @@ class ASALogBotGUI:
             
             # Send to Discord if enabled
             if self.discord:
-                # Store screenshot for Discord to use
-                self.discord.last_screenshot = img
+                # Store the frame for Discord to copy the day/time header from
+                self.discord.last_screenshot = frame
                 self.discord.check_and_send_new_logs()
                 
                 # Update UI with server info
@@ -741,6 +798,9 @@ class ASALogBotGUI:
                 import traceback
                 self.add_activity(f"Traceback: {traceback.format_exc()}", "error")
                 time.sleep(5)
+        
+        # The next start runs on a new thread with connections of its own
+        self.storage.release()
     
     def update_discord_timer(self):
         """Update Discord timer in a separate thread"""
@@ -800,21 +860,12 @@ class ASALogBotGUI:
                     self.status_labels['uptime'].config(text=uptime)
                             
                 elif update_type == 'log':
-                    # Add new log to display
-                    if data:
+                    # Add new log to display, result pages stay as they are until the search is cleared
+                    if data and not self.showing_results():
                         timestamp = data.get('timestamp', datetime.now()).strftime("%H:%M:%S")
                         log_text = f"[{timestamp}] {data['text']}\n"
                         
-                        # Determine tag based on log type
-                        tag = None
-                        if 'killed' in data['text'].lower():
-                            tag = 'kill'
-                        elif 'tamed' in data['text'].lower():
-                            tag = 'tame'
-                        elif 'harvested' in data['text'].lower():
-                            tag = 'harvest'
-                            
-                        self.logs_display.insert(tk.END, log_text, tag)
+                        self.logs_display.insert(tk.END, log_text, self.get_log_tag(data))
                         self.logs_display.see(tk.END)
                         
                 elif update_type == 'members':
@@ -0,0 +1,193 @@
+import os
+import re
+import mmap
+import threading
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import fcntl
+
+SEGMENT_PATTERN = re.compile(r'^segment_(\d{6})\.bin$')
+LOCK_FILE = 'archive.lock'
+
+
+class ArchiveLockedError(RuntimeError):
+    """Another process is appending to the archive"""
+
+
+class ImageArchive:
+    def __init__(self, directory='./log_images', segment_size=64 * 1024 * 1024):
+        """
+        Append-only image blob archive
+        Blobs are appended to numbered segment files. A new segment starts once the
+        current one reaches segment_size. Callers keep the (segment, offset, length)
+        of each blob and read it back through a memory map. Offsets come from the end of
+        the segment file, so only one process may append - the first append takes an
+        exclusive lock file and holds it until close().
+        directory: Folder for the segment files
+        segment_size: Bytes per segment before rotating to a new file
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+        self._maps = {}  # segment -> (mmap, mapped length)
+        self._writer = None
+        self._lock_file = None
+        os.makedirs(self.directory, exist_ok=True)
+
+        segments = self.segments()
+        self.current_segment = segments[-1] if segments else 1
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f"segment_{segment:06d}.bin")
+
+    def segments(self):
+        """Numbers of the segment files on disk, oldest first"""
+        numbers = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def lock(self):
+        """
+        Take the archive's writer lock, raising ArchiveLockedError if another process holds it
+        Called by the first append, or up front by a process that must not share the archive
+        """
+        with self._lock:
+            self._acquire_lock()
+
+    def _acquire_lock(self):
+        if self._lock_file is not None:
+            return
+        lock_file = open(os.path.join(self.directory, LOCK_FILE), 'a+b')
+        try:
+            if msvcrt is not None:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise ArchiveLockedError(f"{self.directory} is being written by another process")
+        self._lock_file = lock_file
+        # The last holder may have started new segments since this archive was opened
+        segments = self.segments()
+        if segments:
+            self.current_segment = max(self.current_segment, segments[-1])
+
+    def _release_lock(self):
+        if self._lock_file is None:
+            return
+        try:
+            if msvcrt is not None:
+                self._lock_file.seek(0)
+                msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+        self._lock_file.close()
+        self._lock_file = None
+
+    def _open_writer(self):
+        if self._writer is None:
+            self._acquire_lock()
+            self._writer = open(self.segment_path(self.current_segment), 'ab')
+        return self._writer
+
+    def append(self, data):
+        """Append a blob, returning its (segment, offset, length)"""
+        with self._lock:
+            writer = self._open_writer()
+            offset = writer.tell()
+            if offset and offset + len(data) > self.segment_size:
+                # Rotate - a segment only ever grows until it is full
+                writer.close()
+                self.current_segment += 1
+                self._writer = None
+                writer = self._open_writer()
+                offset = writer.tell()
+            writer.write(data)
+            return self.current_segment, offset, len(data)
+
+    def flush(self):
+        """Push appended blobs to the OS and to disk, call before committing their index rows"""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+
+    def read(self, segment, offset, length):
+        """
+        Get a blob as a memoryview into the mapped segment, without copying it
+        Raises FileNotFoundError if compaction has removed the segment
+        """
+        end = offset + length
+        with self._lock:
+            mapped = self._maps.get(segment)
+            if mapped is None or mapped[1] < end:
+                if segment == self.current_segment and self._writer is not None:
+                    self._writer.flush()
+                # The active segment grows, so map it again once reads go past the old end.
+                # A replaced map stays alive until the last view into it is gone.
+                with open(self.segment_path(segment), 'rb') as f:
+                    size = os.fstat(f.fileno()).st_size
+                    if size < end:
+                        raise ValueError(f"Blob at {segment}:{offset}+{length} is past the end of the segment")
+                    mapped = (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), size)
+                self._maps[segment] = mapped
+        return memoryview(mapped[0])[offset:end]
+
+    def segment_size_on_disk(self, segment):
+        """Size of a segment file in bytes, 0 if it is gone"""
+        try:
+            return os.path.getsize(self.segment_path(segment))
+        except OSError:
+            return 0
+
+    def remove_segment(self, segment):
+        """Delete a segment nothing points into any more, returning the bytes freed"""
+        with self._lock:
+            if segment == self.current_segment:
+                raise ValueError("The segment being appended to can not be removed")
+            mapped = self._maps.pop(segment, None)
+            if mapped is not None:
+                try:
+                    mapped[0].close()
+                except BufferError:
+                    pass
+            size = self.segment_size_on_disk(segment)
+            os.remove(self.segment_path(segment))
+            return size
+
+    def close(self):
+        """Close the writer and all memory maps"""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            self._release_lock()
+            maps = list(self._maps.values())
+            self._maps = {}
+        for mapped, _ in maps:
+            try:
+                mapped.close()
+            except BufferError:
+                # Something still holds a view - the map closes when it is released
+                pass
+
+
+if __name__ == "__main__":
+    # Test the image archive
+    import tempfile
+    archive = ImageArchive(tempfile.mkdtemp(), segment_size=16)
+    locations = [archive.append(data) for data in (b'first blob', b'second blob', b'third')]
+    archive.flush()
+    print(f"Locations: {locations}")
+    print(f"Read back: {[bytes(archive.read(*location)) for location in locations]}")
+    print(f"Segments: {archive.segments()}")
+    archive.close()
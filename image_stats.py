@@ -0,0 +1,54 @@
+import numpy as np
+from frame import luma
+
+
+def grayscale_array(image):
+    """Convert a PIL image, or an RGB(A) array such as a frame view, to a 2D uint8 grayscale array"""
+    if isinstance(image, np.ndarray):
+        return luma(image)
+    return np.asarray(image.convert('L'))
+
+
+def grayscale_std(image):
+    """Standard deviation of the grayscale pixels of an image, 0.0 for an empty image"""
+    pixels = grayscale_array(image)
+    if pixels.size == 0:
+        return 0.0
+    return float(pixels.std())
+
+
+def is_blank(image, threshold=5):
+    """Check if an image is uniform enough to hold no text"""
+    return grayscale_std(image) < threshold
+
+
+def region_stds(image, boxes):
+    """
+    Standard deviation of the grayscale pixels in each box
+    Converts the image once and slices it, instead of cropping and converting every box
+    image: PIL image
+    boxes: List of (x1, y1, x2, y2) crop boxes
+    """
+    pixels = grayscale_array(image)
+    height, width = pixels.shape
+    stds = []
+    for x1, y1, x2, y2 in boxes:
+        region = pixels[max(0, y1):min(height, y2), max(0, x1):min(width, x2)]
+        stds.append(float(region.std()) if region.size else 0.0)
+    return stds
+
+
+def blank_regions(image, boxes, threshold=5):
+    """Get the indexes of the boxes that are blank in an image"""
+    return {i for i, std in enumerate(region_stds(image, boxes)) if std < threshold}
+
+
+if __name__ == "__main__":
+    # Test image statistics
+    from PIL import Image, ImageDraw
+    image = Image.new('RGB', (100, 40), (20, 20, 20))
+    ImageDraw.Draw(image).text((2, 2), "Day 1", fill=(255, 255, 255))
+    boxes = [(0, 0, 100, 20), (0, 20, 100, 40)]
+    print(f"Region std devs: {region_stds(image, boxes)}")
+    print(f"Blank regions: {blank_regions(image, boxes)}")
+    print(f"Whole image blank: {is_blank(image)}")
@@ -0,0 +1,84 @@
+import hashlib
+from io import BytesIO
+from PIL import Image, features
+
+# Lossless WebP at low effort measured smallest for log line strips at about the
+# cost of a fast PNG (benchmarks/bench_strip_encoding.py), PNG is the fallback
+# for Pillow builds without WebP support.
+ENCODINGS = {
+    'webp': ('WEBP', {'lossless': True, 'quality': 25, 'method': 1}),
+    'png': ('PNG', {'compress_level': 1}),
+}
+
+
+def default_format():
+    """Best strip encoding this Pillow build supports"""
+    return 'webp' if features.check('webp') else 'png'
+
+
+def resolve_format(name):
+    """Turn a line_image_format config value into an encoding name"""
+    if name in (None, '', 'auto'):
+        return default_format()
+    if name not in ENCODINGS:
+        print(f"Unknown line image format '{name}', using {default_format()}")
+        return default_format()
+    if name == 'webp' and not features.check('webp'):
+        print("This Pillow build has no WebP support, storing line images as PNG")
+        return 'png'
+    return name
+
+
+def strip_hash(image):
+    """Content hash of a line strip's pixels"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode}|{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def encode_strip(image, fmt='png'):
+    """Encode a line strip to bytes"""
+    image_format, options = ENCODINGS[fmt]
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def decode_strip(data):
+    """
+    Decode stored strip bytes to an image (any format Pillow can read)
+    data: bytes, or a memoryview from the image archive. BytesIO copies the view, which
+    for a strip of a few hundred bytes is cheaper than wrapping it in a file-like object.
+    """
+    image = Image.open(BytesIO(data))
+    image.load()
+    return image
+
+
+def stack_images(images):
+    """Stack line images top to bottom into one image"""
+    if not images:
+        return None
+
+    # Calculate total height and max width
+    total_height = sum(img.height for img in images)
+    max_width = max(img.width for img in images)
+
+    # Paste each image
+    combined = Image.new('RGB', (max_width, total_height))
+    y_offset = 0
+    for img in images:
+        combined.paste(img, (0, y_offset))
+        y_offset += img.height
+    return combined
+
+
+if __name__ == "__main__":
+    # Test strip encoding
+    strip = Image.new('RGB', (380, 17), (24, 34, 44))
+    fmt = default_format()
+    data = encode_strip(strip, fmt)
+    print(f"Format: {fmt}, {len(data)} bytes, hash {strip_hash(strip)}")
+    print(f"Round trip identical: {decode_strip(data).convert('RGB').tobytes() == strip.tobytes()}")
+    print(f"Stacked size: {stack_images([strip, strip]).size}")
@@ -1,15 +1,28 @@
 import os
 import time
+import atexit
 import re
-import threading
 import uuid
 import sqlite3
 import base64
 import json
-from io import BytesIO
+import hashlib
+from collections import Counter
 from datetime import datetime
+import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
 import pytesseract
+from ocr_engine import get_ocr_engine, OCRExecutor
+from ocr_cache import OCRCache
+from ocr_corrections import ReplacementEngine
+from image_stats import grayscale_array, is_blank
+from text_similarity import is_similar_log_entry
+from seen_set import SeenEntrySet
+from storage import get_storage
+from line_images import resolve_format, strip_hash, encode_strip, stack_images
+from event_parser import game_seconds
+from warm_state import WarmState
+from frame import as_frame
 
 # Configure Tesseract path
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -25,13 +38,42 @@ class LogProcessor:
             "HEIGHT": 17,
             "LINE_SPACING": 20
         }
+        self.line_adjustments = {3: 0, 4: -1, 8: -1, 12: -1, 16: -1}  # Y adjustments at specific lines
         # OCR config - PSM 6 only (whitelist doesn't seem to work with current Tesseract version)
         # The old system uses a whitelist but it may not be compatible with newer versions
         self.ocr_config = '--psm 6'
+        self.ocr_engine = get_ocr_engine(config)
+        # Worker threads that live as long as the processor, instead of one thread per line per cycle
+        self.ocr_executor = OCRExecutor(
+            workers=config.get('ocr_workers', 4),
+            task_timeout=config.get('ocr_task_timeout', 5.0)
+        )
+        # "per_line" OCRs every cropped line on its own, "batched" OCRs the whole panel in one call
+        self.ocr_mode = config.get('ocr_mode', 'per_line')
+        
+        # Cache of OCR text keyed by line pixels, so unchanged lines skip Tesseract
+        cache_size = config.get('ocr_cache_size', 2048)
+        self.ocr_cache = OCRCache(cache_size, config.get('ocr_cache_db')) if cache_size > 0 else None
+        
+        # Scroll alignment - reuse text for lines that only moved since the last frame
+        self.scroll_align = config.get('scroll_align', True)
+        self.scroll_max_shift = config.get('scroll_align_max_shift', 5)
+        self.scroll_min_confidence = config.get('scroll_align_min_confidence', 0.8)
+        self.previous_lines = []  # (fingerprint, grayscale, text) for each line of the last frame
+        
+        # A log panel identical to the last one replays its messages into tracking instead of
+        # being read again
+        self.skip_unchanged = config.get('skip_unchanged_panels', True)
+        self.last_panel = None  # (panel digest, messages, message images) of the last frame
+        
+        # Lines with a grayscale std dev below this are empty rows and never go to OCR (0 to disable)
+        self.blank_line_std = config.get('blank_line_std', 5)
         self.log_pattern = re.compile(r'^Day \d{1,6}, \d{2}:\d{2}:\d{2}: ')
+        self.game_time_pattern = re.compile(r'^Day (\d+), (\d{2}):(\d{2}):(\d{2}):')
         self.line_counts = {}  # Track individual lines
+        self.tracking_index = {}  # Game minute -> tracked messages from that minute
+        self.previous_messages = []  # Tracked message at each position of the last frame
         self.validated_lines = {}  # Lines that have passed threshold
-        self.printed_entries = {}
         self.log_seen_threshold = config.get('log_seen_threshold', 4)  # Get from config, default to 4
         self.temp_folder = "temp/"
         os.makedirs(self.temp_folder, exist_ok=True)
@@ -43,61 +85,61 @@ class LogProcessor:
         # Initialize databases
         self.init_databases()
         
+        # Encoding for stored line strips - auto picks lossless WebP when Pillow supports it
+        self.line_image_format = resolve_format(config.get('line_image_format', 'auto'))
+        
+        # A save that finds the database locked (by a vacuum or another process) is retried
+        self.save_retries = config.get('db_save_retries', 3)
+        self.save_retry_delay = 1.0  # Seconds before the first retry, doubled for each one
+        
+        # Entries already saved - bounded LRU and Bloom filter, backed by log.db
+        self.printed_entries = SeenEntrySet(
+            self.storage,
+            max_entries=config.get('seen_entries_cache_size', 5000),
+            bloom_capacity=config.get('seen_entries_bloom_capacity', 200000)
+        )
+        
         # Load already processed entries from database
         self.load_processed_entries()
         
+        # Save the seen-entry Bloom filter now and then and on exit, so the next start
+        # only reads entries saved after it
+        self.seen_state_interval = config.get('seen_entries_save_interval', 300)
+        self.seen_state_saved = time.time()
+        atexit.register(self.printed_entries.save_state)
+        
+        # Message tracking survives restarts through a snapshot every few cycles (0 to disable)
+        self.warm_state = WarmState(os.path.join(config.get('warm_state_dir', './warm_state'), 'log_processor.state'),
+                                    config.get('warm_state_max_age', 600))
+        self.warm_state_interval = config.get('warm_state_interval', 10)
+        self.cycle_count = 0
+        if self.warm_state_interval:
+            self.restore_warm_state()
+            atexit.register(self.save_warm_state)
+        
         # Load replacements configuration
         self.replacements_file = config.get('replacements_file', 'replacements.json')
         self.load_replacements()
     
     def init_databases(self):
         """Initialize SQLite databases for logs and images"""
-        # Create logs database
-        with sqlite3.connect(self.log_db_path) as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    day INTEGER,
-                    time TEXT,
-                    entry_text TEXT UNIQUE,
-                    image_id TEXT
-                )
-            ''')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_entry_text ON logs(entry_text)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_day_time ON logs(day, time)')
-        
-        # Create log images database
-        with sqlite3.connect(self.log_images_db_path) as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS log_images (
-                    id TEXT PRIMARY KEY,
-                    image_data BLOB,
-                    width INTEGER,
-                    height INTEGER
-                )
-            ''')
+        # Shared connections (WAL, one per thread) - creates the tables on first use
+        self.storage = get_storage(self.config)
     
     def load_processed_entries(self):
-        """Load already processed entries from database - only recent ones to prevent memory issues"""
-        with sqlite3.connect(self.log_db_path) as conn:
-            # Only load entries from the last 24 hours to prevent unlimited memory growth
-            cursor = conn.execute('''
-                SELECT entry_text FROM logs 
-                WHERE timestamp > datetime('now', '-1 day')
-                ORDER BY id DESC
-                LIMIT 10000
-            ''')
-            for row in cursor:
-                self.printed_entries[row[0]] = True
-        print(f"Loaded {len(self.printed_entries)} recent entries from database")
+        """Seed the seen-entry set from its saved state, or the newest entries in the database"""
+        start = time.time()
+        count = self.printed_entries.load()
+        print(f"Loaded {count} processed entries in {time.time() - start:.2f}s")
     
     def load_replacements(self):
         """Load replacements from JSON file"""
         self.replacements = {}
         self.special_formatting = {}
+        self.replacements_mtime = None
         
         if os.path.exists(self.replacements_file):
+            self.replacements_mtime = os.path.getmtime(self.replacements_file)
             try:
                 with open(self.replacements_file, 'r') as f:
                     data = json.load(f)
@@ -111,6 +153,34 @@ class LogProcessor:
         else:
             print(f"Replacements file not found: {self.replacements_file}, using defaults")
             self.replacements = self.get_default_replacements()
+        
+        # Compile all rules once instead of looping over them for every line
+        self.replacement_engine = ReplacementEngine.from_config(self.replacements, self.special_formatting)
+        
+        # Cached OCR text is only valid for the rules that produced it
+        rules = json.dumps([self.replacements, self.special_formatting], sort_keys=True)
+        self.replacements_version = hashlib.md5(rules.encode()).hexdigest()[:12]
+    
+    def reload_replacements_if_changed(self):
+        """Reload the replacements file if it changed on disk"""
+        try:
+            mtime = os.path.getmtime(self.replacements_file)
+        except OSError:
+            return
+        if mtime == self.replacements_mtime:
+            return
+        
+        # Don't swap in the defaults because of a half-saved file
+        try:
+            with open(self.replacements_file, 'r') as f:
+                json.load(f)
+        except Exception as e:
+            print(f"Replacements file changed but could not be read, keeping current rules: {e}")
+            self.replacements_mtime = mtime
+            return
+        
+        print(f"Replacements file changed, reloading {self.replacements_file}")
+        self.load_replacements()
     
     def get_default_replacements(self):
         """Get default replacements if no config file"""
@@ -124,63 +194,35 @@ class LogProcessor:
     
     def is_newer_entry(self, entry1, entry2):
         """Check if entry1 is newer than entry2 based on Day and time"""
-        # Extract day and time from entries
-        match1 = self.log_pattern.match(entry1)
-        match2 = self.log_pattern.match(entry2)
-        
-        if not match1 or not match2:
+        if not self.log_pattern.match(entry1) or not self.log_pattern.match(entry2):
             return False
-        
-        # Parse "Day X, HH:MM:SS:"
-        day1_match = re.match(r'Day (\d+), (\d{2}):(\d{2}):(\d{2}):', entry1)
-        day2_match = re.match(r'Day (\d+), (\d{2}):(\d{2}):(\d{2}):', entry2)
-        
-        if not day1_match or not day2_match:
-            return False
-        
-        day1 = int(day1_match.group(1))
-        hour1 = int(day1_match.group(2))
-        min1 = int(day1_match.group(3))
-        sec1 = int(day1_match.group(4))
-        
-        day2 = int(day2_match.group(1))
-        hour2 = int(day2_match.group(2))
-        min2 = int(day2_match.group(3))
-        sec2 = int(day2_match.group(4))
-        
-        # Compare days first
-        if day1 != day2:
-            return day1 > day2
-        
-        # Same day, compare time
-        time1 = hour1 * 3600 + min1 * 60 + sec1
-        time2 = hour2 * 3600 + min2 * 60 + sec2
-        return time1 > time2
+        return game_seconds(entry1) > game_seconds(entry2)
     
-    def crop_image_to_lines(self, image):
-        """Crops the screenshot into individual log lines"""
+    def get_line_boxes(self, image_height):
+        """Get the crop box of every log line for a screenshot of this height"""
         y = self.log_crop_coords["START_Y"]
-        cropped_lines = []
-        line_adjustments = {3: 0, 4: -1, 8: -1, 12: -1, 16: -1}  # Y adjustments at specific lines
+        boxes = []
         count = 0
         
-        while (y + self.log_crop_coords["HEIGHT"] + self.log_crop_coords["LINE_SPACING"] <= image.height) and (y < self.log_crop_coords["END_Y"]):
-            crop_coords = (
+        while (y + self.log_crop_coords["HEIGHT"] + self.log_crop_coords["LINE_SPACING"] <= image_height) and (y < self.log_crop_coords["END_Y"]):
+            boxes.append((
                 self.log_crop_coords["START_X"], 
                 y, 
                 self.log_crop_coords["START_X"] + self.log_crop_coords["WIDTH"], 
                 y + self.log_crop_coords["HEIGHT"]
-            )
-            cropped_line = image.crop(crop_coords)
-            cropped_lines.append(cropped_line)
+            ))
             y += self.log_crop_coords["LINE_SPACING"]
             count += 1
             
             # Apply line adjustments
-            if count in line_adjustments:
-                y += line_adjustments[count]
+            if count in self.line_adjustments:
+                y += self.line_adjustments[count]
                 
-        return cropped_lines
+        return boxes
+    
+    def crop_image_to_lines(self, image):
+        """Crops the screenshot into individual log lines"""
+        return [image.crop(box) for box in self.get_line_boxes(image.height)]
     
     def ocr_line(self, image, line_num=None):
         """Perform OCR on a single line image - matching old system"""
@@ -189,90 +231,290 @@ class LogProcessor:
             # The old system: ocrImage(cropped_line, False, True, False) where 3rd param is greyscale=False
             
             # OCR the image with whitelist config
-            text = pytesseract.image_to_string(image, config=self.ocr_config)
-            
-            # Strip whitespace
-            text = text.strip()
-            
-            # Replace newlines with spaces (like old system - replace_newline=True)
-            text = text.replace('\n', ' ')
-            
-            # Apply OCR corrections
-            text = self.apply_ocr_corrections(text)
-            
-            # Simple validation - must have some content
-            # Lowered threshold to catch short continuation lines like "killed!"
-            if not text or len(text) < 2:
-                if line_num is not None and len(text) == 1:
-                    print(f"Line {line_num}: Very short text detected: '{text}'")
-                return ""
-            
-            return text
+            text = self.ocr_engine.image_to_string(image, config=self.ocr_config)
+            return self.clean_ocr_text(text, line_num)
         except Exception as e:
             print(f"OCR error: {e}")
             return ""
     
+    def clean_ocr_text(self, text, line_num=None):
+        """Turn raw OCR output for one line into corrected line text"""
+        # Strip whitespace
+        text = text.strip()
+        
+        # Replace newlines with spaces (like old system - replace_newline=True)
+        text = text.replace('\n', ' ')
+        
+        # Apply OCR corrections
+        text = self.apply_ocr_corrections(text)
+        
+        # Simple validation - must have some content
+        # Lowered threshold to catch short continuation lines like "killed!"
+        if not text or len(text) < 2:
+            if line_num is not None and len(text) == 1:
+                print(f"Line {line_num}: Very short text detected: '{text}'")
+            return ""
+        
+        return text
+    
+    def line_fingerprint(self, image):
+        """Column brightness profile of a line - survives the 1px line_adjustments jitter"""
+        if isinstance(image, np.ndarray):
+            # RGB or grayscale array - the rounded mean of every grayscale column, the
+            # same bytes as the PIL path
+            gray = grayscale_array(image).astype(np.uint32)
+            height = max(1, gray.shape[0])
+            return ((gray.sum(axis=0) + height // 2) // height).astype(np.uint8).tobytes()
+        return image.convert('L').resize((image.width, 1), Image.BOX).tobytes()
+    
+    def is_blank_fingerprint(self, fingerprint, threshold=10):
+        """Check if a line fingerprint has no visible text"""
+        return not fingerprint or max(fingerprint) - min(fingerprint) < threshold
+    
+    def fingerprints_match(self, fp1, fp2, tolerance=8):
+        """Check if two line fingerprints could show the same text - only good for finding the shift"""
+        if fp1 == fp2:
+            return True
+        if len(fp1) != len(fp2):
+            return False
+        return max(abs(a - b) for a, b in zip(fp1, fp2)) <= tolerance
+    
+    def lines_match(self, gray1, gray2, tolerance=24):
+        """
+        Check if two grayscale lines hold the same pixels, allowing for the 1px
+        line_adjustments jitter. Unlike the column profile this keeps the vertical
+        glyph structure, so 6/9 or Bob/Rob do not match.
+        """
+        if gray1.shape != gray2.shape:
+            return False
+        if np.array_equal(gray1, gray2):
+            return True
+        height = gray1.shape[0]
+        for dy in (-1, 1):
+            a = gray1[max(0, dy):height + min(0, dy)].astype(np.int16)
+            b = gray2[max(0, -dy):height + min(0, -dy)].astype(np.int16)
+            if a.size and int(np.abs(a - b).max()) <= tolerance:
+                return True
+        return False
+    
+    def align_with_previous(self, fingerprints, line_grays):
+        """
+        Align this frame's lines with the previous frame's lines
+        The fingerprints only estimate the shift, every line is then confirmed against
+        its previous line pixel by pixel before its text is reused.
+        Returns {current_index: previous_index} for lines that only moved,
+        or None if no shift explains the frame well enough
+        """
+        previous = self.previous_lines
+        if not previous:
+            return None
+        
+        blank = [self.is_blank_fingerprint(fp) for fp in fingerprints]
+        previous_blank = [self.is_blank_fingerprint(fp) for fp, _, _ in previous]
+        
+        # Score every shift by its fingerprint matches; new entries push older ones down
+        # (positive shift)
+        candidates = []
+        for shift in range(-self.scroll_max_shift, self.scroll_max_shift + 1):
+            mapping = {}
+            compared = 0
+            for i, fp in enumerate(fingerprints):
+                j = i - shift
+                if not 0 <= j < len(previous):
+                    continue
+                # Blank lines match everything, so they say nothing about the shift
+                if blank[i] and previous_blank[j]:
+                    continue
+                compared += 1
+                if self.fingerprints_match(fp, previous[j][0]):
+                    mapping[i] = j
+            if compared and mapping:
+                candidates.append((len(mapping), shift, compared, mapping))
+        
+        if not candidates:
+            return None
+        
+        # Confirm the best scoring shifts line by line, the one with the most confirmed
+        # lines wins. Confirmed lines have the same pixels, so even a tie is safe to reuse.
+        top_score = max(candidate[0] for candidate in candidates)
+        best = None
+        for _, shift, compared, mapping in candidates:
+            if len(mapping) < top_score:
+                continue
+            confirmed = {i: j for i, j in mapping.items() if self.lines_match(line_grays[i], previous[j][1])}
+            confidence = len(confirmed) / compared
+            if best is None or confidence > best[0]:
+                best = (confidence, shift, confirmed)
+        
+        if best[0] < self.scroll_min_confidence:
+            print(f"Scroll alignment: low confidence ({best[0] * 100:.0f}%), doing a full OCR pass")
+            return None
+        
+        confidence, shift, mapping = best
+        # Only reuse lines that actually had text last time
+        mapping = {i: j for i, j in mapping.items() if previous[j][2]}
+        print(f"Scroll alignment: shift {shift}, reusing {len(mapping)}/{len(fingerprints)} lines ({confidence * 100:.0f}% confidence)")
+        return mapping
+    
+    def ocr_panel_batched(self, screenshot, line_boxes):
+        """OCR the whole log panel in one call and map the words back to line indices"""
+        if not line_boxes:
+            return {}
+        
+        top = line_boxes[0][1]
+        bottom = line_boxes[-1][3]
+        panel = screenshot.crop((line_boxes[0][0], top, line_boxes[0][2], bottom))
+        
+        # Resize like the per-line path so Tesseract sees the same text size
+        scale = 2
+        panel = panel.resize((panel.width * scale, panel.height * scale))
+        
+        try:
+            data = self.ocr_engine.image_to_data(panel, config=self.ocr_config)
+        except Exception as e:
+            print(f"OCR error: {e}")
+            return {}
+        
+        # Centre of every line in screenshot coordinates
+        centers = [(box[1] + box[3]) / 2 for box in line_boxes]
+        spacing = self.log_crop_coords["LINE_SPACING"]
+        
+        line_words = {}
+        for i, word in enumerate(data['text']):
+            word = word.strip()
+            if not word:
+                continue
+            
+            # Word centre back in screenshot coordinates
+            word_y = top + (data['top'][i] + data['height'][i] / 2) / scale
+            
+            # Estimate the line from the spacing, then let the neighbours absorb line_adjustments drift
+            guess = int(round((word_y - centers[0]) / spacing))
+            candidates = [j for j in (guess - 1, guess, guess + 1) if 0 <= j < len(centers)]
+            if not candidates:
+                candidates = [0 if guess < 0 else len(centers) - 1]
+            index = min(candidates, key=lambda j: abs(centers[j] - word_y))
+            
+            line_words.setdefault(index, []).append((data['left'][i], word))
+        
+        ocr_results = {}
+        for index in range(len(line_boxes)):
+            words = sorted(line_words.get(index, []))
+            ocr_results[index] = self.clean_ocr_text(' '.join(word for _, word in words), line_num=index)
+        
+        return ocr_results
+    
     def apply_ocr_corrections(self, text):
         """Apply OCR corrections from replacements file"""
-        # Apply all replacements from the loaded configuration
-        for old, new in self.replacements.items():
-            text = text.replace(old, new)
-            
-        # Apply special formatting if configured
-        if self.special_formatting:
-            # Handle word spacing
-            spacing_words = self.special_formatting.get('word_spacing', [])
-            for word in spacing_words:
-                text = text.replace(word, f" {word} ")
-                text = text.replace(f"  {word}", f" {word}")
-                text = text.replace(f"{word}  ", f"{word} ")
-                text = text.replace(f"{word} !", f"{word}!")
-            
-            # Clean endings
-            clean_endings = self.special_formatting.get('clean_endings', {})
-            if clean_endings.get('remove_quotes'):
-                text = text.replace("'", "'").replace("'", "'").replace('"', "'")
-                text = text.replace("''", "'")
-            
-            if clean_endings.get('fix_parentheses'):
-                text = text.replace("{", "(").replace("}", ")")
-                text = text.replace(")))", ")!")
-                text = text.replace("'l", "'!")
+        # Replacements, word spacing and clean endings, in that order
+        text = self.replacement_engine.apply(text)
         
         # Always remove multiple spaces
-        text = re.sub(r'\s+', ' ', text)
+        text = ' '.join(text.split())
             
-        return text.strip()
+        return text
     
     def line_matches_format(self, line):
         """Check if line matches log format"""
         return self.log_pattern.match(line) is not None
     
     def process_screenshot(self, screenshot):
-        """Process a screenshot and track individual lines"""
-        cropped_lines = self.crop_image_to_lines(screenshot)
+        """
+        Process a screenshot and track individual lines
+        screenshot: Frame, or a PIL image which is converted to one
+        """
+        self.reload_replacements_if_changed()
+        
+        # Lines are views of the frame, a PIL image of a line is only made for OCR and
+        # for the lines of a message
+        frame = as_frame(screenshot)
+        line_boxes = self.get_line_boxes(frame.height)
+        
+        # Nothing happened in the tribe - the messages are the same as last time, but they
+        # still count as seen again for threshold validation
+        panel_digest = None
+        if self.skip_unchanged and line_boxes:
+            panel = (line_boxes[0][0], line_boxes[0][1], line_boxes[0][2], line_boxes[-1][3])
+            panel_digest = f"{frame.digest(panel)}|{self.replacements_version}"
+            if self.last_panel and self.last_panel[0] == panel_digest:
+                _, messages, message_images = self.last_panel
+                print(f"Log panel unchanged, counting {len(messages)} messages as seen again")
+                self.update_message_tracking(messages, message_images)
+                return self.build_entries_from_validated_messages()
+        
+        line_views = [frame.view(box) for box in line_boxes]
+        # Grayscale of every line, shared by the blank check and the scroll fingerprints
+        line_grays = []
+        if self.blank_line_std > 0 or self.scroll_align:
+            line_grays = [grayscale_array(line) for line in line_views]
+        ocr_start = time.time()
         
-        # OCR all lines in parallel
         ocr_results = {}
-        threads = []
+        pending = list(range(len(line_views)))
         
-        def ocr_worker(index, line):
-            # Don't skip lines based on contrast - process everything
-            # Even low contrast lines might contain important continuation text
-            
-            ocr_results[index] = self.ocr_line(line, line_num=index)
+        # Empty rows at the bottom of the panel have nothing for Tesseract to read.
+        # Only uniform rows count - faint continuation text is well above this threshold.
+        if self.blank_line_std > 0:
+            blank = {i for i, gray in enumerate(line_grays) if is_blank(gray, self.blank_line_std)}
+            for i in blank:
+                ocr_results[i] = ""
+            pending = [i for i in pending if i not in blank]
+        
+        # Lines that only scrolled since the last frame keep their previous text
+        fingerprints = []
+        if self.scroll_align:
+            fingerprints = [self.line_fingerprint(gray) for gray in line_grays]
+            mapping = self.align_with_previous(fingerprints, line_grays)
+            if mapping:
+                for i, j in mapping.items():
+                    ocr_results[i] = self.previous_lines[j][2]
+                pending = [i for i in pending if i not in mapping]
         
-        for i, line in enumerate(cropped_lines):
-            # Resize BEFORE OCR, just like old system (default resize, no filter specified)
-            width, height = line.size
-            resized_line = line.resize((width * 2, height * 2))
+        # Lines with pixels we have already read come straight from the cache
+        cache_keys = []
+        if self.ocr_cache:
+            namespace = f"{self.ocr_mode}|{self.ocr_config}|{self.replacements_version}"
+            cache_keys = [OCRCache.make_key(line, namespace) for line in line_views]
+            still_pending = []
+            for i in pending:
+                cached = self.ocr_cache.get(cache_keys[i])
+                if cached is None:
+                    still_pending.append(i)
+                else:
+                    ocr_results[i] = cached
+            pending = still_pending
+        
+        if pending and self.ocr_mode == 'batched':
+            # One OCR call for the whole panel, mapped back to lines by geometry
+            batch_results = self.ocr_panel_batched(frame, line_boxes)
+            for i in pending:
+                ocr_results[i] = batch_results.get(i, "")
+        elif pending:
+            # OCR all lines in parallel on the shared workers
+            def ocr_worker(index):
+                # Don't skip lines based on contrast - process everything
+                # Even low contrast lines might contain important continuation text
+                
+                # Resize BEFORE OCR, just like old system (default resize, no filter specified)
+                line = frame.crop(line_boxes[index])
+                width, height = line.size
+                resized_line = line.resize((width * 2, height * 2))
+                return self.ocr_line(resized_line, line_num=index)
             
-            thread = threading.Thread(target=ocr_worker, args=(i, resized_line))
-            threads.append(thread)
-            thread.start()
+            results = self.ocr_executor.map(ocr_worker, pending, default="")
+            for i, text in zip(pending, results):
+                ocr_results[i] = text
         
-        for thread in threads:
-            thread.join()
+        if self.ocr_cache:
+            for i in pending:
+                # Empty results may be OCR errors, so only cache real text
+                if ocr_results.get(i):
+                    self.ocr_cache.put(cache_keys[i], ocr_results[i])
+        
+        print(f"OCR ({self.ocr_mode}) of {len(pending)}/{len(line_views)} lines took {(time.time() - ocr_start) * 1000:.0f}ms")
+        
+        if self.scroll_align:
+            self.previous_lines = [(fp, line_grays[i], ocr_results.get(i, "")) for i, fp in enumerate(fingerprints)]
         
         # Build complete messages first (like old system), then track them
         current_message = ""
@@ -281,7 +523,7 @@ class LogProcessor:
         
         # Print all OCR results in order
         print("\n=== OCR Results in Order ===")
-        for i in range(len(cropped_lines)):
+        for i in range(len(line_views)):
             line_text = ocr_results.get(i, "").strip()
             # Print ALL lines including empty ones to debug
             print(f"Line {i:2d}: '{line_text}'")
@@ -298,7 +540,7 @@ class LogProcessor:
                 if current_message:
                     message_images[current_message.strip()] = current_images
                 current_message = line_text
-                current_images = [cropped_lines[i]]
+                current_images = [frame.crop(line_boxes[i])]
             else:
                 # Continuation line - process like old system
                 if not line_text.startswith("Day "):
@@ -306,7 +548,7 @@ class LogProcessor:
                     if current_message:
                         # Add space and text (even if empty - maintains spacing)
                         current_message = current_message.strip() + " " + line_text.strip()
-                        current_images.append(cropped_lines[i])
+                        current_images.append(frame.crop(line_boxes[i]))
                 else:
                     # Line starts with "Day" but doesn't match format
                     # Old system clears the message and prints warning
@@ -429,21 +671,9 @@ class LogProcessor:
             # Trim trailing empty/blank line images from all entries
             # This prevents saving images of blank lines after the actual content
             trimmed_images = images[:]
-            while len(trimmed_images) > 1:
-                # Check if the last image is mostly blank
-                last_img = trimmed_images[-1]
-                pixels = list(last_img.convert('L').getdata())
-                if pixels:
-                    mean = sum(pixels) / len(pixels)
-                    variance = sum((p - mean) ** 2 for p in pixels) / len(pixels)
-                    std_dev = variance ** 0.5
-                    # If very low variance (blank/uniform), remove it
-                    if std_dev < 5:
-                        trimmed_images.pop()
-                    else:
-                        break
-                else:
-                    break
+            # If the last image has very low variance (blank/uniform), remove it
+            while len(trimmed_images) > 1 and is_blank(trimmed_images[-1], 5):
+                trimmed_images.pop()
             
             completed_messages[message] = trimmed_images
         
@@ -451,6 +681,12 @@ class LogProcessor:
         
         # Get list of complete messages
         messages = list(message_images.keys())
+        # A line that timed out or errored reads as empty - replaying that panel would keep the
+        # missing text forever, so like the OCR cache only panels read in full are kept
+        if panel_digest and all(ocr_results.get(i) for i in pending):
+            self.last_panel = (panel_digest, messages, message_images)
+        else:
+            self.last_panel = None
         
         # Update tracking with complete messages
         self.update_message_tracking(messages, message_images)
@@ -460,54 +696,127 @@ class LogProcessor:
     
     def update_message_tracking(self, messages, message_images):
         """Update tracking for complete messages (like old system)"""
+        # Messages read exactly as tracked claim their tracked message first, so an OCR
+        # variant of a neighbouring event can not take it from them
+        matched = {message for message in messages if message in self.line_counts}
+        offset = self.scroll_offset(messages)
+        frame_messages = []
+        
         # Track complete messages instead of individual lines
-        for message in messages:
+        for index, message in enumerate(messages):
             print(f"Tracking message: {message}")
             
-            # Find if we've seen this message before
-            found_similar = False
-            for tracked_msg in list(self.line_counts.keys()):
-                if self.is_similar_text(message, tracked_msg):
-                    count = self.line_counts[tracked_msg]
-                    self.line_counts[tracked_msg] = count + 1
-                    if count + 1 >= self.log_seen_threshold:
-                        # Message has been validated!
-                        self.validated_lines[tracked_msg] = {
-                            'text': tracked_msg,
-                            'images': message_images.get(message, [])
-                        }
-                        print(f"Message validated ({count + 1}x): {tracked_msg}")
-                    found_similar = True
-                    break
-            
-            if not found_similar:
+            # Find if we've seen this message before. Each tracked message is seen at most
+            # once per frame - two similar messages on one screen are two events.
+            if message in self.line_counts:
+                tracked_msg = message
+            else:
+                tracked_msg = self.find_tracked_message(message, exclude=matched)
+                if tracked_msg is None and offset is not None:
+                    tracked_msg = self.find_scrolled_message(message, index - offset, exclude=matched)
+            frame_messages.append(tracked_msg or message)
+            if tracked_msg is not None:
+                matched.add(tracked_msg)
+                count = self.line_counts[tracked_msg]
+                self.line_counts[tracked_msg] = count + 1
+                if count + 1 >= self.log_seen_threshold:
+                    # Message has been validated!
+                    self.validated_lines[tracked_msg] = {
+                        'text': tracked_msg,
+                        'images': message_images.get(message, [])
+                    }
+                    print(f"Message validated ({count + 1}x): {tracked_msg}")
+            else:
                 # New message
-                self.line_counts[message] = 1
+                self.track_message(message)
+                matched.add(message)
         
-        # Decrement counts for messages not seen
+        # Decrement counts for messages not seen, a message seen as an OCR variant counts as seen
+        seen = set(messages) | matched
         for msg in list(self.line_counts.keys()):
-            if msg not in messages:
+            if msg not in seen:
                 count = self.line_counts[msg]
                 if count > 1:
                     self.line_counts[msg] = count - 1
                 else:
-                    del self.line_counts[msg]
+                    self.untrack_message(msg)
                     # Also remove from validated if it exists
                     if msg in self.validated_lines:
                         del self.validated_lines[msg]
+        self.previous_messages = frame_messages
+    
+    def scroll_offset(self, messages):
+        """
+        How many places the messages moved since the last frame, from the messages read
+        exactly as before, or None if none of them were
+        """
+        previous = {message: index for index, message in enumerate(self.previous_messages)}
+        offsets = Counter(index - previous[message] for index, message in enumerate(messages) if message in previous)
+        if not offsets:
+            return None
+        return offsets.most_common(1)[0][0]
+    
+    def find_scrolled_message(self, message, previous_index, exclude=()):
+        """
+        The tracked message that was at previous_index in the last frame, if this message is
+        an OCR variant of it. Only here may the Day/time differ by a misread digit - the
+        position says it is the same event, where elsewhere it could be a repeat a second later.
+        """
+        if not 0 <= previous_index < len(self.previous_messages):
+            return None
+        tracked_msg = self.previous_messages[previous_index]
+        if tracked_msg in exclude or tracked_msg not in self.line_counts:
+            return None
+        if is_similar_log_entry(message, tracked_msg, prefix_threshold=1):
+            return tracked_msg
+        return None
+    
+    def parse_game_time(self, text):
+        """Get (day, seconds into the day) from a log entry, or None if it has no timestamp"""
+        match = self.game_time_pattern.match(text)
+        if not match:
+            return None
+        day, hours, minutes, seconds = (int(group) for group in match.groups())
+        return day, hours * 3600 + minutes * 60 + seconds
+    
+    def tracking_bucket(self, text):
+        """Get the game minute a message was logged in, or None if it has no timestamp"""
+        game_time = self.parse_game_time(text)
+        if game_time is None:
+            return None
+        day, seconds = game_time
+        return day * 1440 + seconds // 60
+    
+    def find_tracked_message(self, message, exclude=()):
+        """
+        Find a tracked message similar to this one, or None if it is new
+        exclude: Tracked messages that are already taken
+        """
+        # Similar messages share their Day/time, so only one minute needs checking. A misread
+        # digit is only forgiven by find_scrolled_message.
+        for tracked_msg in self.tracking_index.get(self.tracking_bucket(message), ()):
+            if tracked_msg not in exclude and self.is_similar_text(message, tracked_msg):
+                return tracked_msg
+        return None
+    
+    def track_message(self, message):
+        """Start tracking a new message"""
+        self.line_counts[message] = 1
+        self.tracking_index.setdefault(self.tracking_bucket(message), []).append(message)
+    
+    def untrack_message(self, message):
+        """Stop tracking a message"""
+        del self.line_counts[message]
+        bucket = self.tracking_bucket(message)
+        tracked = self.tracking_index.get(bucket)
+        if tracked and message in tracked:
+            tracked.remove(message)
+            if not tracked:
+                del self.tracking_index[bucket]
     
     def is_similar_text(self, text1, text2, threshold=5):
-        """Check if two texts are similar enough"""
-        if abs(len(text1) - len(text2)) > 10:
-            return False
-        
-        # Use edit distance for short texts
-        if len(text1) < 50:
-            differences = sum(1 for a, b in zip(text1, text2) if a != b)
-            return differences <= threshold
-        
-        # For longer texts, allow more differences
-        return text1[:30] == text2[:30]  # Check if beginning matches
+        """Check if two texts are similar enough (same Day/time, message within threshold edits or 10%)"""
+        return is_similar_log_entry(text1, text2, threshold)
     
     def build_entries_from_validated_messages(self):
         """Build entries from validated complete messages"""
@@ -526,57 +835,102 @@ class LogProcessor:
     
     def save_log_entry_with_images(self, entry_text, images):
         """Save a log entry with its associated images to SQLite databases"""
+        self.save_log_entries([(entry_text, images)])
+    
+    def prepare_log_entry(self, entry_text, images):
+        """Parse an entry and hash its line images, returning (log row, [(strip hash, image)])"""
         if not entry_text.startswith("Day "):
-            return
+            return None
         
         # Parse day and time from entry
         day_match = re.match(r'Day (\d+), (\d{2}:\d{2}:\d{2}):', entry_text)
         if not day_match:
             print(f"Warning: Could not parse day/time from: {entry_text}")
-            return
+            return None
         
         day = int(day_match.group(1))
         time_str = day_match.group(2)
         
-        # Generate unique ID for images
-        image_id = str(uuid.uuid4())
+        image_id = None
+        strips = []
         
-        try:
-            # Save combined image if exists
-            if images:
-                combined_image = self.combine_images(images)
-                if combined_image:
-                    # Convert image to bytes
-                    img_buffer = BytesIO()
-                    combined_image.save(img_buffer, format='PNG')
-                    img_data = img_buffer.getvalue()
+        # Each line is stored once by the hash of its pixels, the entry keeps their order
+        if images:
+            strips = [(strip_hash(img), img) for img in images]
+            
+            # Generate unique ID for images
+            image_id = str(uuid.uuid4())
+        
+        return (day, time_str, entry_text, image_id), strips
+    
+    def save_log_entries(self, entries):
+        """
+        Save log entries with their images, one transaction per database
+        entries: List of (entry_text, images)
+        Returns (entries new to the database, entries that could not be written and
+        should be tried again). Entries that already existed are in neither.
+        """
+        log_rows = []
+        image_strips = []
+        strip_images = {}
+        unsaved = []
+        for entry_text, images in entries:
+            try:
+                prepared = self.prepare_log_entry(entry_text, images)
+            except Exception as e:
+                print(f"Error saving log entry: {e}")
+                unsaved.append(entry_text)
+                continue
+            if prepared:
+                log_row, strips = prepared
+                log_rows.append(log_row)
+                for position, (hash_, img) in enumerate(strips):
+                    image_strips.append((log_row[3], position, hash_))
+                    strip_images.setdefault(hash_, img)
+        
+        if not log_rows:
+            return [], unsaved
+        
+        # If the database write fails, none of the rows made it
+        failed = unsaved + [row[2] for row in log_rows]
+        delay = self.save_retry_delay
+        for attempt in range(self.save_retries + 1):
+            try:
+                # Only strips the store has never seen need encoding. The write lock is held from
+                # the check to the save so maintenance can not remove a strip in between.
+                with self.storage.write_lock:
+                    strip_rows = []
+                    for hash_ in self.storage.missing_strips(strip_images):
+                        img = strip_images[hash_]
+                        data = encode_strip(img, self.line_image_format)
+                        strip_rows.append((hash_, data, self.line_image_format, img.width, img.height))
                     
-                    # Save to images database
-                    with sqlite3.connect(self.log_images_db_path) as conn:
-                        conn.execute('''
-                            INSERT INTO log_images (id, image_data, width, height)
-                            VALUES (?, ?, ?, ?)
-                        ''', (image_id, img_data, combined_image.width, combined_image.height))
-            else:
-                image_id = None
-            
-            # Save log entry to database
-            with sqlite3.connect(self.log_db_path) as conn:
-                conn.execute('''
-                    INSERT OR IGNORE INTO logs (day, time, entry_text, image_id)
-                    VALUES (?, ?, ?, ?)
-                ''', (day, time_str, entry_text, image_id))
-                
-                # Check if it was actually inserted
-                if conn.total_changes > 0:
-                    print(f"Saved to database: {entry_text}")
-                else:
-                    print(f"Entry already exists: {entry_text}")
+                    saved = self.storage.save_log_entries(log_rows, strip_rows, image_strips)
+                break
+            except sqlite3.OperationalError as e:
+                # Locked for longer than busy_timeout - each transaction rolled back and the
+                # inserts ignore rows that made it, so the whole save can run again
+                if 'locked' not in str(e) or attempt == self.save_retries:
+                    print(f"Database error: {e}")
+                    return [], failed
+                print(f"Database locked, retrying the save in {delay:.1f}s")
+                time.sleep(delay)
+                delay *= 2
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                return [], failed
+            except Exception as e:
+                print(f"Error saving log entry: {e}")
+                return [], failed
         
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-        except Exception as e:
-            print(f"Error saving log entry: {e}")
+        # Check if each entry was actually inserted
+        saved_set = set(saved)
+        for row in log_rows:
+            if row[2] in saved_set:
+                print(f"Saved to database: {row[2]}")
+            else:
+                print(f"Entry already exists: {row[2]}")
+        return saved, unsaved
     
     def combine_images(self, images):
         """Combine multiple line images into a single image"""
@@ -584,20 +938,7 @@ class LogProcessor:
             return None
         
         try:
-            # Calculate total height and max width
-            total_height = sum(img.height for img in images)
-            max_width = max(img.width for img in images)
-            
-            # Create combined image
-            combined = Image.new('RGB', (max_width, total_height))
-            
-            # Paste each image
-            y_offset = 0
-            for img in images:
-                combined.paste(img, (0, y_offset))
-                y_offset += img.height
-            
-            return combined
+            return stack_images(images)
         except Exception as e:
             print(f"Error combining images: {e}")
             return None
@@ -609,6 +950,17 @@ class LogProcessor:
         # Process screenshot - this updates line tracking
         entries_with_images = self.process_screenshot(screenshot)
         
+        # Persist new cache entries and show how well the cache is doing
+        if self.ocr_cache:
+            self.ocr_cache.flush()
+            stats = self.ocr_cache.stats()
+            print(f"OCR cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1f}%), {stats['size']} entries")
+        stats = self.ocr_executor.stats()
+        print(f"OCR workers: {stats['workers']}, queue depth {stats['queue_depth']}, "
+              f"latency avg {stats['avg_latency_ms']:.0f}ms / p95 {stats['p95_latency_ms']:.0f}ms / max {stats['max_latency_ms']:.0f}ms, "
+              f"queue wait avg {stats['avg_queue_wait_ms']:.0f}ms, timeouts {stats['timeouts']}, "
+              f"{stats['abandoned']} timed out still running, pool replaced {stats['pool_replacements']} times")
+        
         # Show message tracking status
         print(f"\n=== Message Tracking Status ===")
         for msg, count in self.line_counts.items():
@@ -621,16 +973,30 @@ class LogProcessor:
         new_count = 0
         newest_entry = None
         
-        for entry_text, images in entries_with_images:
-            if entry_text not in self.printed_entries:
-                self.save_log_entry_with_images(entry_text, images)
-                self.printed_entries[entry_text] = True
-                new_count += 1
-                print(f"\nSaved new entry: {entry_text}")
-                
-                # Track the newest entry we've seen
-                if not newest_entry or self.is_newer_entry(entry_text, newest_entry):
-                    newest_entry = entry_text
+        new_entries = [(entry_text, images) for entry_text, images in entries_with_images
+                       if entry_text not in self.printed_entries]
+        
+        # Everything validated this cycle is written in one transaction per database.
+        # Entries that failed stay unprinted, so the next cycle tries them again.
+        unsaved = set()
+        if new_entries:
+            _, unsaved = self.save_log_entries(new_entries)
+            unsaved = set(unsaved)
+        
+        for entry_text, _ in new_entries:
+            if entry_text in unsaved:
+                continue
+            self.printed_entries.add(entry_text)
+            new_count += 1
+            print(f"\nSaved new entry: {entry_text}")
+            
+            # Track the newest entry we've seen
+            if not newest_entry or self.is_newer_entry(entry_text, newest_entry):
+                newest_entry = entry_text
+        
+        if new_count and time.time() - self.seen_state_saved > self.seen_state_interval:
+            self.printed_entries.save_state()
+            self.seen_state_saved = time.time()
         
         if new_count > 0:
             print(f"\nTotal: Saved {new_count} new log entries")
@@ -639,40 +1005,56 @@ class LogProcessor:
         else:
             print("\nNo new complete entries to save")
             print(f"Validated entries: {len(self.validated_lines)}")
-            print(f"Already processed entries: {len(self.printed_entries)}")
+            stats = self.printed_entries.stats()
+            print(f"Already processed entries: {stats['entries']} ({stats['recent']} recent, "
+                  f"{stats['db_lookups']} database lookups, {stats['bloom_kb']:.0f}KB Bloom filter)")
             if not self.validated_lines:
                 print("(waiting for messages to be validated)")
             
             # Periodically cleanup to prevent memory issues
             self.cleanup_old_entries()
+        
+        self.cycle_count += 1
+        if self.warm_state_interval and self.cycle_count % self.warm_state_interval == 0:
+            self.save_warm_state()
+
+    def save_warm_state(self):
+        """Snapshot the message tracking state"""
+        try:
+            self.warm_state.save({
+                'line_counts': dict(self.line_counts),
+                'validated': list(self.validated_lines),
+            })
+        except RuntimeError as e:
+            # Changed by the processing thread while copying at exit, the last snapshot stays
+            print(f"Warm state: Skipped snapshot: {e}")
+
+    def restore_warm_state(self):
+        """Resume message tracking from a recent snapshot"""
+        state = self.warm_state.load()
+        if not state:
+            return
+        # Restored messages need one more sighting to validate, which brings the line
+        # images their entry is saved with. Already saved ones are skipped as usual.
+        cap = max(1, self.log_seen_threshold - 1)
+        counts = dict(state.get('line_counts', {}))
+        for message in state.get('validated', []):
+            counts[message] = cap
+        for message, count in counts.items():
+            if message not in self.line_counts:
+                self.track_message(message)
+            self.line_counts[message] = max(1, min(int(count), cap))
+        print(f"Restored {len(counts)} tracked messages")
 
     def cleanup_old_entries(self):
         """Periodically clean up old entries to prevent memory bloat"""
-        current_size = len(self.printed_entries)
-        if current_size > 5000:  # Cleanup when we have too many entries
-            # Keep only the most recent 2000 entries
-            print(f"Cleaning up printed_entries cache ({current_size} entries)...")
-            
-            # Get recent entries from database
-            recent_entries = set()
-            with sqlite3.connect(self.log_db_path) as conn:
-                cursor = conn.execute('''
-                    SELECT entry_text FROM logs 
-                    WHERE timestamp > datetime('now', '-6 hours')
-                    ORDER BY id DESC
-                    LIMIT 2000
-                ''')
-                for row in cursor:
-                    recent_entries.add(row[0])
-            
-            # Keep only entries that are in recent_entries
-            self.printed_entries = {k: v for k, v in self.printed_entries.items() if k in recent_entries}
-            print(f"Cleaned up to {len(self.printed_entries)} entries")
-        
-        # Also cleanup line_counts dictionary
+        # printed_entries is bounded by itself, only line_counts needs trimming
         if len(self.line_counts) > 1000:
             # Remove entries with count 0 or very old entries
             self.line_counts = {k: v for k, v in self.line_counts.items() if v > 0}
+            self.tracking_index = {}
+            for msg in self.line_counts:
+                self.tracking_index.setdefault(self.tracking_bucket(msg), []).append(msg)
             print(f"Cleaned up line_counts to {len(self.line_counts)} entries")
 
 
@@ -0,0 +1,298 @@
+import time
+import sqlite3
+import threading
+from storage import get_storage
+
+# Days to keep rows of each table, 0 keeps them forever. Deleting a log entry also
+# deletes its image.
+DEFAULT_RETENTION_DAYS = {
+    'logs': 0,
+    'member_snapshots': 30,
+    'discord_sent': 30,
+}
+
+# (database, table, timestamp column) of each table with a retention policy
+RETENTION_TABLES = {
+    'logs': ('log', 'logs', 'timestamp'),
+    'member_snapshots': ('member', 'member_snapshots', 'timestamp'),
+    'discord_sent': ('discord_sent', 'discord_sent', 'sent_timestamp'),
+}
+
+
+class MaintenanceJob:
+    def __init__(self, config, storage=None):
+        """
+        Background retention, compaction and vacuum for the bot's databases
+        Works in small batches with a pause between them, each batch holding the
+        storage write lock only briefly, so the monitoring loop is never held up.
+        config: retention_days, maintenance_interval, maintenance_batch_size, archive_compact_ratio,
+                maintenance_convert_auto_vacuum
+        """
+        retention = config.get('retention_days', {})
+        self.retention_days = {table: int(retention.get(table, days))
+                               for table, days in DEFAULT_RETENTION_DAYS.items()}
+        self.interval = config.get('maintenance_interval', 3600)  # Seconds between runs
+        self.batch_size = config.get('maintenance_batch_size', 500)
+        self.batch_pause = 0.05  # Seconds between batches
+        self.vacuum_pages = 1000  # Pages freed per incremental_vacuum step
+        # Archive segments with less than this share of live bytes are rewritten
+        self.compact_ratio = config.get('archive_compact_ratio', 0.5)
+        # Databases created before incremental auto_vacuum need one full VACUUM to switch.
+        # That rewrites the whole file, so it only runs when asked for, ideally off-peak.
+        self.convert_auto_vacuum = config.get('maintenance_convert_auto_vacuum', False)
+        self._conversion_noted = set()
+        self.storage = storage or get_storage(config)
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Run maintenance in a background thread every interval"""
+        if self.thread is None or not self.thread.is_alive():
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._loop, name="maintenance", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        # Let startup finish before the first run
+        while not self._stop.wait(min(60, self.interval)):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Maintenance error: {e}")
+            if self._stop.wait(max(0, self.interval - 60)):
+                break
+        self.storage.release()
+
+    def run_once(self):
+        """One full maintenance pass, returning a report dict"""
+        start = time.time()
+        report = {'deleted': {}, 'orphan_strips': 0, 'segments_removed': 0, 'reclaimed': {}}
+
+        for table, days in self.retention_days.items():
+            if days > 0:
+                report['deleted'][table] = self.expire_rows(table, days)
+        report['orphan_strips'] = self.delete_orphan_strips()
+        report['segments_removed'], archive_bytes = self.compact_archive()
+
+        for name in self.storage.paths:
+            report['reclaimed'][name] = self.vacuum(name)
+        if archive_bytes:
+            report['reclaimed']['archive'] = archive_bytes
+
+        deleted = ', '.join(f"{count} {table}" for table, count in report['deleted'].items())
+        reclaimed = sum(report['reclaimed'].values())
+        print(f"Maintenance: deleted {deleted or 'nothing'}, {report['orphan_strips']} orphan strips, "
+              f"{report['segments_removed']} archive segments, reclaimed {reclaimed / 1024 / 1024:.1f}MB "
+              f"in {time.time() - start:.1f}s")
+        return report
+
+    def _pause(self):
+        return self._stop.wait(self.batch_pause)
+
+    def expire_rows(self, table, days):
+        """Delete rows older than days from a table, oldest first, returning how many went"""
+        name, table_name, column = RETENTION_TABLES[table]
+        conn = self.storage.connection(name)
+        cutoff = conn.execute("SELECT datetime('now', ?)", (f'-{days} days',)).fetchone()[0]
+        deleted = 0
+
+        while True:
+            # Rows are inserted in time order, so the oldest are at the start of the rowid
+            # order and a batch stops at the first row that is still kept
+            rows = conn.execute(f'''
+                SELECT rowid, {column}{", image_id" if table == 'logs' else ""}
+                FROM {table_name}
+                ORDER BY rowid
+                LIMIT ?
+            ''', (self.batch_size,)).fetchall()
+            expired = []
+            for row in rows:
+                if row[1] is None or row[1] >= cutoff:
+                    break
+                expired.append(row)
+            if not expired:
+                break
+
+            with self.storage.write_lock:
+                with conn:
+                    conn.execute(f'DELETE FROM {table_name} WHERE rowid <= ? AND {column} < ?',
+                                 (expired[-1][0], cutoff))
+                if table == 'logs':
+                    self.delete_log_images([row[2] for row in expired if row[2]])
+            deleted += len(expired)
+            if len(expired) < len(rows) or self._pause():
+                break
+        return deleted
+
+    def delete_log_images(self, image_ids):
+        """Drop the images of deleted log entries, their strips go once nothing uses them"""
+        if not image_ids:
+            return
+        conn = self.storage.connection('images')
+        params = [(image_id,) for image_id in image_ids]
+        with self.storage.write_lock, conn:
+            conn.executemany('DELETE FROM log_images WHERE id = ?', params)
+            conn.executemany('DELETE FROM log_image_strips WHERE image_id = ?', params)
+
+    def delete_orphan_strips(self):
+        """Delete line strips no log image uses any more, returning how many went"""
+        conn = self.storage.connection('images')
+        deleted = 0
+        last_hash = ''
+        while True:
+            # Walk the strips in hash order so each batch picks up where the last stopped
+            rows = conn.execute('''
+                SELECT hash, EXISTS (SELECT 1 FROM log_image_strips WHERE strip_hash = line_strips.hash)
+                FROM line_strips
+                WHERE hash > ?
+                ORDER BY hash
+                LIMIT ?
+            ''', (last_hash, self.batch_size)).fetchall()
+            if not rows:
+                break
+            last_hash = rows[-1][0]
+            orphans = [(row[0],) for row in rows if not row[1]]
+            if orphans:
+                with self.storage.write_lock, conn:
+                    # Checked again under the lock in case an entry started using the strip
+                    cursor = conn.executemany('''
+                        DELETE FROM line_strips
+                        WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM log_image_strips WHERE strip_hash = line_strips.hash)
+                    ''', orphans)
+                    deleted += cursor.rowcount
+            if len(rows) < self.batch_size or self._pause():
+                break
+        return deleted
+
+    def compact_archive(self):
+        """
+        Remove archive segments nothing points into and rewrite mostly dead ones
+        Returns (segments removed, bytes freed)
+        """
+        storage = self.storage
+        if storage.image_store != 'archive' and not self._has_archived_images():
+            return 0, 0
+        archive = storage.archive
+        conn = storage.connection('images')
+        removed = 0
+        freed = 0
+
+        for segment in archive.segments():
+            if segment == archive.current_segment:
+                continue
+            size = archive.segment_size_on_disk(segment)
+            live = sum(conn.execute(f'SELECT COALESCE(SUM(blob_length), 0) FROM {table} WHERE segment = ?',
+                                    (segment,)).fetchone()[0]
+                       for table in ('line_strips', 'log_images'))
+            if live and live >= size * self.compact_ratio:
+                continue
+            if live and not self._move_segment(segment):
+                continue
+            try:
+                freed += archive.remove_segment(segment) - live
+                removed += 1
+            except OSError as e:
+                # Still mapped by a reader on Windows, the next run gets it
+                print(f"Maintenance: could not remove archive segment {segment}: {e}")
+            if self._pause():
+                break
+        return removed, freed
+
+    def _has_archived_images(self):
+        conn = self.storage.connection('images')
+        return any(conn.execute(f'SELECT 1 FROM {table} WHERE segment IS NOT NULL LIMIT 1').fetchone()
+                   for table in ('line_strips', 'log_images'))
+
+    def _move_segment(self, segment):
+        """Copy the live blobs of a segment to the end of the archive, returns False if stopped"""
+        archive = self.storage.archive
+        conn = self.storage.connection('images')
+        for table, key in (('line_strips', 'hash'), ('log_images', 'id')):
+            while True:
+                rows = conn.execute(f'''
+                    SELECT {key}, blob_offset, blob_length FROM {table} WHERE segment = ? LIMIT ?
+                ''', (segment, self.batch_size)).fetchall()
+                if not rows:
+                    break
+                with self.storage.write_lock:
+                    updates = []
+                    for row_key, offset, length in rows:
+                        data = bytes(archive.read(segment, offset, length))
+                        updates.append(archive.append(data) + (row_key,))
+                    archive.flush()
+                    with conn:
+                        conn.executemany(f'''
+                            UPDATE {table} SET segment = ?, blob_offset = ?, blob_length = ? WHERE {key} = ?
+                        ''', updates)
+                if self._pause():
+                    return False
+        return True
+
+    def vacuum(self, name):
+        """Give free pages of a database back to the file system, returning the bytes reclaimed"""
+        conn = self.storage.connection(name)
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        start_pages = conn.execute('PRAGMA page_count').fetchone()[0]
+        incremental = conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        if not incremental and self.convert_auto_vacuum:
+            incremental = self.convert_to_incremental(name)
+        elif not incremental and name not in self._conversion_noted:
+            self._conversion_noted.add(name)
+            print(f"Maintenance: {self.storage.paths[name]} does not use incremental auto_vacuum, "
+                  f"set maintenance_convert_auto_vacuum to convert it")
+
+        while incremental and conn.execute('PRAGMA freelist_count').fetchone()[0]:
+            with self.storage.write_lock:
+                before = conn.execute('PRAGMA page_count').fetchone()[0]
+                conn.execute(f'PRAGMA incremental_vacuum({self.vacuum_pages})').fetchall()
+                after = conn.execute('PRAGMA page_count').fetchone()[0]
+            if before == after or self._pause():
+                break
+
+        # Shrink the WAL file as well. Saves wait on the write lock meanwhile, a checkpoint
+        # that finds readers in the way gives up after busy_timeout and the next run tries again.
+        with self.storage.write_lock:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+        # A conversion can add pointer-map pages, which is not a negative saving
+        return max(0, start_pages - conn.execute('PRAGMA page_count').fetchone()[0]) * page_size
+
+    def convert_to_incremental(self, name):
+        """
+        Switch a database to incremental auto_vacuum with a one time full VACUUM
+        The VACUUM can take far longer than busy_timeout, so it holds the storage write lock
+        and log saving pauses until it is done instead of failing. Reads carry on.
+        Best enabled for a quiet period.
+        Returns True if the database was converted
+        """
+        path = self.storage.paths[name]
+        print(f"Maintenance: converting {path} to incremental auto_vacuum (one time)")
+        conn = sqlite3.connect(path, isolation_level=None)
+        try:
+            conn.execute(f'PRAGMA busy_timeout={self.storage.busy_timeout}')
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            with self.storage.write_lock:
+                conn.execute('VACUUM')
+            return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        except sqlite3.OperationalError as e:
+            # Busy for longer than busy_timeout, the next run tries again
+            print(f"Maintenance: could not convert {path}: {e}")
+            return False
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    # Test maintenance on in-memory databases
+    from storage import Storage
+    storage = Storage({'log_db': ':memory:', 'log_images_db': ':memory:',
+                       'member_db': ':memory:', 'discord_sent_db': ':memory:'})
+    storage.save_members({'Alice'}, 1)
+    conn = storage.connection('member')
+    with conn:
+        conn.execute("UPDATE member_snapshots SET timestamp = datetime('now', '-40 days')")
+    job = MaintenanceJob({'retention_days': {'member_snapshots': 30}}, storage)
+    print(job.run_once())
+    storage.close()
@@ -1,10 +1,16 @@
 import os
 import time
+import atexit
 import sqlite3
 from datetime import datetime
 from PIL import Image
 import pytesseract
 import pyautogui
+from ocr_engine import get_ocr_engine
+from image_stats import is_blank
+from storage import get_storage
+from warm_state import WarmState
+from frame import FRAME_REGIONS, as_frame
 
 # Configure Tesseract path
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -20,10 +26,10 @@ class MemberProcessor:
             "ONLINE_COLOR": [128, 231, 255],  # RGB for online members
             
             # Member count region (shows "12/25" etc) - updated coordinates
-            "COUNT_REGION": (553, 276, 704, 318),
+            "COUNT_REGION": FRAME_REGIONS["member_count"],
             
             # Member list names region
-            "LIST_REGION": (176, 327, 402, 910),
+            "LIST_REGION": FRAME_REGIONS["member_list"],
             
             # Scrollbar positions
             "SCROLLBAR_TOP": (702, 340),
@@ -45,48 +51,34 @@ class MemberProcessor:
         self.last_scroll_direction = "down"
         self.online_member_count = 0  # Track the actual count from OCR
         
+        # A member count and list identical to the last ones reuse what was read from them
+        self.skip_unchanged = config.get('skip_unchanged_panels', True)
+        self.last_read = None  # (regions digest, count, names) of the last frame
+        
         # OCR configs
         self.count_ocr_config = '--psm 7 -c "tessedit_char_whitelist= 0123456789/"'
         self.name_ocr_config = '--psm 6'
+        self.ocr_engine = get_ocr_engine(config)
         
         # Database configuration
         self.member_db_path = config.get('member_db', './member.db')
         
         # Initialize database
         self.init_database()
+        
+        # Member tracking survives restarts through a snapshot every few cycles (0 to disable)
+        self.warm_state = WarmState(os.path.join(config.get('warm_state_dir', './warm_state'), 'member_processor.state'),
+                                    config.get('warm_state_max_age', 600))
+        self.warm_state_interval = config.get('warm_state_interval', 10)
+        self.cycle_count = 0
+        if self.warm_state_interval:
+            self.restore_warm_state()
+            atexit.register(self.save_warm_state)
     
     def init_database(self):
         """Initialize SQLite database for members"""
-        with sqlite3.connect(self.member_db_path) as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS members (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE,
-                    first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    last_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    times_seen INTEGER DEFAULT 1,
-                    is_online INTEGER DEFAULT 1
-                )
-            ''')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_name ON members(name)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_last_seen ON members(last_seen)')
-            
-            # Add is_online column if it doesn't exist (for existing databases)
-            try:
-                conn.execute('ALTER TABLE members ADD COLUMN is_online INTEGER DEFAULT 1')
-            except sqlite3.OperationalError:
-                # Column already exists
-                pass
-            
-            # Create a table for member snapshots (historical record)
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS member_snapshots (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    member_count INTEGER,
-                    members TEXT
-                )
-            ''')
+        # Shared connections (WAL, one per thread) - creates the tables on first use
+        self.storage = get_storage(self.config)
     
     def is_members_visible(self, screenshot):
         """Check if the members list is visible"""
@@ -105,10 +97,10 @@ class MemberProcessor:
         """Read the member count (e.g., "5/70")"""
         try:
             region = self.member_coords["COUNT_REGION"]
-            cropped = screenshot.crop(region)
+            cropped = as_frame(screenshot).crop(region)
             
             # OCR the count
-            text = pytesseract.image_to_string(cropped, config=self.count_ocr_config).strip()
+            text = self.ocr_engine.image_to_string(cropped, config=self.count_ocr_config).strip()
             
             # Extract just the current count
             if "/" in text:
@@ -123,26 +115,20 @@ class MemberProcessor:
         """Read the member names from the list with improved OCR"""
         try:
             region = self.member_coords["LIST_REGION"]
-            cropped = screenshot.crop(region)
+            frame = as_frame(screenshot)
+            
+            # Skip if image is too uniform (empty list) - checked on the frame before cropping
+            if is_blank(frame.view(region), 10):
+                return []
+            cropped = frame.crop(region)
             
             # Resize 2x for better OCR (like log processor)
             width, height = cropped.size
             cropped = cropped.resize((width * 2, height * 2))
             
             # DON'T convert to grayscale - match log processor approach
-            # Check if image has enough variance (not empty)
-            pixels = list(cropped.convert('L').getdata())
-            if pixels:
-                mean = sum(pixels) / len(pixels)
-                variance = sum((p - mean) ** 2 for p in pixels) / len(pixels)
-                std_dev = variance ** 0.5
-                
-                # Skip if image is too uniform
-                if std_dev < 10:
-                    return []
-            
             # OCR the names
-            text = pytesseract.image_to_string(cropped, config=self.name_ocr_config).strip()
+            text = self.ocr_engine.image_to_string(cropped, config=self.name_ocr_config).strip()
             
             # Split into lines and clean
             names = []
@@ -260,72 +246,76 @@ class MemberProcessor:
         member_count = self.online_member_count if self.online_member_count > 0 else len(self.member_set)
         
         try:
-            with sqlite3.connect(self.member_db_path) as conn:
-                # Mark members as offline based on last_seen time in database
-                current_time = time.time()
-                
-                # Update members who haven't been seen recently to offline
-                conn.execute('''
-                    UPDATE members 
-                    SET is_online = 0 
-                    WHERE is_online = 1 
-                    AND last_seen < datetime('now', '-2 minutes')
-                ''')
-                
-                # Get list of members who just went offline for logging
-                cursor = conn.execute('''
-                    SELECT name FROM members 
-                    WHERE is_online = 0 
-                    AND last_seen >= datetime('now', '-3 minutes')
-                    AND last_seen < datetime('now', '-2 minutes')
-                ''')
-                for row in cursor:
-                    print(f"Member went offline: {row[0]}")
-                
-                # Update or insert each online member
-                for member in self.member_set:
-                    conn.execute('''
-                        INSERT INTO members (name, first_seen, last_seen, times_seen, is_online)
-                        VALUES (?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, 1, 1)
-                        ON CONFLICT(name) DO UPDATE SET
-                            last_seen = CURRENT_TIMESTAMP,
-                            times_seen = times_seen + 1,
-                            is_online = 1
-                    ''', (member,))
-                
-                # Save a snapshot with the OCR count
-                members_json = ','.join(sorted(self.member_set))
-                conn.execute('''
-                    INSERT INTO member_snapshots (member_count, members)
-                    VALUES (?, ?)
-                ''', (member_count, members_json))
-                
-                conn.commit()
-                print(f"Saved member count: {member_count} (OCR), detected names: {len(self.member_set)}, offline: {len(offline_members)}")
+            # Mark stale members offline, update the online ones and save a snapshot with the OCR count
+            offline_members = self.storage.save_members(self.member_set, member_count)
+            for name in offline_members:
+                print(f"Member went offline: {name}")
+            print(f"Saved member count: {member_count} (OCR), detected names: {len(self.member_set)}, offline: {len(offline_members)}")
         
         except sqlite3.Error as e:
             print(f"Database error: {e}")
         except Exception as e:
             print(f"Error saving members: {e}")
     
+    def save_warm_state(self):
+        """Snapshot the member tracking state"""
+        try:
+            self.warm_state.save({
+                'member_counts': dict(self.member_counts),
+                'member_set': sorted(self.member_set),
+                'online_member_count': self.online_member_count,
+            })
+        except RuntimeError as e:
+            # Changed by the processing thread while copying at exit, the last snapshot stays
+            print(f"Warm state: Skipped snapshot: {e}")
+    
+    def restore_warm_state(self):
+        """Resume member tracking from a recent snapshot"""
+        state = self.warm_state.load()
+        if not state:
+            return
+        self.member_counts.update(state.get('member_counts', {}))
+        self.member_set.update(state.get('member_set', []))
+        self.online_member_count = state.get('online_member_count', 0)
+        print(f"Restored {len(self.member_counts)} tracked members, {len(self.member_set)} validated")
+    
     def process_members(self, screenshot, window_pos):
-        """Main method to process online members"""
+        """
+        Main method to process online members
+        screenshot: Frame, or a PIL image which is converted to one
+        """
+        screenshot = as_frame(screenshot)
         if not self.is_members_visible(screenshot):
             print("Members list not visible")
             return
         
         print("\n=== Processing Online Members ===")
         
-        # Read member count
-        count = self.read_member_count(screenshot)
+        digest = None
+        if self.skip_unchanged:
+            digest = (screenshot.digest(self.member_coords["COUNT_REGION"]),
+                      screenshot.digest(self.member_coords["LIST_REGION"]))
+        if digest and self.last_read and self.last_read[0] == digest:
+            # Nothing changed on screen, the names still count as seen again below
+            _, count, names = self.last_read
+            print("Member list unchanged, reusing the last read")
+        else:
+            # Read member count and current visible members
+            count = self.read_member_count(screenshot)
+            names = self.read_member_names(screenshot)
+            # A failed or timed out read comes back empty, only a full read is reused
+            if digest and count is not None and names:
+                self.last_read = (digest, count, names)
+            else:
+                self.last_read = None
+        
         if count:
             print(f"Member count: {count}")
             self.online_member_count = count
         else:
             print("Could not read member count from OCR")
         
-        # Read current visible members
-        self.current_view_members = self.read_member_names(screenshot)
+        self.current_view_members = list(names)
         print(f"Visible members: {len(self.current_view_members)}")
         
         # Update tracking
@@ -340,6 +330,10 @@ class MemberProcessor:
             self.write_members_to_database()
             self.last_write_time = current_time
         
+        self.cycle_count += 1
+        if self.warm_state_interval and self.cycle_count % self.warm_state_interval == 0:
+            self.save_warm_state()
+        
         # Check scrollbar and scroll if needed
         scrollbar_pos = self.check_scrollbar_position(screenshot)
         print(f"Scrollbar position: {scrollbar_pos}")
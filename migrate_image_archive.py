@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Tool to move log image blobs out of log_images.db into the append-only image archive"""
+
+import os
+import sys
+from config_loader import ConfigLoader
+from storage import Storage
+from image_archive import ArchiveLockedError
+
+# Tables holding image blobs and their key column
+TABLES = (('line_strips', 'hash'), ('log_images', 'id'))
+
+def migrate_table(storage, table, key, batch_size=500):
+    """Append every blob still stored in the table to the archive and point its row there"""
+    conn = storage.connection('images')
+    archive = storage.archive
+    moved = 0
+    moved_bytes = 0
+    
+    while True:
+        rows = conn.execute(f'''
+            SELECT {key}, image_data FROM {table}
+            WHERE image_data IS NOT NULL
+            LIMIT ?
+        ''', (batch_size,)).fetchall()
+        if not rows:
+            break
+        
+        updates = []
+        for row_key, data in rows:
+            segment, offset, length = archive.append(data)
+            updates.append((segment, offset, length, row_key))
+            moved_bytes += length
+        
+        # Blobs are on disk before any row stops holding its own copy
+        archive.flush()
+        with storage.write_lock, conn:
+            conn.executemany(f'''
+                UPDATE {table}
+                SET image_data = NULL, segment = ?, blob_offset = ?, blob_length = ?
+                WHERE {key} = ?
+            ''', updates)
+        
+        moved += len(rows)
+        print(f"{table}: moved {moved} blobs ({moved_bytes / 1024 / 1024:.1f}MB)")
+    
+    return moved
+
+def main():
+    """Main function"""
+    if len(sys.argv) > 1 and sys.argv[1] not in ('--vacuum',):
+        print("Usage:")
+        print("  python migrate_image_archive.py            Move image blobs into the archive")
+        print("  python migrate_image_archive.py --vacuum   Move them, then shrink log_images.db")
+        return
+    
+    config = ConfigLoader("config.json").config
+    storage = Storage(config)
+    try:
+        # Blob offsets are only safe with a single writer
+        storage.archive.lock()
+    except ArchiveLockedError:
+        print(f"{storage.archive_dir} is in use by the bot, stop the bot before migrating")
+        storage.close()
+        return
+    db_path = config.get('log_images_db', './log_images.db')
+    size_before = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+    
+    print(f"Moving image blobs from {db_path} to {storage.archive_dir}")
+    total = sum(migrate_table(storage, table, key) for table, key in TABLES)
+    print(f"Moved {total} blobs, archive segments: {storage.archive.segments()}")
+    
+    if '--vacuum' in sys.argv:
+        print("Vacuuming...")
+        with storage.write_lock:
+            storage.connection('images').execute('VACUUM')
+        size_after = os.path.getsize(db_path)
+        print(f"{db_path}: {size_before / 1024 / 1024:.1f}MB -> {size_after / 1024 / 1024:.1f}MB")
+    
+    if config.get('image_store', 'sqlite') != 'archive':
+        print('Set "image_store": "archive" in config.json so new images go to the archive too')
+    storage.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+
+# PIL mode of an array by its number of channels
+ARRAY_MODES = {1: 'L', 3: 'RGB', 4: 'RGBA'}
+
+
+class OCRCache:
+    def __init__(self, max_entries=2048, db_path=None):
+        """
+        LRU cache of OCR text keyed by a hash of the line pixels
+        max_entries: Maximum number of cached lines (in memory and on disk)
+        db_path: Optional SQLite file so the cache survives restarts
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._dirty = {}
+        self._lock = threading.Lock()
+
+        if self.db_path:
+            self.init_database()
+            self.load()
+
+    @staticmethod
+    def make_key(image, namespace=''):
+        """
+        Hash the raw pixels of an image together with the OCR settings that produced the text
+        image: PIL image, or a (height, width[, channels]) array view which hashes the
+        same as the PIL image of those pixels
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        if isinstance(image, np.ndarray):
+            height, width = image.shape[:2]
+            mode = ARRAY_MODES[image.shape[2] if image.ndim == 3 else 1]
+            digest.update(f"{namespace}|{mode}|{(width, height)}".encode())
+            # Row by row, a view into a larger frame is not contiguous as a whole
+            for row in image:
+                digest.update(np.ascontiguousarray(row))
+        else:
+            digest.update(f"{namespace}|{image.mode}|{image.size}".encode())
+            digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def init_database(self):
+        """Create the persistent cache table"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ocr_cache (
+                    key TEXT PRIMARY KEY,
+                    text TEXT,
+                    last_used DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_used ON ocr_cache(last_used)')
+
+    def load(self):
+        """Load the most recently used entries from the database"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.execute('''
+                    SELECT key, text FROM ocr_cache
+                    ORDER BY last_used DESC
+                    LIMIT ?
+                ''', (self.max_entries,))
+                rows = cursor.fetchall()
+            # Oldest first so the LRU order matches the database
+            for key, text in reversed(rows):
+                self._entries[key] = text
+            print(f"OCR cache: Loaded {len(self._entries)} entries from {self.db_path}")
+        except sqlite3.Error as e:
+            print(f"OCR cache: Error loading cache: {e}")
+
+    def get(self, key):
+        """Return cached text for a key, or None on a miss"""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if self.db_path:
+                self._dirty[key] = text
+            return text
+
+    def put(self, key, text):
+        """Store text for a key, evicting the least recently used entry when full"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._dirty.pop(old_key, None)
+            if self.db_path:
+                self._dirty[key] = text
+
+    def flush(self):
+        """Write new and recently used entries to the database and trim it to max_entries"""
+        if not self.db_path:
+            return
+        with self._lock:
+            dirty = list(self._dirty.items())
+            self._dirty = {}
+        if not dirty:
+            return
+
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO ocr_cache (key, text, last_used)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                ''', dirty)
+                conn.execute('''
+                    DELETE FROM ocr_cache WHERE key NOT IN (
+                        SELECT key FROM ocr_cache ORDER BY last_used DESC LIMIT ?
+                    )
+                ''', (self.max_entries,))
+        except sqlite3.Error as e:
+            print(f"OCR cache: Error saving cache: {e}")
+
+    def clear(self):
+        """Drop all cached entries from memory"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty = {}
+
+    def stats(self):
+        """Get hit/miss counters"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total * 100) if total else 0.0
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+if __name__ == "__main__":
+    # Test the OCR cache
+    cache = OCRCache(max_entries=2)
+    cache.put('a', 'Day 1, 00:00:01: test')
+    cache.put('b', '')
+    print(f"Hit: {cache.get('a')!r}")
+    cache.put('c', 'evicts b')
+    print(f"Miss after eviction: {cache.get('b')!r}")
+    print(f"Stats: {cache.stats()}")
@@ -0,0 +1,51 @@
+class ReplacementEngine:
+    def __init__(self, rules):
+        """
+        Compile an ordered list of (old, new) string replacements
+        Applying the engine gives the same result as calling str.replace for
+        every rule in order. Empty and no-op rules are dropped up front.
+        """
+        self.rules = tuple((old, new) for old, new in rules if old and old != new)
+
+    @classmethod
+    def from_config(cls, replacements, special_formatting=None):
+        """Build the engine from replacements.json data, in the order apply_ocr_corrections uses"""
+        rules = list(replacements.items())
+
+        if special_formatting:
+            # Handle word spacing
+            for word in special_formatting.get('word_spacing', []):
+                rules.append((word, f" {word} "))
+                rules.append((f"  {word}", f" {word}"))
+                rules.append((f"{word}  ", f"{word} "))
+                rules.append((f"{word} !", f"{word}!"))
+
+            # Clean endings
+            clean_endings = special_formatting.get('clean_endings', {})
+            if clean_endings.get('remove_quotes'):
+                rules.append(('"', "'"))
+                rules.append(("''", "'"))
+
+            if clean_endings.get('fix_parentheses'):
+                rules.append(("{", "("))
+                rules.append(("}", ")"))
+                rules.append((")))", ")!"))
+                rules.append(("'l", "'!"))
+
+        return cls(rules)
+
+    def apply(self, text):
+        """Apply all replacement rules to text"""
+        for old, new in self.rules:
+            text = text.replace(old, new)
+        return text
+
+
+if __name__ == "__main__":
+    # Test the replacement engine
+    import json
+    with open('replacements.json', 'r') as f:
+        data = json.load(f)
+    engine = ReplacementEngine.from_config(data.get('replacements', {}), data.get('special_formatting', {}))
+    print(f"Compiled {len(engine.rules)} rules")
+    print(engine.apply("Day 4120, 12:30:45: Your Rex - LvI 150 was kilied by an eneny!"))
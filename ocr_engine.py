@@ -0,0 +1,315 @@
+import os
+import math
+import time
+import shlex
+import queue
+import atexit
+import threading
+import pytesseract
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# tesserocr talks to the Tesseract C API directly, so one instance keeps the
+# language model loaded between calls. It is optional - without it we fall back
+# to pytesseract, which starts a new tesseract.exe process for every call.
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Configure Tesseract path
+pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+
+class OCREngine:
+    def __init__(self, config):
+        self.config = config
+        self.workers = max(1, int(config.get('ocr_workers', 4)))
+        self.lang = config.get('ocr_lang', 'eng')
+        self.tessdata_path = config.get('tessdata_path') or os.path.join(
+            os.path.dirname(pytesseract.pytesseract.tesseract_cmd), 'tessdata')
+
+        backend = config.get('ocr_backend', 'auto')
+        if backend in ('auto', 'pool') and tesserocr is None:
+            if backend == 'pool':
+                print("OCR: tesserocr is not installed, falling back to one tesseract process per call")
+            backend = 'subprocess'
+        elif backend == 'auto':
+            backend = 'pool'
+        self.backend = backend
+
+        # One pool of long-lived Tesseract APIs per OCR config string, since
+        # page segmentation mode and variables are fixed when an API is created
+        self._pools = {}
+        self._pool_sizes = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+        print(f"OCR: Using '{self.backend}' backend with {self.workers} worker(s)")
+
+    def parse_config(self, config):
+        """Split a pytesseract config string into PSM and -c variables"""
+        psm = 3
+        variables = {}
+        args = shlex.split(config or '')
+        i = 0
+        while i < len(args):
+            if args[i] == '--psm' and i + 1 < len(args):
+                psm = int(args[i + 1])
+                i += 2
+            elif args[i] == '-c' and i + 1 < len(args):
+                key, _, value = args[i + 1].partition('=')
+                variables[key] = value
+                i += 2
+            else:
+                i += 1
+        return psm, variables
+
+    def _create_api(self, config):
+        """Create a Tesseract API with the model loaded for this config"""
+        psm, variables = self.parse_config(config)
+        api = tesserocr.PyTessBaseAPI(path=self.tessdata_path, lang=self.lang, psm=psm)
+        for key, value in variables.items():
+            api.SetVariable(key, value)
+        return api
+
+    def _acquire(self, config):
+        """Borrow an API for this config, creating one if the pool is not full yet"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("OCR engine is closed")
+            pool = self._pools.get(config)
+            if pool is None:
+                pool = self._pools[config] = queue.Queue()
+                self._pool_sizes[config] = 0
+            try:
+                return pool.get_nowait()
+            except queue.Empty:
+                if self._pool_sizes[config] < self.workers:
+                    self._pool_sizes[config] += 1
+                    create = True
+                else:
+                    create = False
+
+        if create:
+            try:
+                return self._create_api(config)
+            except Exception:
+                with self._lock:
+                    self._pool_sizes[config] -= 1
+                raise
+
+        # Pool is full - wait for another thread to hand one back
+        return pool.get()
+
+    def _release(self, config, api):
+        """Hand an API back to its pool"""
+        with self._lock:
+            if not self._closed:
+                self._pools[config].put(api)
+                return
+        api.End()
+
+    def image_to_string(self, image, config=''):
+        """OCR an image and return the raw text, like pytesseract.image_to_string"""
+        if self.backend != 'pool':
+            return pytesseract.image_to_string(image, config=config)
+
+        api = self._acquire(config)
+        try:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        finally:
+            self._release(config, api)
+
+    def image_to_data(self, image, config=''):
+        """OCR an image and return word boxes as a dict of lists (text, left, top, width, height, conf)"""
+        if self.backend != 'pool':
+            data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+            return {key: data[key] for key in ('text', 'left', 'top', 'width', 'height', 'conf')}
+
+        data = {'text': [], 'left': [], 'top': [], 'width': [], 'height': [], 'conf': []}
+        api = self._acquire(config)
+        try:
+            api.SetImage(image)
+            api.Recognize()
+            level = tesserocr.RIL.WORD
+            for word in tesserocr.iterate_level(api.GetIterator(), level):
+                text = word.GetUTF8Text(level)
+                box = word.BoundingBox(level)
+                if text is None or box is None:
+                    continue
+                x1, y1, x2, y2 = box
+                data['text'].append(text)
+                data['left'].append(x1)
+                data['top'].append(y1)
+                data['width'].append(x2 - x1)
+                data['height'].append(y2 - y1)
+                data['conf'].append(word.Confidence(level))
+        finally:
+            self._release(config, api)
+        return data
+
+    def close(self):
+        """Release all pooled Tesseract APIs"""
+        with self._lock:
+            self._closed = True
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            while True:
+                try:
+                    pool.get_nowait().End()
+                except queue.Empty:
+                    break
+
+
+class OCRExecutor:
+    def __init__(self, workers=4, task_timeout=5.0):
+        """
+        Bounded pool of OCR worker threads
+        A task that times out keeps its worker busy until it returns. Once every worker
+        of the pool is held by such a task, the pool is replaced with a fresh one.
+        workers: Number of worker threads
+        task_timeout: Seconds each task may take before its result is given up on
+        """
+        self.workers = max(1, int(workers))
+        self.task_timeout = task_timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ocr')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._abandoned = {}  # executor -> timed out tasks still running on it
+        self.tasks = 0
+        self.timeouts = 0
+        self.pool_replacements = 0
+        self.latencies = deque(maxlen=500)  # Seconds spent running each task
+        self.queue_waits = deque(maxlen=500)  # Seconds each task waited for a worker
+
+    def _run(self, func, item, submitted):
+        started = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self.queue_waits.append(started - submitted)
+        try:
+            return func(item)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.latencies.append(time.perf_counter() - started)
+
+    def _abandon(self, future, executor):
+        """Count a timed out task against its pool until it finally returns"""
+        with self._lock:
+            self._abandoned[executor] = self._abandoned.get(executor, 0) + 1
+        future.add_done_callback(lambda _: self._abandoned_done(executor))
+
+    def _abandoned_done(self, executor):
+        with self._lock:
+            self._abandoned[executor] -= 1
+            if not self._abandoned[executor]:
+                del self._abandoned[executor]
+
+    def _replace_stuck_pool(self):
+        """Swap in a new pool if every worker of the current one is stuck"""
+        with self._lock:
+            if self._abandoned.get(self._executor, 0) < self.workers:
+                return
+            stuck = self._executor
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ocr')
+            self.pool_replacements += 1
+        print(f"OCR workers all stuck on timed out tasks, starting a new pool of {self.workers}")
+        # The stuck threads exit when their tasks return
+        stuck.shutdown(wait=False)
+
+    def map(self, func, items, default=None):
+        """Run func over items on the workers and return the results in order"""
+        items = list(items)
+        if not items:
+            return []
+
+        executor = self._executor
+        futures = []
+        for item in items:
+            with self._lock:
+                self._queued += 1
+                self.tasks += 1
+            futures.append(executor.submit(self._run, func, item, time.perf_counter()))
+
+        # Every worker gets task_timeout per task it has to run
+        budget = self.task_timeout * math.ceil(len(items) / self.workers)
+        wait(futures, timeout=budget)
+
+        results = []
+        for future in futures:
+            if future.done():
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"OCR task error: {e}")
+                    results.append(default)
+            else:
+                # A stuck Tesseract call cannot be interrupted, but the cycle does not wait for it
+                if future.cancel():
+                    with self._lock:
+                        self._queued -= 1
+                else:
+                    self._abandon(future, executor)
+                with self._lock:
+                    self.timeouts += 1
+                results.append(default)
+        self._replace_stuck_pool()
+        return results
+
+    def stats(self):
+        """Get queue depth and task latency statistics"""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            waits = list(self.queue_waits)
+            stats = {
+                'workers': self.workers,
+                'queue_depth': self._queued,
+                'running': self._running,
+                'tasks': self.tasks,
+                'timeouts': self.timeouts,
+                'abandoned': sum(self._abandoned.values()),
+                'pool_replacements': self.pool_replacements,
+                'avg_latency_ms': 0.0,
+                'p95_latency_ms': 0.0,
+                'max_latency_ms': 0.0,
+                'avg_queue_wait_ms': 0.0
+            }
+        if latencies:
+            stats['avg_latency_ms'] = sum(latencies) / len(latencies) * 1000
+            stats['p95_latency_ms'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+            stats['max_latency_ms'] = latencies[-1] * 1000
+        if waits:
+            stats['avg_queue_wait_ms'] = sum(waits) / len(waits) * 1000
+        return stats
+
+    def shutdown(self):
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=False)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_ocr_engine(config):
+    """Get the OCR engine shared by all processors"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = OCREngine(config)
+            atexit.register(_engine.close)
+        return _engine
+
+
+if __name__ == "__main__":
+    # Test the OCR engine
+    engine = OCREngine({})
+    print(f"Backend: {engine.backend}")
+    count_config = '--psm 7 -c "tessedit_char_whitelist= 0123456789/"'
+    print(f"Parsed config: {engine.parse_config(count_config)}")
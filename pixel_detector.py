@@ -49,6 +49,43 @@ class PixelDetector:
                 return False
         return True
     
+    def _clamp_region(self, image, region):
+        """Region clamped to the image, (x1, y1, x2, y2) with x2 >= x1 and y2 >= y1"""
+        if isinstance(image, np.ndarray):
+            height, width = image.shape[:2]
+        else:
+            width, height = image.size
+        if not region:
+            return 0, 0, width, height
+        x1, y1, x2, y2 = region
+        x1 = min(max(0, x1), width)
+        y1 = min(max(0, y1), height)
+        return x1, y1, max(x1, min(width, x2)), max(y1, min(height, y2))
+    
+    def _region_pixels(self, image, region):
+        """
+        RGB pixels of a clamped region as a (height, width, 3) array
+        A PIL image is cropped before converting, an array is only sliced.
+        """
+        x1, y1, x2, y2 = region
+        if isinstance(image, np.ndarray):
+            pixels = image[y1:y2, x1:x2]
+        elif x2 > x1 and y2 > y1:
+            pixels = np.asarray(image.crop(region))
+        else:
+            pixels = np.zeros((y2 - y1, x2 - x1, 3), dtype=np.uint8)
+        return pixels[..., :3]
+    
+    def _color_mask(self, pixels, target_color, tolerance):
+        """Boolean (height, width) array, True where a pixel is within tolerance of target_color"""
+        # Compared against per-channel bounds, so uint8 pixels need no widening copy
+        target = np.asarray(target_color[:3], dtype=np.int32)
+        if np.any(target + tolerance < 0) or np.any(target - tolerance > 255):
+            return np.zeros(pixels.shape[:2], dtype=bool)
+        low = np.clip(target - tolerance, 0, 255).astype(pixels.dtype)
+        high = np.clip(target + tolerance, 0, 255).astype(pixels.dtype)
+        return np.all((pixels >= low) & (pixels <= high), axis=-1)
+    
     def find_color_in_region(self, image, target_color, region=None, tolerance=None):
         """
         Find all pixels matching target color in a region
@@ -60,32 +97,11 @@ class PixelDetector:
             
         if tolerance is None:
             tolerance = self.tolerance
-            
-        width, height = image.size
-        
-        # Define search region
-        if region:
-            x1, y1, x2, y2 = region
-            x1 = max(0, x1)
-            y1 = max(0, y1)
-            x2 = min(width, x2)
-            y2 = min(height, y2)
-        else:
-            x1, y1, x2, y2 = 0, 0, width, height
         
-        matches = []
-        
-        # Convert to numpy array for faster processing
-        img_array = np.array(image)
-        target_array = np.array(target_color)
-        
-        for y in range(y1, y2):
-            for x in range(x1, x2):
-                pixel = img_array[y, x][:3]  # RGB only
-                if np.all(np.abs(pixel - target_array) <= tolerance):
-                    matches.append((x, y))
-        
-        return matches
+        x1, y1, x2, y2 = region = self._clamp_region(image, region)
+        mask = self._color_mask(self._region_pixels(image, region), target_color, tolerance)
+        ys, xs = np.nonzero(mask)
+        return list(zip((xs + x1).tolist(), (ys + y1).tolist()))
     
     def check_pixel_color(self, image, x, y, expected_color, tolerance=None, variance_percent=None):
         """Check if pixel at (x,y) matches expected color"""
@@ -103,60 +119,92 @@ class PixelDetector:
             
         if tolerance is None:
             tolerance = self.tolerance
-            
-        width, height = image.size
-        
-        # Define search region
-        if region:
-            x1, y1, x2, y2 = region
-            x1 = max(0, x1)
-            y1 = max(0, y1)
-            x2 = min(width, x2)
-            y2 = min(height, y2)
-        else:
-            x1, y1, x2, y2 = 0, 0, width, height
-        
-        # Search for colors
-        for y in range(y1, y2):
-            for x in range(x1, x2):
-                pixel = image.getpixel((x, y))[:3]
-                for target_color in target_colors:
-                    if self.color_matches(pixel, target_color, tolerance):
-                        return (x, y, target_color)
         
-        return None
+        region = self._clamp_region(image, region)
+        return self._first_color(self._region_pixels(image, region), region, target_colors, tolerance)
+    
+    def _first_color(self, pixels, region, target_colors, tolerance):
+        """First (x, y, color) in row order of pixels, the region they were taken from, or None"""
+        masks = [self._color_mask(pixels, target_color, tolerance) for target_color in target_colors]
+        if not masks:
+            return None
+        hits = np.logical_or.reduce(masks)
+        if not hits.any():
+            return None
+        # The earliest pixel in row order, then the first target color matching it
+        y, x = np.unravel_index(np.argmax(hits), hits.shape)
+        color_index = next(i for i, mask in enumerate(masks) if mask[y, x])
+        return (int(x) + region[0], int(y) + region[1], target_colors[color_index])
     
     def get_average_color(self, image, region):
         """Get average color in a region"""
         if isinstance(image, str):
             image = Image.open(image)
-            
-        x1, y1, x2, y2 = region
-        width, height = image.size
         
-        # Ensure bounds
-        x1 = max(0, x1)
-        y1 = max(0, y1)
-        x2 = min(width, x2)
-        y2 = min(height, y2)
+        pixels = self._region_pixels(image, self._clamp_region(image, region))
+        avg_color = np.mean(pixels.reshape(-1, 3), axis=0)
         
-        # Crop and get average
-        cropped = image.crop((x1, y1, x2, y2))
-        img_array = np.array(cropped)
-        avg_color = np.mean(img_array.reshape(-1, img_array.shape[-1]), axis=0)
-        
-        return tuple(int(c) for c in avg_color[:3])
+        return tuple(int(c) for c in avg_color)
     
     def color_in_region_percentage(self, image, target_color, region, tolerance=None):
         """Calculate percentage of pixels matching target color in region"""
-        matches = self.find_color_in_region(image, target_color, region, tolerance)
         x1, y1, x2, y2 = region
         total_pixels = (x2 - x1) * (y2 - y1)
         
         if total_pixels == 0:
             return 0.0
-            
-        return (len(matches) / total_pixels) * 100
+        
+        if isinstance(image, str):
+            image = Image.open(image)
+        if tolerance is None:
+            tolerance = self.tolerance
+        pixels = self._region_pixels(image, self._clamp_region(image, region))
+        matches = np.count_nonzero(self._color_mask(pixels, target_color, tolerance))
+        return (matches / total_pixels) * 100
+    
+    def _batch_pixels(self, image, regions):
+        """
+        Clamped regions and their pixels. A PIL image is converted once over the box
+        around all of them when they are close together, otherwise region by region.
+        """
+        if isinstance(image, str):
+            image = Image.open(image)
+        regions = [self._clamp_region(image, region) for region in regions]
+        if not regions:
+            return []
+        box = (min(r[0] for r in regions), min(r[1] for r in regions),
+               max(r[2] for r in regions), max(r[3] for r in regions))
+        box_area = (box[2] - box[0]) * (box[3] - box[1])
+        if not isinstance(image, np.ndarray) and box_area <= 2 * sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions):
+            pixels = self._region_pixels(image, box)
+            return [(region, pixels[region[1] - box[1]:region[3] - box[1], region[0] - box[0]:region[2] - box[0]])
+                    for region in regions]
+        return [(region, self._region_pixels(image, region)) for region in regions]
+    
+    def count_colors_in_regions(self, image, regions, target_colors, tolerance=None):
+        """
+        Count matching pixels for many regions and colors in one call
+        regions: List of (x1, y1, x2, y2), None for the whole image
+        target_colors: List of RGB tuples
+        Returns an int array of shape (len(regions), len(target_colors))
+        """
+        if tolerance is None:
+            tolerance = self.tolerance
+        counts = np.zeros((len(regions), len(target_colors)), dtype=np.int64)
+        for i, (_, pixels) in enumerate(self._batch_pixels(image, regions)):
+            for j, target_color in enumerate(target_colors):
+                counts[i, j] = np.count_nonzero(self._color_mask(pixels, target_color, tolerance))
+        return counts
+    
+    def find_first_colors(self, image, regions, target_colors, tolerance=None):
+        """
+        find_first_color for many regions in one call
+        Returns a list with (x, y, color) or None for each region
+        """
+        if tolerance is None:
+            tolerance = self.tolerance
+        return [self._first_color(pixels, region, target_colors, tolerance)
+                for region, pixels in self._batch_pixels(image, regions)]
     
 
 def parse_color_string(color_str):
@@ -184,4 +232,10 @@ if __name__ == "__main__":
     test_colors = ["RGB:255,255,255", "(128,128,128)", "0,0,255"]
     for color_str in test_colors:
         parsed = parse_color_string(color_str)
-        print(f"Parsed '{color_str}' to {parsed}")
\ No newline at end of file
+        print(f"Parsed '{color_str}' to {parsed}")
+    
+    # Test the region searches
+    image = Image.new("RGB", (200, 100), (0, 0, 0))
+    image.paste((0, 0, 255), (150, 40, 160, 50))
+    print("First blue pixel:", detector.find_first_color(image, [(255, 255, 255), (0, 0, 255)]))
+    print("Blue pixels per region:", detector.count_colors_in_regions(image, [(0, 0, 100, 100), (100, 0, 200, 100)], [(0, 0, 255)]).ravel())
\ No newline at end of file
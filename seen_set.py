@@ -0,0 +1,217 @@
+import math
+import json
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class BloomFilter:
+    def __init__(self, capacity=200000, error_rate=0.01):
+        """
+        Fixed-size Bloom filter
+        capacity: Number of items the filter is sized for
+        error_rate: False positive rate at capacity (it rises slowly past it, memory does not)
+        """
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest):
+        # Double hashing - k positions from the two halves of one digest
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, digest):
+        """Add a 16-byte digest"""
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest):
+        for position in self._positions(digest):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class SeenEntrySet:
+    def __init__(self, storage=None, max_entries=5000, bloom_capacity=200000):
+        """
+        Set of log entries that were already saved, with bounded memory
+        A small LRU of hashed entries answers the common case, a Bloom filter rules out
+        entries that were never added, and log.db settles the rare Bloom filter hits.
+        storage: Storage to look entries up in (None trusts the Bloom filter)
+        max_entries: Size of the LRU of recently seen entries
+        bloom_capacity: Number of entries the Bloom filter is sized for
+        """
+        self.storage = storage
+        self.state_key = 'seen_entries'  # bot_state keys for the saved Bloom filter
+        self.max_entries = max_entries
+        self.bloom = BloomFilter(bloom_capacity)
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self.lru_hits = 0
+        self.bloom_rejects = 0
+        self.db_lookups = 0
+
+    @staticmethod
+    def make_key(text):
+        """Hash an entry to a 16-byte key"""
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    def _remember(self, key):
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+
+    def add(self, text):
+        """Mark an entry as seen"""
+        key = self.make_key(text)
+        with self._lock:
+            if key not in self._recent and key not in self.bloom:
+                self.bloom.add(key)
+            self._remember(key)
+
+    def load(self, limit=None):
+        """
+        Seed the set at startup
+        Restores the saved Bloom filter and adds only the entries saved after it, falling
+        back to reading the newest entries when there is no usable saved filter.
+        limit: Entries to read for the fallback, defaults to the Bloom filter capacity
+        Returns the number of entries the set covers
+        """
+        if not self.storage:
+            return 0
+        try:
+            count = self._load_state()
+            if count is None:
+                count = self._load_newest(limit or self.bloom.capacity)
+            # The LRU starts with the newest entries, those are the ones still on screen
+            rows = self.storage.latest_logs(self.max_entries)
+        except (sqlite3.Error, ValueError, zlib.error) as e:
+            print(f"Seen entries: Error loading from database: {e}")
+            return 0
+        with self._lock:
+            for text in reversed(rows):
+                self._remember(self.make_key(text))
+        return count
+
+    def _load_newest(self, limit):
+        rows = self.storage.latest_logs(limit)
+        with self._lock:
+            for text in rows:
+                self.bloom.add(self.make_key(text))
+        return len(rows)
+
+    def _load_state(self):
+        """Restore the saved Bloom filter and catch up from its cursor, None if there is none to use"""
+        meta = self.storage.get_state(f'{self.state_key}_meta')
+        if meta is None:
+            return None
+        meta = json.loads(meta)
+        # A resized filter or a replaced database makes the saved bits useless
+        if (meta['size'] != self.bloom.size or meta['hash_count'] != self.bloom.hash_count
+                or meta['cursor'] > self.storage.max_log_id()):
+            return None
+        bits = zlib.decompress(self.storage.get_state(f'{self.state_key}_bloom'))
+        if len(bits) != len(self.bloom.bits):
+            return None
+
+        with self._lock:
+            self.bloom.bits = bytearray(bits)
+            self.bloom.count = meta['count']
+        count = meta['count']
+
+        # Only entries saved after the cursor are read
+        cursor = meta['cursor']
+        while True:
+            rows = self.storage.log_texts_after(cursor, 10000)
+            if not rows:
+                break
+            with self._lock:
+                for _, text in rows:
+                    self.bloom.add(self.make_key(text))
+            count += len(rows)
+            cursor = rows[-1][0]
+        return count
+
+    def save_state(self):
+        """Save the Bloom filter and the id of the newest entry it covers, for the next start"""
+        if not self.storage:
+            return False
+        try:
+            # The cursor is read first - entries saved in between are added again at load, harmlessly
+            cursor = self.storage.max_log_id()
+            with self._lock:
+                bits = bytes(self.bloom.bits)
+                meta = {'size': self.bloom.size, 'hash_count': self.bloom.hash_count,
+                        'count': self.bloom.count, 'cursor': cursor}
+            self.storage.set_state({
+                f'{self.state_key}_meta': json.dumps(meta),
+                f'{self.state_key}_bloom': zlib.compress(bits, 1),
+            })
+            return True
+        except sqlite3.Error as e:
+            print(f"Seen entries: Error saving state: {e}")
+            return False
+
+    def _in_database(self, text):
+        """Indexed lookup of an entry in log.db"""
+        try:
+            return self.storage.entry_exists(text)
+        except sqlite3.Error as e:
+            print(f"Seen entries: Error checking database: {e}")
+            # Saving again is harmless (INSERT OR IGNORE), losing an entry is not
+            return False
+
+    def __contains__(self, text):
+        key = self.make_key(text)
+        with self._lock:
+            if key in self._recent:
+                self._recent.move_to_end(key)
+                self.lru_hits += 1
+                return True
+            if key not in self.bloom:
+                self.bloom_rejects += 1
+                return False
+            if not self.storage:
+                return True
+            self.db_lookups += 1
+
+        if not self._in_database(text):
+            return False
+        with self._lock:
+            self._remember(key)
+        return True
+
+    def __len__(self):
+        return self.bloom.count
+
+    def stats(self):
+        """Get size and lookup counters"""
+        with self._lock:
+            return {
+                'entries': self.bloom.count,
+                'recent': len(self._recent),
+                'lru_hits': self.lru_hits,
+                'bloom_rejects': self.bloom_rejects,
+                'db_lookups': self.db_lookups,
+                'bloom_kb': len(self.bloom.bits) / 1024
+            }
+
+
+if __name__ == "__main__":
+    # Test the seen entry set
+    seen = SeenEntrySet(max_entries=2, bloom_capacity=1000)
+    for text in ["Day 1, 00:00:01: a", "Day 1, 00:00:02: b", "Day 1, 00:00:03: c"]:
+        seen.add(text)
+    print(f"Recent entry seen: {'Day 1, 00:00:03: c' in seen}")
+    print(f"Evicted entry seen (Bloom filter): {'Day 1, 00:00:01: a' in seen}")
+    print(f"Unknown entry seen: {'Day 1, 00:00:04: d' in seen}")
+    print(f"Stats: {seen.stats()}")
@@ -1,9 +1,167 @@
 from pixel_detector import PixelDetector
 from config_loader import ConfigLoader
 import os
+import numpy as np
 from datetime import datetime
 
 
+class StateSignatureMatcher:
+    def __init__(self, states, tolerance=10, variance_percent=None):
+        """
+        Every state's detection pixels compiled into arrays, so one gather and one
+        compare score all states against a screenshot at once
+        states: [(state_name, is_error, detection_pixels)] in the order they are checked
+        tolerance: Maximum difference allowed for each RGB channel
+        variance_percent: Percentage variance allowed, overrides tolerance if set
+        """
+        self.states = []
+        self.positions = {}  # state_name -> index into self.states
+        xs, ys, colors, starts = [], [], [], []
+        for state_name, is_error, detection_pixels in states:
+            pixels = [(p.get("x"), p.get("y"), p.get("color")) for p in detection_pixels or []]
+            # A state with no pixels, or one missing its x, y or color, can never have
+            # all of its pixels match
+            if not pixels or any(None in pixel for pixel in pixels):
+                continue
+            self.positions.setdefault(state_name, len(self.states))
+            self.states.append((state_name, is_error))
+            starts.append(len(xs))
+            for x, y, color in pixels:
+                xs.append(x)
+                ys.append(y)
+                colors.append(color[:3])
+
+        self.xs = np.array(xs, dtype=np.intp)
+        self.ys = np.array(ys, dtype=np.intp)
+        self.colors = np.array(colors, dtype=np.int16).reshape(-1, 3)
+        if variance_percent is not None:
+            # Same rule as PixelDetector.color_matches, at least 5 for dark channels
+            self.allowed = np.maximum(5, (self.colors * variance_percent / 100).astype(np.int16))
+        else:
+            self.allowed = np.full_like(self.colors, tolerance)
+        self.starts = np.array(starts, dtype=np.intp)
+        self.ends = np.array(starts[1:] + [len(xs)], dtype=np.intp)
+        # Error states come first in self.states
+        self.error_count = sum(1 for _, is_error in self.states if is_error)
+        # Per state [(x, y, color, allowed)], for checking a few states pixel by pixel
+        self.state_pixels = [
+            [(x, y, tuple(color), tuple(allowed)) for x, y, color, allowed in zip(
+                xs[start:end], ys[start:end], self.colors[start:end].tolist(), self.allowed[start:end].tolist())]
+            for start, end in zip(self.starts.tolist(), self.ends.tolist())
+        ]
+        # Per state, the earlier states that can match on the same screen and so take
+        # priority over it - in_game_with_hud over in_game_no_hud, whose one pixel it also checks
+        self.shadowed_by = [
+            tuple(earlier for earlier in range(position) if not self._conflicts(earlier, position))
+            for position in range(len(self.states))
+        ]
+        # Above this many states the array compare beats checking them pixel by pixel
+        self.max_few = 4
+        self._bounds = {}
+
+    def _conflicts(self, first, second):
+        """Check if two states want colors at a shared pixel that no screen can give both"""
+        pixels = {(x, y): (color, allowed) for x, y, color, allowed in self.state_pixels[first]}
+        for x, y, color, allowed in self.state_pixels[second]:
+            if (x, y) not in pixels:
+                continue
+            other_color, other_allowed = pixels[(x, y)]
+            if any(abs(c - o) > a + oa for c, o, a, oa in zip(color, other_color, allowed, other_allowed)):
+                return True
+        return False
+
+    @classmethod
+    def from_config(cls, config_loader, tolerance=10, variance_percent=None):
+        """Compile the error states (checked first) and normal states of a config"""
+        states = [(name, True, config_loader.get_error_state(name).get("detection_pixels"))
+                  for name in config_loader.get_all_error_states()]
+        states += [(name, False, config_loader.get_state(name).get("detection_pixels"))
+                   for name in config_loader.get_all_states()]
+        return cls(states, tolerance, variance_percent)
+
+    def _in_bounds(self, width, height):
+        """
+        Which pixels fall inside a frame of this size, and coordinates clamped to it,
+        cached per size
+        """
+        key = (width, height)
+        if key not in self._bounds:
+            inside = (self.xs >= 0) & (self.xs < width) & (self.ys >= 0) & (self.ys < height)
+            # Out of frame pixels read a clamped coordinate and are failed through inside
+            self._bounds[key] = (inside, np.clip(self.ys, 0, height - 1), np.clip(self.xs, 0, width - 1))
+        return self._bounds[key]
+
+    def gather(self, screenshot):
+        """
+        Colors at every detection pixel as an (n, 3) array, and which pixels were in the frame
+        screenshot: PIL image, or an (height, width, channels) array
+        """
+        if isinstance(screenshot, np.ndarray):
+            height, width = screenshot.shape[:2]
+            inside, ys, xs = self._in_bounds(width, height)
+            return screenshot[ys, xs, :3].astype(np.int16), inside
+
+        inside = self._in_bounds(*screenshot.size)[0]
+        # Converting a whole PIL frame costs more than reading the few pixels needed
+        access = screenshot.load()
+        coordinates = zip(self.xs.tolist(), self.ys.tolist())
+        found = [access[xy][:3] if ok else (0, 0, 0) for xy, ok in zip(coordinates, inside)]
+        return np.array(found, dtype=np.int16).reshape(-1, 3), inside
+
+    def pixel_matches(self, screenshot):
+        """Boolean array, True where a detection pixel is within tolerance of its color"""
+        found, inside = self.gather(screenshot)
+        return inside & np.all(np.abs(found - self.colors) <= self.allowed, axis=1)
+
+    def state_matches(self, screenshot):
+        """Boolean array over self.states, True where every pixel of the state matches"""
+        if not self.states:
+            return np.zeros(0, dtype=bool)
+        return np.logical_and.reduceat(self.pixel_matches(screenshot), self.starts)
+
+    def match(self, screenshot, positions=None):
+        """
+        (state_name, is_error) of the first state whose pixels all match, or None
+        positions: Indexes into self.states to check in order, all states when None
+        """
+        if positions is not None:
+            if len(positions) <= self.max_few or not isinstance(screenshot, np.ndarray):
+                return self._match_few(screenshot, positions)
+            matches = self.state_matches(screenshot)
+            for position in positions:
+                if matches[position]:
+                    return self.states[position]
+            return None
+        matches = self.state_matches(screenshot)
+        if not matches.any():
+            return None
+        return self.states[int(np.argmax(matches))]
+
+    def _match_few(self, screenshot, positions):
+        """
+        match() for a handful of states, pixel by pixel and stopping at the first miss,
+        which for a few pixels costs less than setting up the array compare
+        """
+        if isinstance(screenshot, np.ndarray):
+            height, width = screenshot.shape[:2]
+            read = lambda x, y: screenshot[y, x, :3].tolist()
+        else:
+            width, height = screenshot.size
+            access = screenshot.load()
+            read = lambda x, y: access[x, y]
+
+        for position in positions:
+            for x, y, color, allowed in self.state_pixels[position]:
+                if not (0 <= x < width and 0 <= y < height):
+                    break
+                found = read(x, y)
+                if any(abs(f - c) > a for f, c, a in zip(found, color, allowed)):
+                    break
+            else:
+                return self.states[position]
+        return None
+
+
 class StateDetector:
     def __init__(self, config_loader, pixel_detector=None):
         self.config = config_loader
@@ -12,66 +170,99 @@ class StateDetector:
             variance_percent=config_loader.config.get("variance_percent")
         )
         self.current_state = None
+        self.last_known_state = None  # Last state that was not None
         self.last_detection_time = None
         self.detection_history = []
+        # Observed state changes, {from_state: {to_state: count}}
+        self.transitions = {}
+        self.max_successors = 3  # Learned successors checked before a full scan
+        # Detections between full scans. The fast path already checks every earlier state
+        # that could shadow a likely one, this is a safety net for edited configs.
+        self.full_scan_interval = config_loader.config.get("state_full_scan_interval", 20)
+        self.since_full_scan = 0
+        self._likely_positions = None
+        self.fast_path_hits = 0
+        self.full_scans = 0
+        self.compile_states()
+    
+    def compile_states(self):
+        """Compile the detection pixels of all states, call again after changing them"""
+        self.since_full_scan = 0
+        self._likely_positions = None
+        self.matcher = StateSignatureMatcher.from_config(
+            self.config,
+            tolerance=self.detector.tolerance,
+            variance_percent=self.config.config.get("variance_percent")
+        )
+    
+    def likely_states(self):
+        """
+        States to check before a full scan: the last detected state, where it has gone
+        before (most often first), and its configured next_state
+        """
+        state_name = self.last_known_state
+        if not state_name:
+            return []
+        
+        likely = [state_name]
+        successors = self.transitions.get(state_name, {})
+        likely.extend(sorted(successors, key=successors.get, reverse=True)[:self.max_successors])
+        state_config = self.config.get_state(state_name) or {}
+        likely.append(state_config.get("next_state"))
+        return likely
+    
+    def _match_likely(self, screenshot):
+        """(state_name, is_error) among the error states and likely states, or None"""
+        matcher = self.matcher
+        if self._likely_positions is None:
+            positions = set(range(matcher.error_count))
+            for name in self.likely_states():
+                if name in matcher.positions:
+                    position = matcher.positions[name]
+                    positions.add(position)
+                    # Earlier states that could match alongside it, so the fast path
+                    # gives the same answer as a full scan
+                    positions.update(matcher.shadowed_by[position])
+            # Checked in config order, so error states keep priority and a likely state
+            # still loses to one listed before it
+            self._likely_positions = tuple(sorted(positions))
+        return matcher.match(screenshot, self._likely_positions)
     
     def detect_state(self, screenshot):
-        """Detect current state from screenshot"""
-        # Check error states first (they have priority)
-        for state_name in self.config.get_all_error_states():
-            if self._check_state(screenshot, state_name, is_error=True):
-                self._update_state(state_name, is_error=True)
-                return state_name
-        
-        # Check normal states
-        for state_name in self.config.get_all_states():
-            if self._check_state(screenshot, state_name, is_error=False):
-                self._update_state(state_name, is_error=False)
-                return state_name
+        """Detect current state from screenshot (PIL image or array)"""
+        # The last state and its likely successors are checked first, together with the
+        # earlier states that could match alongside them, mostly one pixel each. On a
+        # miss, and every full_scan_interval detections, all states are scored in config
+        # order. A state only matches when all of its pixels do.
+        match = None
+        if self.since_full_scan < self.full_scan_interval:
+            match = self._match_likely(screenshot)
+        if match:
+            self.fast_path_hits += 1
+            self.since_full_scan += 1
+        else:
+            self.full_scans += 1
+            self.since_full_scan = 0
+            match = self.matcher.match(screenshot)
+        if match:
+            state_name, is_error = match
+            self._update_state(state_name, is_error=is_error)
+            return state_name
         
         # No state detected
         self._update_state(None)
         return None
     
-    def _check_state(self, screenshot, state_name, is_error=False):
-        """Check if screenshot matches a specific state"""
-        if is_error:
-            state_config = self.config.get_error_state(state_name)
-        else:
-            state_config = self.config.get_state(state_name)
-        
-        if not state_config:
-            return False
-        
-        detection_pixels = state_config.get("detection_pixels", [])
-        
-        if not detection_pixels:
-            return False
-        
-        # Check all detection pixels
-        matches = 0
-        for pixel_config in detection_pixels:
-            x = pixel_config.get("x")
-            y = pixel_config.get("y")
-            expected_color = pixel_config.get("color")
-            
-            if x is None or y is None or expected_color is None:
-                continue
-            
-            # Use variance_percent if available
-            variance = self.config.config.get("variance_percent")
-            if self.detector.check_pixel_color(screenshot, x, y, expected_color, variance_percent=variance):
-                matches += 1
-            else:
-                # Debug: print what color was found
-                actual_color = self.detector.get_pixel_color(screenshot, x, y)
-                print(f"State '{state_name}' pixel mismatch at ({x},{y}): expected {expected_color}, got {actual_color}")
-        
-        # Require all pixels to match
-        return matches == len(detection_pixels)
-    
     def _update_state(self, state_name, is_error=False):
         """Update current state and history"""
+        # Learn transitions between detected states, across undetected frames in between
+        if state_name and state_name != self.last_known_state:
+            if self.last_known_state:
+                successors = self.transitions.setdefault(self.last_known_state, {})
+                successors[state_name] = successors.get(state_name, 0) + 1
+            self.last_known_state = state_name
+            self._likely_positions = None
+        
         self.current_state = state_name
         self.last_detection_time = datetime.now()
         
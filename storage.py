@@ -0,0 +1,722 @@
+import re
+import atexit
+import sqlite3
+import weakref
+import threading
+from image_archive import ImageArchive, ArchiveLockedError
+from event_parser import event_row
+
+SCHEMAS = {
+    'log': [
+        '''
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            day INTEGER,
+            time TEXT,
+            entry_text TEXT UNIQUE,
+            image_id TEXT,
+            event_type TEXT,
+            actor TEXT,
+            target TEXT,
+            creature TEXT,
+            level INTEGER,
+            game_seconds INTEGER
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_entry_text ON logs(entry_text)',
+        'CREATE INDEX IF NOT EXISTS idx_day_time ON logs(day, time)',
+        # Small pieces of bot state that survive restarts
+        '''
+        CREATE TABLE IF NOT EXISTS bot_state (
+            key TEXT PRIMARY KEY,
+            value BLOB,
+            updated DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ],
+    'images': [
+        # Combined PNG per entry, written before line strips existed
+        '''
+        CREATE TABLE IF NOT EXISTS log_images (
+            id TEXT PRIMARY KEY,
+            image_data BLOB,
+            width INTEGER,
+            height INTEGER,
+            segment INTEGER,
+            blob_offset INTEGER,
+            blob_length INTEGER
+        )
+        ''',
+        # One row per distinct line image, keyed by a hash of its pixels. The bytes are
+        # either in image_data or at (segment, blob_offset, blob_length) in the image archive.
+        '''
+        CREATE TABLE IF NOT EXISTS line_strips (
+            hash TEXT PRIMARY KEY,
+            image_data BLOB,
+            format TEXT,
+            width INTEGER,
+            height INTEGER,
+            segment INTEGER,
+            blob_offset INTEGER,
+            blob_length INTEGER
+        )
+        ''',
+        # The ordered strips that make up each entry's image
+        '''
+        CREATE TABLE IF NOT EXISTS log_image_strips (
+            image_id TEXT,
+            position INTEGER,
+            strip_hash TEXT,
+            PRIMARY KEY (image_id, position)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_log_image_strips_hash ON log_image_strips(strip_hash)',
+    ],
+    'member': [
+        '''
+        CREATE TABLE IF NOT EXISTS members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+            times_seen INTEGER DEFAULT 1,
+            is_online INTEGER DEFAULT 1
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_name ON members(name)',
+        'CREATE INDEX IF NOT EXISTS idx_last_seen ON members(last_seen)',
+        # Historical record of member counts
+        '''
+        CREATE TABLE IF NOT EXISTS member_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            member_count INTEGER,
+            members TEXT
+        )
+        ''',
+    ],
+    'discord_sent': [
+        '''
+        CREATE TABLE IF NOT EXISTS discord_sent (
+            image_guid TEXT PRIMARY KEY,
+            log_id INTEGER,
+            entry_text TEXT,
+            sent_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_sent_timestamp ON discord_sent(sent_timestamp)',
+    ],
+}
+
+# Columns added after the first release - adding them fails harmlessly once they exist.
+# Indexes on added columns are created here too, after their columns.
+MIGRATIONS = {
+    'log': [
+        'ALTER TABLE logs ADD COLUMN event_type TEXT',
+        'ALTER TABLE logs ADD COLUMN actor TEXT',
+        'ALTER TABLE logs ADD COLUMN target TEXT',
+        'ALTER TABLE logs ADD COLUMN creature TEXT',
+        'ALTER TABLE logs ADD COLUMN level INTEGER',
+        'ALTER TABLE logs ADD COLUMN game_seconds INTEGER',
+        'CREATE INDEX IF NOT EXISTS idx_event_type ON logs(event_type, id)',
+        'CREATE INDEX IF NOT EXISTS idx_actor ON logs(actor)',
+        'CREATE INDEX IF NOT EXISTS idx_target ON logs(target)',
+        'CREATE INDEX IF NOT EXISTS idx_game_seconds ON logs(game_seconds)',
+        # Entries saved before game_seconds existed, found through its index
+        '''
+        UPDATE logs
+        SET game_seconds = day * 86400 + CAST(substr(time, 1, 2) AS INTEGER) * 3600
+                         + CAST(substr(time, 4, 2) AS INTEGER) * 60 + CAST(substr(time, 7, 2) AS INTEGER)
+        WHERE game_seconds IS NULL AND day IS NOT NULL AND time IS NOT NULL
+        ''',
+    ],
+    'images': [
+        'ALTER TABLE log_images ADD COLUMN segment INTEGER',
+        'ALTER TABLE log_images ADD COLUMN blob_offset INTEGER',
+        'ALTER TABLE log_images ADD COLUMN blob_length INTEGER',
+        'ALTER TABLE line_strips ADD COLUMN segment INTEGER',
+        'ALTER TABLE line_strips ADD COLUMN blob_offset INTEGER',
+        'ALTER TABLE line_strips ADD COLUMN blob_length INTEGER',
+        'CREATE INDEX IF NOT EXISTS idx_log_images_segment ON log_images(segment)',
+        'CREATE INDEX IF NOT EXISTS idx_line_strips_segment ON line_strips(segment)',
+    ],
+    'member': [
+        'ALTER TABLE members ADD COLUMN is_online INTEGER DEFAULT 1',
+    ],
+}
+
+# Full-text index over the entry text. It stores no copy of the text (external content)
+# and the triggers keep it in step with the logs table.
+LOG_SEARCH_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE logs_fts USING fts5(
+        entry_text,
+        content='logs',
+        content_rowid='id'
+    )
+    ''',
+    '''
+    CREATE TRIGGER logs_fts_insert AFTER INSERT ON logs BEGIN
+        INSERT INTO logs_fts(rowid, entry_text) VALUES (new.id, new.entry_text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER logs_fts_delete AFTER DELETE ON logs BEGIN
+        INSERT INTO logs_fts(logs_fts, rowid, entry_text) VALUES ('delete', old.id, old.entry_text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER logs_fts_update AFTER UPDATE OF entry_text ON logs BEGIN
+        INSERT INTO logs_fts(logs_fts, rowid, entry_text) VALUES ('delete', old.id, old.entry_text);
+        INSERT INTO logs_fts(rowid, entry_text) VALUES (new.id, new.entry_text);
+    END
+    ''',
+    # Index the entries saved before the table existed
+    "INSERT INTO logs_fts(logs_fts) VALUES ('rebuild')",
+]
+
+SEARCH_TOKEN_PATTERN = re.compile(r'\w+')
+
+
+class _ThreadConnections:
+    def __init__(self, storage):
+        """
+        A thread's connections by database name, kept in the thread's local storage
+        They are closed when the thread ends and its local storage goes away.
+        """
+        self.by_name = {}
+        weakref.finalize(self, storage._close_connections, self.by_name)
+
+
+class Storage:
+    def __init__(self, config):
+        """
+        Owns all SQLite connections of the bot
+        Every thread gets its own long-lived connection per database, in WAL mode, so the
+        GUI and Discord can read while the processors write. sqlite3 keeps the compiled
+        statements of each connection, so repeated queries are not parsed again.
+        The schema and migrations run once per database here, a thread's connections
+        only set their pragmas and are closed when the thread ends or calls release().
+        """
+        self.paths = {
+            'log': config.get('log_db', './log.db'),
+            'images': config.get('log_images_db', './log_images.db'),
+            'member': config.get('member_db', './member.db'),
+            'discord_sent': config.get('discord_sent_db', './discord_sent.db'),
+        }
+        self.busy_timeout = int(config.get('db_busy_timeout', 5000))
+        
+        # "sqlite" keeps image bytes in log_images.db, "archive" appends them to segment files
+        self.image_store = config.get('image_store', 'sqlite')
+        self.archive_dir = config.get('image_archive_dir', './log_images')
+        self.archive_segment_size = int(config.get('image_archive_segment_mb', 64)) * 1024 * 1024
+        self._archive = None
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # Held for every write. Reentrant, so callers can keep it across a read-then-write.
+        self.write_lock = threading.RLock()
+        self._closed = False
+        self.full_text_search = True
+
+        # Create the schema up front so problems show at startup
+        for name, path in self.paths.items():
+            conn = self.connection(name)
+            if path != ':memory:':
+                self._create_schema(name, conn)
+
+    def connection(self, name):
+        """Get this thread's connection to a database (log, images, member or discord_sent)"""
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = _ThreadConnections(self)
+        conn = connections.by_name.get(name)
+        if conn is None:
+            conn = connections.by_name[name] = self._open(name)
+        return conn
+
+    def release(self):
+        """Close this thread's connections, for a thread that is done with storage"""
+        connections = getattr(self._local, 'connections', None)
+        if connections is not None:
+            self._close_connections(connections.by_name)
+
+    def _close_connections(self, by_name):
+        connections = list(by_name.values())
+        by_name.clear()
+        with self._lock:
+            self._connections = [conn for conn in self._connections if conn not in connections]
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _open(self, name):
+        if self._closed:
+            raise RuntimeError("Storage is closed")
+        conn = sqlite3.connect(self.paths[name], cached_statements=256, check_same_thread=False)
+        # Only takes effect on a new database, before WAL mode writes its header.
+        # maintenance.py can convert existing ones (maintenance_convert_auto_vacuum).
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL only needs to sync at checkpoints, not on every commit
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={self.busy_timeout}')
+        if self.paths[name] == ':memory:':
+            # Every in-memory connection is a database of its own
+            self._create_schema(name, conn)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _create_schema(self, name, conn):
+        """Create the tables of a database and bring older ones up to date"""
+        with self.write_lock, conn:
+            for statement in SCHEMAS[name]:
+                conn.execute(statement)
+            for statement in MIGRATIONS.get(name, []):
+                try:
+                    conn.execute(statement)
+                except sqlite3.OperationalError:
+                    # Column already exists
+                    pass
+        if name == 'log':
+            self._setup_log_search(conn)
+
+    def _setup_log_search(self, conn):
+        """Create the full-text index on first use, searches fall back to LIKE without FTS5"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs_fts'").fetchone()
+        if exists:
+            return
+        try:
+            with conn:
+                for statement in LOG_SEARCH_SCHEMA:
+                    conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            if 'already exists' not in str(e):
+                print(f"Full-text search unavailable ({e}), searching logs with LIKE")
+                self.full_text_search = False
+
+    @property
+    def archive(self):
+        """Image archive, opened on first use (also for reading migrated blobs with the sqlite store)"""
+        with self._lock:
+            if self._archive is None:
+                self._archive = ImageArchive(self.archive_dir, self.archive_segment_size)
+                if self.image_store == 'archive':
+                    # Held while the bot runs so a migration can not append alongside it
+                    try:
+                        self._archive.lock()
+                    except ArchiveLockedError as e:
+                        print(f"Image archive: {e}, new images can not be saved")
+            return self._archive
+
+    def _image_bytes(self, row):
+        """Bytes of an image row (image_data, segment, blob_offset, blob_length)"""
+        if row[0] is not None:
+            return row[0]
+        if row[1] is not None:
+            return self.archive.read(row[1], row[2], row[3])
+        return None
+
+    def _read_images(self, query, params, attempts=3):
+        """
+        Image bytes of the rows a query finds, in order
+        Compaction can move a blob and remove its old segment between the lookup and
+        the read, so the lookup runs again to find where the blob went
+        """
+        conn = self.connection('images')
+        for attempt in range(attempts):
+            rows = conn.execute(query, params).fetchall()
+            try:
+                return [self._image_bytes(row) for row in rows]
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+
+    def close(self):
+        """Close every connection opened by any thread"""
+        with self._lock:
+            self._closed = True
+            connections = self._connections
+            self._connections = []
+            archive = self._archive
+        if archive is not None:
+            archive.close()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    # Logs
+
+    def missing_strips(self, hashes):
+        """Get the strip hashes that are not stored yet"""
+        hashes = list(hashes)
+        conn = self.connection('images')
+        stored = set()
+        # Stay well below SQLite's bound parameter limit
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = conn.execute(f'SELECT hash FROM line_strips WHERE hash IN ({placeholders})', chunk)
+            stored.update(row[0] for row in cursor)
+        return [h for h in hashes if h not in stored]
+
+    def save_log_entries(self, log_rows, strip_rows, image_strips):
+        """
+        Write log entries and their images, one transaction per database
+        log_rows: List of (day, time, entry_text, image_id), the event columns are parsed here
+        strip_rows: New line strips as (hash, image_data, format, width, height)
+        image_strips: Strips of each image as (image_id, position, strip_hash)
+        Returns the entry texts that were new
+        """
+        log_conn = self.connection('log')
+        images_conn = self.connection('images')
+        saved = []
+        with self.write_lock:
+            if self.image_store == 'archive' and strip_rows:
+                # The bytes reach the segment file before the index rows that point at them
+                archived = []
+                for hash_, data, fmt, width, height in strip_rows:
+                    segment, offset, length = self.archive.append(data)
+                    archived.append((hash_, None, fmt, width, height, segment, offset, length))
+                self.archive.flush()
+                strip_rows = archived
+            else:
+                strip_rows = [row + (None, None, None) for row in strip_rows]
+            
+            # Images go first - a crash in between can only leave an unreferenced
+            # image behind, never a log row pointing at a missing image
+            if strip_rows or image_strips:
+                with images_conn:
+                    images_conn.executemany('''
+                        INSERT OR IGNORE INTO line_strips
+                            (hash, image_data, format, width, height, segment, blob_offset, blob_length)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', strip_rows)
+                    images_conn.executemany('''
+                        INSERT OR REPLACE INTO log_image_strips (image_id, position, strip_hash)
+                        VALUES (?, ?, ?)
+                    ''', image_strips)
+
+            orphaned_images = []
+            with log_conn:
+                for row in log_rows:
+                    cursor = log_conn.execute('''
+                        INSERT OR IGNORE INTO logs
+                            (day, time, entry_text, image_id,
+                             event_type, actor, target, creature, level, game_seconds)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', tuple(row) + event_row(row[2]))
+                    if cursor.rowcount > 0:
+                        saved.append(row[2])
+                    elif row[3]:
+                        orphaned_images.append((row[3],))
+
+            # Duplicates keep the image saved with the original entry. Strips may be
+            # shared with other entries, so they stay.
+            if orphaned_images:
+                with images_conn:
+                    images_conn.executemany('DELETE FROM log_image_strips WHERE image_id = ?', orphaned_images)
+        return saved
+
+    def log_count(self):
+        """Number of saved log entries"""
+        return self.connection('log').execute('SELECT COUNT(*) FROM logs').fetchone()[0]
+
+    def max_log_id(self):
+        """Highest log id, 0 for an empty database"""
+        return self.connection('log').execute('SELECT MAX(id) FROM logs').fetchone()[0] or 0
+
+    def latest_logs(self, limit=20):
+        """Text of the newest log entries, newest first"""
+        cursor = self.connection('log').execute('SELECT entry_text FROM logs ORDER BY id DESC LIMIT ?', (limit,))
+        return [row[0] for row in cursor]
+
+    def logs_since(self, log_id, limit=10):
+        """Log entries with an id above log_id, oldest first, as dicts"""
+        cursor = self.connection('log').execute('''
+            SELECT id, day, time, entry_text, image_id, event_type, game_seconds
+            FROM logs
+            WHERE id > ?
+            ORDER BY id ASC
+            LIMIT ?
+        ''', (log_id, limit))
+        return [{'id': row[0], 'day': row[1], 'time': row[2], 'text': row[3], 'image_id': row[4],
+                 'event_type': row[5], 'game_seconds': row[6]} for row in cursor]
+
+    def logs_between(self, start_seconds, end_seconds, event_types=None, limit=1000):
+        """
+        Log entries with game_seconds in [start_seconds, end_seconds], oldest game time first
+        A range scan on the game_seconds index, see event_parser.day_range_seconds for whole days
+        event_types: Event types to include, None for all
+        """
+        condition = ''
+        params = [start_seconds, end_seconds]
+        if event_types:
+            condition = f"AND event_type IN ({', '.join('?' * len(event_types))})"
+            params.extend(event_types)
+        cursor = self.connection('log').execute(f'''
+            SELECT id, day, time, entry_text, event_type, game_seconds
+            FROM logs
+            WHERE game_seconds BETWEEN ? AND ? {condition}
+            ORDER BY game_seconds, id
+            LIMIT ?
+        ''', params + [limit])
+        return [{'id': row[0], 'day': row[1], 'time': row[2], 'text': row[3], 'event_type': row[4],
+                 'game_seconds': row[5]} for row in cursor]
+
+    def filter_logs(self, event_types=None, player=None, limit=1000, before_id=None, keywords=None):
+        """
+        Newest log entries of the given event types and/or involving a player, oldest first
+        Both filters are index lookups on the parsed event columns
+        event_types: Event types to include, None for all
+        player: Name that must be the entry's actor or target, None for anyone
+        before_id: Only entries older than this id, for paging back
+        keywords: Words the entry must contain any of (case-insensitive), checked on the
+                  rows the other filters pick
+        Returns dicts with id, text, event_type and the local save timestamp
+        """
+        conditions, params = self._keyword_condition(keywords)
+        return self._select_logs('logs', 'logs.id', conditions, params, event_types, player, limit, before_id)
+
+    def search_logs(self, text, event_types=None, limit=200, before_id=None, keywords=None):
+        """
+        Newest log entries containing every word of text (as word prefixes), oldest first
+        Uses the full-text index, or a LIKE scan for the whole text if FTS5 is missing
+        event_types, limit, before_id, keywords: As for filter_logs
+        """
+        keyword_conditions, keyword_params = self._keyword_condition(keywords)
+        tokens = SEARCH_TOKEN_PATTERN.findall(text)
+        if self.full_text_search and tokens:
+            # Each word as a quoted prefix, so search syntax typed by the user is never parsed
+            query = ' '.join(f'"{token}"*' for token in tokens)
+            # Walk the index newest first so the LIMIT stops the search early
+            source = 'logs_fts CROSS JOIN logs ON logs.id = logs_fts.rowid'
+            return self._select_logs(source, 'logs_fts.rowid', ['logs_fts MATCH ?'] + keyword_conditions,
+                                     [query] + keyword_params, event_types, None, limit, before_id)
+        conditions, params = self._keyword_condition([text])
+        return self._select_logs('logs', 'logs.id', conditions + keyword_conditions, params + keyword_params,
+                                 event_types, None, limit, before_id)
+
+    def _keyword_condition(self, keywords):
+        """LIKE condition and parameters for entries containing any of keywords, empty for None"""
+        if not keywords:
+            return [], []
+        patterns = ['%' + keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                    for keyword in keywords]
+        condition = ' OR '.join(["logs.entry_text LIKE ? ESCAPE '\\'"] * len(patterns))
+        return [f'({condition})'], patterns
+
+    def _select_logs(self, source, id_column, conditions, params, event_types, player, limit, before_id):
+        conditions = list(conditions)
+        params = list(params)
+        if event_types:
+            conditions.append(f"logs.event_type IN ({', '.join('?' * len(event_types))})")
+            params.extend(event_types)
+        if player:
+            conditions.append('(logs.actor = ? OR logs.target = ?)')
+            params.extend((player, player))
+        if before_id is not None:
+            conditions.append(f'{id_column} < ?')
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        cursor = self.connection('log').execute(f'''
+            SELECT logs.id, logs.entry_text, logs.event_type, datetime(logs.timestamp, 'localtime')
+            FROM {source}
+            {where}
+            ORDER BY {id_column} DESC
+            LIMIT ?
+        ''', params + [limit])
+        rows = [{'id': row[0], 'text': row[1], 'event_type': row[2], 'timestamp': row[3]} for row in cursor]
+        rows.reverse()
+        return rows
+
+    def get_state(self, key):
+        """Value saved under key in bot_state, or None"""
+        row = self.connection('log').execute('SELECT value FROM bot_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, values):
+        """Save a dict of key -> value to bot_state in one transaction"""
+        conn = self.connection('log')
+        with self.write_lock, conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO bot_state (key, value, updated) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', list(values.items()))
+
+    def log_texts_after(self, log_id, limit=1000, missing_events=False):
+        """(id, entry_text) of entries with an id above log_id, oldest first
+        missing_events: Only entries saved before event parsing"""
+        condition = 'AND event_type IS NULL' if missing_events else ''
+        return self.connection('log').execute(f'''
+            SELECT id, entry_text FROM logs WHERE id > ? {condition} ORDER BY id LIMIT ?
+        ''', (log_id, limit)).fetchall()
+
+    def update_log_events(self, rows):
+        """Store parsed event columns, rows are (event_type, actor, target, creature, level, game_seconds, id)"""
+        conn = self.connection('log')
+        with self.write_lock, conn:
+            conn.executemany('''
+                UPDATE logs
+                SET event_type = ?, actor = ?, target = ?, creature = ?, level = ?, game_seconds = ?
+                WHERE id = ?
+            ''', rows)
+
+    def latest_game_info(self):
+        """(day, time, id, entry_text) of the latest entry in game time, or None"""
+        return self.connection('log').execute('''
+            SELECT day, time, id, entry_text
+            FROM logs
+            WHERE game_seconds IS NOT NULL
+            ORDER BY game_seconds DESC
+            LIMIT 1
+        ''').fetchone()
+
+    def entry_exists(self, entry_text):
+        """Check if an entry is saved, using the entry_text index"""
+        cursor = self.connection('log').execute('SELECT 1 FROM logs WHERE entry_text = ? LIMIT 1', (entry_text,))
+        return cursor.fetchone() is not None
+
+    def get_log_image_strips(self, image_id):
+        """Encoded line strips of a log image in top to bottom order, empty for older entries
+        Archived strips come back as memoryviews into the segment files"""
+        return self._read_images('''
+            SELECT line_strips.image_data, line_strips.segment, line_strips.blob_offset, line_strips.blob_length
+            FROM log_image_strips
+            JOIN line_strips ON line_strips.hash = log_image_strips.strip_hash
+            WHERE log_image_strips.image_id = ?
+            ORDER BY log_image_strips.position
+        ''', (image_id,))
+
+    def get_log_image(self, image_id):
+        """PNG bytes of a combined log image saved before line strips, or None"""
+        images = self._read_images('''
+            SELECT image_data, segment, blob_offset, blob_length FROM log_images WHERE id = ?
+        ''', (image_id,))
+        return images[0] if images else None
+
+    # Members
+
+    def save_members(self, members, member_count):
+        """
+        Record the online members and a snapshot of the member count
+        Returns the names of members that just went offline
+        """
+        conn = self.connection('member')
+        with self.write_lock, conn:
+            # Update members who haven't been seen recently to offline
+            conn.execute('''
+                UPDATE members
+                SET is_online = 0
+                WHERE is_online = 1
+                AND last_seen < datetime('now', '-2 minutes')
+            ''')
+
+            # Get list of members who just went offline for logging
+            cursor = conn.execute('''
+                SELECT name FROM members
+                WHERE is_online = 0
+                AND last_seen >= datetime('now', '-3 minutes')
+                AND last_seen < datetime('now', '-2 minutes')
+            ''')
+            went_offline = [row[0] for row in cursor]
+
+            # Update or insert each online member
+            conn.executemany('''
+                INSERT INTO members (name, first_seen, last_seen, times_seen, is_online)
+                VALUES (?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, 1, 1)
+                ON CONFLICT(name) DO UPDATE SET
+                    last_seen = CURRENT_TIMESTAMP,
+                    times_seen = times_seen + 1,
+                    is_online = 1
+            ''', [(member,) for member in members])
+
+            # Save a snapshot with the count
+            conn.execute('''
+                INSERT INTO member_snapshots (member_count, members)
+                VALUES (?, ?)
+            ''', (member_count, ','.join(sorted(members))))
+        return went_offline
+
+    def latest_snapshot(self):
+        """(member_count, member names) of the newest snapshot, or None"""
+        row = self.connection('member').execute('''
+            SELECT member_count, members
+            FROM member_snapshots
+            ORDER BY timestamp DESC
+            LIMIT 1
+        ''').fetchone()
+        if not row:
+            return None
+        names = [m.strip() for m in (row[1] or '').split(',') if m.strip()]
+        return row[0], names
+
+    def recent_members(self, minutes=10):
+        """Members seen in the last few minutes as dicts, online first"""
+        cursor = self.connection('member').execute('''
+            SELECT name, times_seen,
+                   CASE WHEN last_seen > datetime('now', '-2 minutes') THEN 1 ELSE is_online END as is_online
+            FROM members
+            WHERE last_seen > datetime('now', ?)
+            ORDER BY is_online DESC, times_seen DESC
+        ''', (f'-{int(minutes)} minutes',))
+        return [{'name': row[0], 'times_seen': row[1], 'is_online': row[2]} for row in cursor]
+
+    def members_with_status(self):
+        """(name, is_online) of every member seen in the last day, online first"""
+        cursor = self.connection('member').execute('''
+            SELECT name, is_online
+            FROM members
+            WHERE last_seen > datetime('now', '-1 day')
+            ORDER BY is_online DESC, name ASC
+        ''')
+        return [(row[0], row[1]) for row in cursor]
+
+    # Discord
+
+    def is_log_sent(self, image_guid):
+        """Check if a log with this image GUID has been sent to Discord"""
+        cursor = self.connection('discord_sent').execute('SELECT 1 FROM discord_sent WHERE image_guid = ?', (image_guid,))
+        return cursor.fetchone() is not None
+
+    def mark_log_sent(self, image_guid, log_id, entry_text):
+        """Record a log as sent to Discord"""
+        conn = self.connection('discord_sent')
+        with conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO discord_sent (image_guid, log_id, entry_text)
+                VALUES (?, ?, ?)
+            ''', (image_guid, log_id, entry_text))
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage(config):
+    """Get the storage shared by all components"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = Storage(config)
+            atexit.register(_storage.close)
+        return _storage
+
+
+if __name__ == "__main__":
+    # Test the storage layer
+    storage = Storage({'log_db': ':memory:', 'log_images_db': ':memory:',
+                       'member_db': ':memory:', 'discord_sent_db': ':memory:'})
+    print(f"Saved: {storage.save_log_entries([(1, '00:00:01', 'Day 1, 00:00:01: test', None)], [], [])}")
+    print(f"Log count: {storage.log_count()}, latest: {storage.latest_logs(5)}")
+    print(f"Other events: {storage.filter_logs(['other'])}")
+    print(f"Search 'tes': {storage.search_logs('tes')}")
+    print(f"Went offline: {storage.save_members({'Alice', 'Bob'}, 2)}")
+    print(f"Latest snapshot: {storage.latest_snapshot()}")
+    storage.close()
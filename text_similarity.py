@@ -0,0 +1,130 @@
+import re
+
+# rapidfuzz has a C implementation of the same bounded edit distance. It is
+# optional - without it we use the bit-parallel pure Python version below.
+try:
+    from rapidfuzz.distance import Levenshtein as _rapidfuzz_levenshtein
+except ImportError:
+    _rapidfuzz_levenshtein = None
+
+
+def _bit_parallel_levenshtein(a, b, max_distance):
+    """
+    Myers/Hyyro bit-parallel Levenshtein distance
+    Each column of the edit distance matrix is kept as bit vectors in Python ints,
+    so the cost is one pass over b regardless of how long a is.
+    Returns max_distance + 1 as soon as the distance can no longer be within max_distance.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    m = len(a)
+    n = len(b)
+    if m == 0:
+        return n if n <= max_distance else max_distance + 1
+
+    # Bit mask of the positions of every character in a
+    peq = {}
+    for i, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = mask  # Vertical +1 deltas
+    mv = 0  # Vertical -1 deltas
+    score = m
+
+    for j, char in enumerate(b):
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+
+        # The distance can drop by at most one for every character of b left
+        if score - (n - j - 1) > max_distance:
+            return max_distance + 1
+
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+
+    return score if score <= max_distance else max_distance + 1
+
+
+def levenshtein(a, b, max_distance=None):
+    """
+    Edit distance between two strings
+    max_distance: Stop early and return max_distance + 1 once the distance is known to be larger
+    """
+    if max_distance is None:
+        max_distance = max(len(a), len(b))
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    if _rapidfuzz_levenshtein is not None:
+        return _rapidfuzz_levenshtein.distance(a, b, score_cutoff=max_distance)
+    return _bit_parallel_levenshtein(a, b, max_distance)
+
+
+def allowed_differences(text1, text2, threshold=5):
+    """Number of OCR errors tolerated between two texts - threshold, or 10% of longer texts"""
+    return max(threshold, max(len(text1), len(text2)) // 10)
+
+
+def is_similar_text(text1, text2, threshold=5):
+    """Check if two texts are within a few OCR errors (insertions, deletions or substitutions) of each other"""
+    max_distance = allowed_differences(text1, text2, threshold)
+    return levenshtein(text1, text2, max_distance) <= max_distance
+
+
+# Letters OCR reads in place of digits - the digits they stand for are unambiguous,
+# unlike one digit read as another (6/8), which is also a real, different time
+DIGIT_CONFUSIONS = str.maketrans({'O': '0', 'o': '0', 'D': '0', 'l': '1', 'I': '1', 'i': '1', '|': '1',
+                                  'Z': '2', 'S': '5', 's': '5', 'B': '8'})
+_DIGIT = r'[\dOoDlIi|ZSsB]'
+LOG_PREFIX_PATTERN = re.compile(rf'^Day {_DIGIT}+, {_DIGIT}{{2}}:{_DIGIT}{{2}}:{_DIGIT}{{2}}:')
+
+
+def is_similar_log_entry(text1, text2, threshold=5, prefix_threshold=0):
+    """
+    Check if two log entries are OCR variants of the same event
+    The Day/time prefixes must be equal once letters read in place of digits are
+    fixed, the rest is compared with the usual OCR tolerance. The same message a
+    second apart is a different event (several walls demolished in a row).
+    prefix_threshold: Edits allowed between the prefixes, for a caller that knows the
+    two entries are at the same place on the panel
+    """
+    match1 = LOG_PREFIX_PATTERN.match(text1)
+    match2 = LOG_PREFIX_PATTERN.match(text2)
+    if match1 and match2:
+        prefix1 = match1.group(0).translate(DIGIT_CONFUSIONS)
+        prefix2 = match2.group(0).translate(DIGIT_CONFUSIONS)
+        if prefix1 != prefix2 and (not prefix_threshold or
+                                   levenshtein(prefix1, prefix2, prefix_threshold) > prefix_threshold):
+            return False
+        text1 = text1[match1.end():]
+        text2 = text2[match2.end():]
+    return is_similar_text(text1, text2, threshold)
+
+
+if __name__ == "__main__":
+    # Test the similarity engine
+    backend = 'rapidfuzz' if _rapidfuzz_levenshtein is not None else 'bit-parallel'
+    print(f"Backend: {backend}")
+    pairs = [
+        ("Day 4120, 12:30:45: Your Rex - Lvl 150 was killed!", "Day 4120, 12:30:45: Your  Rex - Lvl 150 was killed!"),
+        ("Day 4120, 12:30:45: Your Rex - Lvl 150 was killed!", "Day 4120, 12:30:45: Your Rex - LvI 150 was kilied!"),
+        ("Day 4120, 12:30:45: Your Rex - Lvl 150 was killed!", "Day 4120, 12:30:45: Bob claimed 'Baby Rex - Lvl 12'!"),
+        ("Day 4120, 12:30:45: Your Rex - Lvl 150 was killed!", "Day 412O, 12:30:45: Your Rex - Lvl 150 was killed!"),
+        ("Day 4120, 12:30:45: Alice demolished a 'Metal Wall'!", "Day 4120, 12:30:46: Alice demolished a 'Metal Wall'!"),
+    ]
+    for text1, text2 in pairs:
+        print(f"{levenshtein(text1, text2)} edits, same event={is_similar_log_entry(text1, text2)}: {text2}")
@@ -0,0 +1,63 @@
+import os
+import json
+import time
+import zlib
+
+
+class WarmState:
+    def __init__(self, path, max_age=600):
+        """
+        Compact on-disk snapshot of a processor's in-memory tracking state
+        Snapshots are compressed JSON, written to a temporary file and renamed over the
+        old one, so a crash mid-write leaves the previous snapshot intact.
+        path: Snapshot file
+        max_age: Seconds after which a snapshot is too old to restore
+        """
+        self.path = path
+        self.max_age = max_age
+
+    def save(self, state):
+        """Write a snapshot of a JSON-serialisable dict"""
+        data = zlib.compress(json.dumps({'saved_at': time.time(), 'state': state}).encode('utf-8'), 6)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            return True
+        except OSError as e:
+            print(f"Warm state: Error saving {self.path}: {e}")
+            return False
+
+    def load(self):
+        """The saved state dict, or None if there is none, it is unreadable or too old"""
+        try:
+            with open(self.path, 'rb') as f:
+                snapshot = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zlib.error) as e:
+            print(f"Warm state: Ignoring unreadable {self.path}: {e}")
+            return None
+
+        age = time.time() - snapshot.get('saved_at', 0)
+        if not 0 <= age <= self.max_age:
+            print(f"Warm state: {self.path} is {age:.0f}s old, starting fresh")
+            return None
+        print(f"Warm state: Restoring {self.path} from {age:.0f}s ago")
+        return snapshot.get('state')
+
+
+if __name__ == "__main__":
+    # Test a snapshot round trip
+    import tempfile
+    warm = WarmState(os.path.join(tempfile.mkdtemp(), 'test.state'), max_age=60)
+    warm.save({'line_counts': {'Day 1, 00:00:01: test': 3}})
+    print(f"Restored: {warm.load()}")
+    warm.max_age = -1
+    print(f"Too old: {warm.load()}")